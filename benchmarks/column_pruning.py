@@ -0,0 +1,64 @@
+"""Benchmarks column pruning in lazy pipes.
+
+Writes a wide csv file and times a pipe renaming and selecting a few of its
+columns, run eagerly and lazily, where the extractor only parses the
+selected columns. Reports the peak memory of each run.
+
+Run with::
+  python benchmarks/column_pruning.py [rows] [columns] [selected]
+"""
+
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+from pandas import DataFrame
+
+from piperoni.operators.extract.extract_file.csv_ import CSVExtractor
+from piperoni.operators.pipe import Pipe
+from piperoni.operators.transform.transform_name.header_map import HeaderMap
+from piperoni.operators.transform.transform_name.select_columns import (
+    SelectColumns,
+)
+
+
+def main(rows=100000, columns=300, selected=20):
+    rng = np.random.default_rng(0)
+    path = os.path.join(tempfile.mkdtemp(), "wide.csv")
+    DataFrame(
+        rng.uniform(size=(rows, columns)),
+        columns=[f"column {i}" for i in range(columns)],
+    ).to_csv(path, index=False)
+    size = os.path.getsize(path) / 2**20
+    print(f"{rows} rows, {columns} columns, {size:.1f} MB")
+
+    config = {f"column {i}": f"feature_{i}" for i in range(selected)}
+    steps = [
+        CSVExtractor(),
+        HeaderMap(config, complete_map=False),
+        SelectColumns(list(config.values())),
+    ]
+    expected = None
+    for lazy in (False, True):
+        pipe = Pipe(steps, lazy=lazy, stream_logging_level=30)
+        tracemalloc.start()
+        start = time.perf_counter()
+        output = pipe(path)
+        elapsed = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1] / 2**20
+        tracemalloc.stop()
+        if expected is None:
+            expected = output
+        print(
+            f"lazy={lazy!s:>5}: {elapsed:6.2f} s, peak {peak:8.1f} MB, "
+            f"identical: {output.equals(expected)}"
+        )
+    os.remove(path)
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
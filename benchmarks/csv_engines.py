@@ -0,0 +1,69 @@
+"""Benchmarks the parser engines of the CSVExtractor.
+
+Times reading a csv file with the C engine and with the pyarrow engine with
+NumPy-backed and pyarrow-backed columns, and reports the memory of the
+output. Pass the path of a csv file, like one of the 1-10 GB files of a
+project, or a number of rows of a generated file.
+
+Run with::
+  python benchmarks/csv_engines.py [path or rows]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from pandas import DataFrame
+
+from piperoni.operators.extract.extract_file.csv_ import CSVExtractor
+
+ENGINES = {
+    "c": {},
+    "pyarrow/numpy": {"engine": "pyarrow"},
+    "pyarrow/arrow": {"engine": "pyarrow", "dtype_backend": "pyarrow"},
+}
+
+
+def write_file(rows):
+    """Writes a csv file of rows with numbers and text, returning its
+    path."""
+    rng = np.random.default_rng(0)
+    path = os.path.join(tempfile.mkdtemp(), "data.csv")
+    DataFrame(
+        {
+            "uid": [f"sample-{i}" for i in range(rows)],
+            "formula": rng.choice(["Fe2O3", "TiO2", "ZnO", "GaN"], rows),
+            "band_gap": rng.uniform(0, 6, rows),
+            "temperature": rng.integers(0, 1000, rows),
+            "pressure": rng.uniform(0, 1e5, rows),
+        }
+    ).to_csv(path, index=False)
+    return path
+
+
+def main(source="1000000"):
+    generated = not os.path.exists(source)
+    path = write_file(int(source)) if generated else source
+    size = os.path.getsize(path) / 2**20
+    print(f"{path}: {size:.1f} MB")
+
+    for name, options in ENGINES.items():
+        extractor = CSVExtractor(**options)
+        start = time.perf_counter()
+        data = extractor(path)
+        elapsed = time.perf_counter() - start
+        memory = data.memory_usage(deep=True).sum() / 2**20
+        print(
+            f"{name:>14}: {elapsed:6.2f} s, {size / elapsed:7.1f} MB/s, "
+            f"{memory:8.1f} MB in memory"
+        )
+        del data
+    if generated:
+        os.remove(path)
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:])
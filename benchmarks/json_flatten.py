@@ -0,0 +1,70 @@
+"""Benchmarks flattening of JSON records by the JSONExtractor.
+
+Times _flatten_json and _express_tensors on records that are deep (nested
+dicts), wide (many keys) and tensor-heavy (long nested lists) at growing
+sizes. The time per leaf stays flat when the flattening scales linearly.
+Nesting deeper than the recursion limit is also supported.
+
+Run with::
+  python benchmarks/json_flatten.py
+"""
+
+import timeit
+
+from piperoni.operators.extract.extract_file.json_ import JSONExtractor
+
+SIZES = [1000, 4000, 16000, 64000]
+
+
+def deep(n, depth=100):
+    """n leaves in chains of depth nested dicts.
+
+    Keys grow with depth, so the depth is fixed to keep the size of the
+    output proportional to n.
+    """
+    record = {}
+    for branch in range(n // depth):
+        chain = {"leaf": 0}
+        for i in range(1, depth):
+            chain = {"leaf": i, "child": chain}
+        record[f"branch{branch}"] = chain
+    return record
+
+
+def wide(n):
+    """A record with n keys."""
+    return {f"key{i}": i for i in range(n)}
+
+
+def tensor(n):
+    """A record with an n by 4 matrix and n small dicts in a list."""
+    return {
+        "matrix": [[i, i + 1, i + 2, i + 3] for i in range(n // 4)],
+        "sites": [{"x": [i, i], "label": str(i)} for i in range(n // 4)],
+    }
+
+
+def flatten(record):
+    flat = JSONExtractor._flatten_json(record, "|")
+    return JSONExtractor._express_tensors(flat, "|")
+
+
+def main():
+    print(f"{'record':>8} {'size':>8} {'leaves':>8} {'ms':>9} {'us/leaf':>8}")
+    for name, build in [("deep", deep), ("wide", wide), ("tensor", tensor)]:
+        for size in SIZES:
+            record = build(size)
+            leaves = len(JSONExtractor._flatten_json(record, "|"))
+            number = max(1, 100000 // size)
+            seconds = min(
+                timeit.repeat(lambda: flatten(record), number=number, repeat=3)
+            )
+            seconds /= number
+            print(
+                f"{name:>8} {size:>8} {leaves:>8} {seconds * 1e3:>9.2f} "
+                f"{seconds * 1e6 / leaves:>8.3f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""Benchmarks the json parser backends of the JSONExtractor.
+
+Writes a json array of records with nested lists and times parsing it and
+extracting it, which includes flattening, with every installed backend,
+checking that the outputs are identical.
+
+Run with::
+  python benchmarks/json_parsers.py [records]
+"""
+
+import json
+import os
+import sys
+import tempfile
+import time
+
+from piperoni.operators.extract.extract_file.json_ import (
+    JSONExtractor,
+    PARSERS,
+    parser_backend,
+)
+
+
+def record(i):
+    return {
+        "uid": f"sample-{i}",
+        "composition": {"formula": "Fe2O3", "fractions": [0.4, 0.6]},
+        "properties": [
+            {"name": "band gap", "value": 2.2 + i * 1e-6, "units": "eV"},
+            {"name": "density", "value": 5.24, "units": "g/cm^3"},
+        ],
+        "lattice": [[5.03, 0.0, 0.0], [-2.51, 4.35, 0.0], [0.0, 0.0, 13.7]],
+    }
+
+
+def best_time(function, repeat=3):
+    """Shortest wall time of calling function, in seconds."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main(records=50000):
+    path = os.path.join(tempfile.mkdtemp(), "records.json")
+    with open(path, "w") as fp:
+        json.dump([record(i) for i in range(records)], fp)
+    size = os.path.getsize(path) / 2**20
+    print(f"{records} records, {size:.1f} MB")
+
+    expected = None
+    for parser in PARSERS:
+        try:
+            parser_backend(parser)
+        except ImportError:
+            print(f"{parser:>9}: not installed")
+            continue
+        extractor = JSONExtractor(parser=parser)
+        parsing = best_time(lambda: list(extractor._records(path)))
+        total = best_time(lambda: extractor(path))
+        data = extractor(path)
+        if expected is None:
+            expected = data
+        identical = data.equals(expected)
+        print(
+            f"{parser:>9}: parsing {parsing:6.2f} s, extraction "
+            f"{total:6.2f} s, identical: {identical}"
+        )
+    os.remove(path)
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,61 @@
+"""Benchmarks partitioned execution of streamable steps.
+
+Times a pipe normalizing and featurizing a DataFrame with a python function,
+run serially and split into partitions applied in a process pool. The
+speedup is bounded by the number of processors.
+
+Run with::
+  python benchmarks/partitions.py [rows] [partitions]
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+
+from pandas import DataFrame
+
+from piperoni.operators.pipe import Pipe
+from piperoni.operators.transform.featurize.featurizer import (
+    CustomFeaturizer,
+)
+from piperoni.operators.transform.transform_name.header_map import HeaderMap
+from piperoni.operators.transform.transform_value.value_transformers import (
+    Normalizer,
+)
+
+
+def describe(df: DataFrame) -> DataFrame:
+    """A featurizer running python code for every row."""
+    return DataFrame(
+        {"label": [f"{a:.3f}/{b:.3f}" for a, b in zip(df["a"], df["b"])]}
+    )
+
+
+def main(rows=2000000, partitions=None):
+    partitions = partitions or os.cpu_count() or 1
+    rng = np.random.default_rng(0)
+    df = DataFrame(rng.uniform(size=(rows, 4)), columns=list("wxyz"))
+    print(f"{rows} rows, {partitions} partitions, {os.cpu_count()} cpus")
+
+    steps = [
+        HeaderMap({"w": "a", "x": "b"}, complete_map=False),
+        Normalizer(["a", "b"], [0.5, 0.5]),
+        CustomFeaturizer(describe, streamable=True),
+    ]
+    expected = None
+    for sharded in (None, partitions):
+        pipe = Pipe(steps, partitions=sharded, stream_logging_level=30)
+        start = time.perf_counter()
+        output = pipe(df)
+        elapsed = time.perf_counter() - start
+        if expected is None:
+            expected = output
+        assert output.equals(expected)
+        mode = f"{sharded} partitions" if sharded else "serial"
+        print(f"{mode}: {elapsed:.2f} s")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
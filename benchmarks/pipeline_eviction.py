@@ -0,0 +1,56 @@
+"""Benchmarks the eviction of consumed intermediate results in pipelines.
+
+Runs a chain of pipes, each producing a new DataFrame from the previous
+one, with and without eviction, and reports the peak memory of each run.
+
+Run with::
+  python benchmarks/pipeline_eviction.py [rows] [stages]
+"""
+
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from pandas import DataFrame
+
+from piperoni.operators.pipe import Pipe
+from piperoni.operators.pipeline import Pipeline
+from piperoni.operators.transform_operator import TransformOperator
+
+
+class Scale(TransformOperator):
+    def transform(self, df: DataFrame) -> DataFrame:
+        return df * 1.5
+
+
+def build_pipeline(df, stages, evict):
+    pipes = [
+        Pipe([Scale()], name=f"Stage{i}", stream_logging_level=30)
+        for i in range(stages)
+    ]
+    inputs = {pipe: f"stage{i}" for i, pipe in enumerate(pipes)}
+    outputs = {pipe: f"stage{i + 1}" for i, pipe in enumerate(pipes)}
+    return Pipeline(inputs, outputs, {"stage0": df}, evict=evict)
+
+
+def main(rows=1000000, stages=8):
+    rng = np.random.default_rng(0)
+    df = DataFrame(rng.uniform(size=(rows, 10)))
+    size = df.memory_usage().sum() / 2**20
+    print(f"{stages} stages of {size:.0f} MB")
+    for evict in (False, True):
+        pipeline = build_pipeline(df, stages, evict)
+        tracemalloc.start()
+        start = time.perf_counter()
+        pipeline.run()
+        elapsed = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1] / 2**20
+        tracemalloc.stop()
+        mode = "evict" if evict else "keep"
+        print(f"{mode}: {elapsed:.2f} s, peak {peak:.0f} MB")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
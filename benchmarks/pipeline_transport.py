@@ -0,0 +1,66 @@
+"""Benchmarks the transports of DataFrames between pipeline processes.
+
+Times a pipeline whose first pipe produces a large DataFrame consumed by
+two other pipes, run by the process executor with the pickle and the
+shared transports.
+
+Run with::
+  python benchmarks/pipeline_transport.py [rows] [columns]
+"""
+
+import sys
+import time
+
+import numpy as np
+
+from pandas import DataFrame
+
+from piperoni.operators.pipe import Pipe
+from piperoni.operators.pipeline import Pipeline
+from piperoni.operators.transform_operator import TransformOperator
+
+
+class Scale(TransformOperator):
+    def transform(self, df: DataFrame) -> DataFrame:
+        return df * 2.0
+
+
+class Sum(TransformOperator):
+    def transform(self, df: DataFrame) -> DataFrame:
+        return df.sum().to_frame("sum")
+
+
+def build_pipeline(df):
+    scale = Pipe([Scale()], name="Scale", stream_logging_level=30)
+    first = Pipe([Sum()], name="First", stream_logging_level=30)
+    second = Pipe([Sum()], name="Second", stream_logging_level=30)
+    return Pipeline(
+        {scale: "raw", first: "scaled", second: "scaled"},
+        {scale: "scaled", first: "first", second: "second"},
+        {"raw": df},
+    )
+
+
+def main(rows=5000000, columns=10):
+    rng = np.random.default_rng(0)
+    df = DataFrame(
+        rng.uniform(size=(rows, columns)),
+        columns=[f"column {i}" for i in range(columns)],
+    )
+    size = df.memory_usage().sum() / 2**20
+    print(f"{rows} rows, {columns} columns, {size:.0f} MB")
+    expected = None
+    for transport in ("pickle", "shared"):
+        pipeline = build_pipeline(df)
+        start = time.perf_counter()
+        output = pipeline.run("process", 2, transport=transport)
+        elapsed = time.perf_counter() - start
+        if expected is None:
+            expected = output
+        # sums of columns split into blocks are rounded differently
+        assert np.allclose(output["first"], expected["first"])
+        print(f"{transport}: {elapsed:.2f} s")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
@@ -1,10 +1,12 @@
 import pandas as pd
 import warnings
-import copy
 
 from piperoni.operators.passthrough_operator import PassthroughOperator
-from piperoni.utils import compare_dataframes
-
+from piperoni.utils import (
+    compare_dataframes,
+    copy_on_write_enabled,
+    snapshot,
+)
 
 """
 This module implements the DataFrame comparsion tool.
@@ -31,24 +33,58 @@ class CompareOperator(PassthroughOperator):
         Name of the column that can be used as a unique identifier. This
         allows comparison of rows for any changes between the input and
         the reference.
-    ignore_cols: str or None, optional
+    ignore_cols: str or list or None, optional
         Name of column(s) to ignore in analysis
+    max_warnings: int, optional
+        Maximum number of rows warned about individually, by default 10.
+    copy_reference: bool, optional
+        Whether to hold a copy of the reference, so that later in-place
+        changes to it do not affect the comparison, by default False.
+
+    Attributes
+    ----------
+    diff: DataFrameDiff or None
+        Differences found by the last transform.
+
+    Notes
+    -----
+    By default the reference is held as it is, so the operator adds no copy
+    of it to memory, and modifying it in place changes the comparison. With
+    copy_reference=True it is deep-copied. When pandas copy-on-write is
+    enabled, the reference is always snapshotted, which is lazy and only
+    copies data when one side is modified.
     """
 
+    # Hashes the data instead of holding a copy of it
+    verification = "fingerprint"
+
     def __init__(
-        self, reference: pd.DataFrame, unique_id_col: str, ignore_cols=None
+        self,
+        reference: pd.DataFrame,
+        unique_id_col: str,
+        ignore_cols=None,
+        max_warnings=10,
+        copy_reference=False,
     ):
-        self.reference = copy.deepcopy(reference)
+        if copy_reference or copy_on_write_enabled():
+            reference = snapshot(reference)
+        self.reference = reference
         self.unique_id_col = unique_id_col
         self.ignore_cols = ignore_cols
+        self.max_warnings = max_warnings
+        self.diff = None
 
     def test_equals(self, input_, output_) -> bool:
         return input_.equals(output_)
 
     def transform(self, df: pd.DataFrame) -> pd.DataFrame:
 
-        compare_dataframes(
-            df, self.reference, self.unique_id_col, self.ignore_cols
+        self.diff = compare_dataframes(
+            df,
+            self.reference,
+            self.unique_id_col,
+            self.ignore_cols,
+            self.max_warnings,
         )
 
         return df
@@ -57,3 +57,87 @@ class TestComparer:
             record[0].message.args[0]
             == "Row 1 has values [9] in input data, but has values [6] in the reference for columns ['prop1']"
         )
+
+    def test_reference_snapshot(self):
+        """Tests that in-place changes to a copied reference are not
+        seen."""
+        df = self.import_and_uid_df()
+        comparer = CompareOperator(df, "uid", copy_reference=True)
+        df.iloc[1, 1] = 9
+        with pytest.warns(UserWarning) as record:
+            comparer.transform(df)
+        assert record[0].message.args[0].startswith("Row 1 has values [9]")
+
+    def test_reference_not_copied(self):
+        """Tests that the reference is not copied by default."""
+        df = self.import_and_uid_df()
+        comparer = CompareOperator(df, "uid")
+        assert comparer.reference is df
+
+    def test_diff(self):
+        """Tests the structured diff of changed, added and removed rows."""
+        reference = pd.DataFrame(
+            {"uid": [0, 1, 2], "a": [1, 2, 3], "b": ["x", None, "z"]}
+        )
+        modified = pd.DataFrame(
+            {"uid": [3, 1, 0], "a": [4, 5, 10], "b": ["w", None, "y"]}
+        )
+
+        comparer = CompareOperator(reference, "uid", max_warnings=1)
+        with pytest.warns(UserWarning) as record:
+            comparer(modified)
+        messages = [warning.message.args[0] for warning in record]
+        assert messages[0] == (
+            "Row 0 has values [10 'y'] in input data, but has values "
+            "[1 'x'] in the reference for columns ['a' 'b']"
+        )
+        assert messages[1] == (
+            "1 more rows have values in input data that differ from the "
+            "reference."
+        )
+        assert messages[2] == (
+            "Row 2 in reference dataset not found in the input!"
+        )
+
+        diff = comparer.diff
+        assert not diff.is_consistent
+        assert diff.counts() == {
+            "changed_cells": 3,
+            "changed_rows": 2,
+            "added_rows": 1,
+            "removed_rows": 1,
+        }
+        assert list(diff.changed_cells["uid"]) == [0, 0, 1]
+        assert list(diff.changed_cells["column"]) == ["a", "b", "a"]
+        assert list(diff.changed_cells["input"]) == [10, "y", 5]
+        assert list(diff.removed_rows) == [2]
+        assert list(diff.added_rows) == [3]
+        assert list(diff.sample(1)["uid"]) == [0, 0]
+
+    def test_mismatched_dtypes(self):
+        """Tests that columns of different dtypes are compared cell by
+        cell."""
+        reference = pd.DataFrame(
+            {
+                "uid": [0, 1, 2],
+                "a": [1, 2, 3],
+                "b": pd.Categorical(["x", "y", "x"]),
+            }
+        )
+        modified = pd.DataFrame(
+            {
+                "uid": [0, 1, 2],
+                "a": ["1", 2.0, 3],
+                "b": pd.Categorical(["x", "y", "z"]),
+            }
+        )
+
+        comparer = CompareOperator(reference, "uid")
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", UserWarning)
+            warnings.simplefilter("error", DeprecationWarning)
+            comparer(modified)
+        cells = comparer.diff.changed_cells
+        assert list(cells["uid"]) == [0, 2]
+        assert list(cells["column"]) == ["a", "b"]
+        assert list(cells["input"]) == ["1", "z"]
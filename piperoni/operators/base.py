@@ -24,7 +24,24 @@ Functionality of the BaseOperator::
 
 
 class BaseOperator(ABC):
-    """A generic operator to apply to data."""
+    """A generic operator to apply to data.
+
+    Attributes
+    ----------
+    streamable: bool
+        Whether the operator is row-local, meaning that applying it to
+        consecutive chunks of rows and concatenating the outputs gives the
+        same result as applying it to all rows at once. Streamable operators
+        can process data chunk by chunk in a streaming Pipe. Defaults to
+        False.
+    owns_output: bool
+        Whether the operator returns new data that no other object
+        references, which lazy pipes let the next step modify in place.
+        Defaults to False.
+    """
+
+    streamable = False
+    owns_output = False
 
     @property
     def logger(self):
@@ -52,3 +69,26 @@ class BaseOperator(ABC):
     def __call__(self, *args, **kwargs) -> object:
         """Class instances emulate callable methods."""
         return self.transform(*args, **kwargs)
+
+    def input_columns(self, columns):
+        """Declares the columns of the input needed to compute columns of the
+        output.
+
+        Lazy pipes use the declarations of their steps to only read the
+        needed columns. Operators that read specific columns override this
+        method; the default declares that every column is needed.
+
+        Parameters
+        ----------
+        columns: List[str] or None
+            Headers of the needed columns of the output, or None if every
+            column of the output is needed.
+
+        Returns
+        -------
+        List[str] or None
+            Headers of the needed columns of the input, or None if every
+            column of the input may be needed. Headers that are not in the
+            input are ignored.
+        """
+        return None
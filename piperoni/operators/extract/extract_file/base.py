@@ -48,3 +48,26 @@ class FileExtractor(CastOperator):
 
         path_name, ext = os.path.splitext(path)
         return ext[1:]  # don't return the period "." in the extension
+
+
+class ColumnFilter:
+    """A picklable usecols filter accepting the headers of some columns.
+
+    Unlike a list of headers, it accepts headers missing from the file. The
+    headers are held sorted, so that its fingerprint does not depend on
+    their order or on the hash seed of the process.
+
+    Parameters
+    ----------
+    columns : List[str]
+        Headers of the accepted columns.
+    """
+
+    def __init__(self, columns):
+        self.columns = tuple(sorted(set(columns), key=repr))
+
+    def __call__(self, column) -> bool:
+        return column in self.columns
+
+    def __repr__(self):
+        return f"ColumnFilter({list(self.columns)})"
@@ -1,19 +1,201 @@
+import copy
 import inspect
 
-from pandas import DataFrame, read_csv
+from math import inf
 
-from piperoni.operators.extract.extract_file.base import FileExtractor
+from typing import Iterator
+
+import numpy as np
+
+from pandas import DataFrame, RangeIndex, read_csv
+
+from piperoni.operators.extract.extract_file.base import (
+    ColumnFilter,
+    FileExtractor,
+)
+from piperoni.operators.extract.extract_file.schema import (
+    NUMERIC,
+    DtypeOptimizer,
+    SchemaCache,
+    infer_schema,
+)
 
 """
 This module implements objects for extracting data from csv-like files.
 """
 
+# Number of rows parsed at a time when optimizing dtypes
+OPTIMIZE_CHUNKSIZE = 100000
+
+ENGINES = ("c", "python", "pyarrow")
+DTYPE_BACKENDS = ("numpy", "pyarrow")
+
+# pandas.read_csv arguments supported by the pyarrow engine: the pyarrow
+# options class and attribute they set. Arguments without an attribute are
+# translated by _pyarrow_options or applied to the DataFrame.
+PYARROW_ARGUMENTS = {
+    "sep": ("parse", "delimiter"),
+    "delimiter": ("parse", "delimiter"),
+    "quotechar": ("parse", "quote_char"),
+    "doublequote": ("parse", "double_quote"),
+    "escapechar": ("parse", "escape_char"),
+    "skip_blank_lines": ("parse", "ignore_empty_lines"),
+    "encoding": ("read", "encoding"),
+    "skiprows": ("read", "skip_rows"),
+    "decimal": ("convert", "decimal_point"),
+    "true_values": ("convert", "true_values"),
+    "false_values": ("convert", "false_values"),
+    "usecols": ("convert", "include_columns"),
+    "header": None,
+    "names": None,
+    "dtype": None,
+    "na_values": None,
+    "keep_default_na": None,
+    "index_col": None,
+}
+
+# Values parsed as missing or booleans by pandas.read_csv
+PANDAS_NA_VALUES = [
+    "",
+    "#N/A",
+    "#N/A N/A",
+    "#NA",
+    "-1.#IND",
+    "-1.#QNAN",
+    "-NaN",
+    "-nan",
+    "1.#IND",
+    "1.#QNAN",
+    "<NA>",
+    "N/A",
+    "NA",
+    "NULL",
+    "NaN",
+    "None",
+    "n/a",
+    "nan",
+    "null",
+]
+PANDAS_TRUE_VALUES = ["True", "TRUE", "true"]
+PANDAS_FALSE_VALUES = ["False", "FALSE", "false"]
+
+
+def _arrow_type(dtype):
+    """Returns the pyarrow type of a pandas dtype."""
+    import pyarrow as pa
+
+    if dtype in (str, "str", "string", "object", object):
+        return pa.string()
+    if dtype == "category":
+        return pa.dictionary(pa.int32(), pa.string())
+    if hasattr(dtype, "pyarrow_dtype"):  # pandas.ArrowDtype
+        return dtype.pyarrow_dtype
+    return pa.from_numpy_dtype(np.dtype(dtype))
+
+
+def _pyarrow_options(path, kwargs):
+    """Translates pandas.read_csv arguments to pyarrow csv options.
+
+    Selected columns are read in the order of the file like pandas does, so
+    the header of the file is read when usecols is given.
+
+    Returns
+    -------
+    tuple
+        The ReadOptions, ParseOptions and ConvertOptions.
+    """
+    from pyarrow import csv
+
+    options = {"read": {}, "parse": {}, "convert": {}}
+    options["convert"].update(
+        true_values=PANDAS_TRUE_VALUES,
+        false_values=PANDAS_FALSE_VALUES,
+        # pandas parses empty strings as missing values
+        strings_can_be_null=True,
+    )
+    for name, value in kwargs.items():
+        if PYARROW_ARGUMENTS[name] is not None:
+            kind, attribute = PYARROW_ARGUMENTS[name]
+            options[kind][attribute] = value
+
+    header = kwargs.get("header", "infer")
+    names = kwargs.get("names")
+    if names is not None:
+        options["read"]["column_names"] = list(names)
+        if header == 0:
+            options["read"]["skip_rows_after_names"] = 1
+    elif header is None:
+        options["read"]["autogenerate_column_names"] = True
+    elif header not in (0, "infer"):
+        options["read"]["skip_rows"] = (
+            options["read"].get("skip_rows", 0) + header
+        )
+
+    na_values = list(kwargs.get("na_values") or [])
+    if kwargs.get("keep_default_na", True):
+        na_values = PANDAS_NA_VALUES + na_values
+    options["convert"]["null_values"] = na_values
+
+    dtype = kwargs.get("dtype")
+    if dtype is not None:
+        options["convert"]["column_types"] = {
+            column: _arrow_type(column_dtype)
+            for column, column_dtype in dtype.items()
+        }
+
+    read_options = csv.ReadOptions(**options["read"])
+    parse_options = csv.ParseOptions(**options["parse"])
+    usecols = kwargs.get("usecols")
+    if usecols is not None:
+        header = csv.open_csv(
+            path, read_options=read_options, parse_options=parse_options
+        ).schema.names
+        if not callable(usecols):
+            missing = set(usecols) - set(header)
+            if missing:
+                raise ValueError(
+                    "Usecols do not match columns, columns expected but not "
+                    f"found: {sorted(missing)}"
+                )
+            usecols = set(usecols).__contains__
+        options["convert"]["include_columns"] = [
+            column for column in header if usecols(column)
+        ]
+    return (
+        read_options,
+        parse_options,
+        csv.ConvertOptions(**options["convert"]),
+    )
+
 
 class CSVExtractor(FileExtractor):
     """Extracts data from csv files.
 
     Parameters
     ----------
+    engine : str or None, optional
+        Parser engine: "c" or "python", the engines of pandas.read_csv, or
+        "pyarrow", which reads the file with the multithreaded csv reader of
+        pyarrow and supports the arguments in PYARROW_ARGUMENTS. None uses
+        the default engine of pandas.read_csv.
+    dtype_backend : str, optional
+        With the pyarrow engine, "numpy" returns NumPy-backed columns like
+        the other engines, and "pyarrow" returns pyarrow-backed columns,
+        which are built without copying the parsed data and require pandas
+        >= 1.5. Defaults to "numpy".
+    optimize_dtypes : bool, optional
+        Whether to store columns with compact dtypes: the smallest integer
+        type holding their values, float32 when it is exact, categories for
+        repetitive text and pyarrow strings for other text when pyarrow is
+        installed. The dtypes are inferred from a sample of the file, and
+        the file is then parsed in chunks that widen them when needed, so no
+        value is truncated. Defaults to False.
+    sample_rows : int, optional
+        Number of rows sampled to infer the dtypes. Defaults to 10000.
+    schema_cache : SchemaCache or str or None, optional
+        Cache of inferred dtypes, or the directory of one. Files with the
+        same header and read options reuse the cached dtypes instead of
+        being sampled.
     kwargs : dict
         Keyword values used to customize extraction. See pandas.read_csv for supported arguments.
 
@@ -21,9 +203,22 @@ class CSVExtractor(FileExtractor):
     ------
     TypeError
         If the kwargs do not match the pandas.read_csv signature.
+    ValueError
+        If the engine or dtype_backend are not valid options, or kwargs or
+        optimize_dtypes are not supported by the pyarrow engine.
+    ImportError
+        If the pyarrow engine is used and pyarrow is not installed.
     """
 
-    def __init__(self, **kwargs):
+    def __init__(
+        self,
+        engine=None,
+        dtype_backend="numpy",
+        optimize_dtypes=False,
+        sample_rows=10000,
+        schema_cache=None,
+        **kwargs,
+    ):
         # validates that kwargs can be bound to pandas.read_csv
         signature = inspect.signature(read_csv)
         try:
@@ -34,6 +229,30 @@ class CSVExtractor(FileExtractor):
             )
         else:
             self.kwargs = kwargs
+        if engine is not None and engine not in ENGINES:
+            raise ValueError(
+                f"engine must be one of {list(ENGINES)}, but got {engine}"
+            )
+        if dtype_backend not in DTYPE_BACKENDS:
+            raise ValueError(
+                f"dtype_backend must be one of {list(DTYPE_BACKENDS)}, "
+                f"but got {dtype_backend}"
+            )
+        if engine == "pyarrow":
+            self._check_pyarrow(optimize_dtypes)
+        elif dtype_backend != "numpy":
+            raise ValueError(
+                "dtype_backend='pyarrow' requires the pyarrow engine."
+            )
+        elif engine is not None:
+            self.kwargs["engine"] = engine
+        self.engine = engine
+        self.dtype_backend = dtype_backend
+        self.optimize_dtypes = optimize_dtypes
+        self.sample_rows = sample_rows
+        if isinstance(schema_cache, str):
+            schema_cache = SchemaCache(schema_cache)
+        self.schema_cache = schema_cache
 
     @property
     def output_type(self):
@@ -52,4 +271,220 @@ class CSVExtractor(FileExtractor):
         DataFrame
             Data contained in the file.
         """
+        if self.engine == "pyarrow":
+            return self._read_pyarrow(path)
+        if self._optimizes_dtypes():
+            return self._read_optimized(path)
         return read_csv(path, **self.kwargs)
+
+    def transform_chunks(self, path: str, chunksize: int) -> Iterator:
+        """Yields the csv data in chunks of rows.
+
+        Concatenating the chunks gives the output of transform. dtypes are
+        not optimized.
+
+        Parameters
+        ----------
+        path : str
+            Path to csv file.
+        chunksize : int
+            Maximum number of rows per chunk.
+
+        Yields
+        ------
+        DataFrame
+            Consecutive rows of the file.
+        """
+        if self.engine == "pyarrow":
+            yield from self._stream_pyarrow(path, chunksize)
+            return
+        kwargs = {**self.kwargs, "chunksize": chunksize}
+        with read_csv(path, **kwargs) as reader:
+            for chunk in reader:
+                yield chunk
+
+    def project(self, columns):
+        """Returns a copy of the extractor that only reads some columns.
+
+        Parameters
+        ----------
+        columns : List[str]
+            Headers of the columns to read.
+
+        Returns
+        -------
+        CSVExtractor or None
+            The extractor reading the columns in the order of the file and
+            ignoring the columns missing from the file, or None if the
+            extractor already selects columns with a callable or by
+            position, or sets an index column.
+        """
+        usecols = self.kwargs.get("usecols")
+        if usecols is not None:
+            if callable(usecols) or not all(
+                isinstance(column, str) for column in usecols
+            ):
+                return None
+            usecols = [column for column in usecols if column in columns]
+        else:
+            usecols = ColumnFilter(columns)
+        if self.kwargs.get("index_col") not in (None, False):
+            return None
+        projected = copy.copy(self)
+        projected.kwargs = {**self.kwargs, "usecols": usecols}
+        return projected
+
+    def _optimizes_dtypes(self):
+        """Whether dtypes are optimized. Not when read_csv returns chunks or
+        a single dtype is set for all columns."""
+        return (
+            self.optimize_dtypes
+            and not self.kwargs.get("chunksize")
+            and not self.kwargs.get("iterator")
+            and isinstance(self.kwargs.get("dtype", {}), dict)
+        )
+
+    def _read_optimized(self, path):
+        """Reads a csv file in chunks cast to compact dtypes."""
+        kwargs = dict(self.kwargs)
+        dtype = kwargs.pop("dtype", None) or {}
+
+        schema = key = None
+        if self.schema_cache is not None:
+            columns = read_csv(
+                path, dtype=dtype, **{**kwargs, "nrows": 0}
+            ).columns
+            key = SchemaCache.key(columns, self.kwargs)
+            schema = self.schema_cache.get(key)
+        if schema is None:
+            sample_rows = min(self.sample_rows, kwargs.get("nrows") or inf)
+            sample = read_csv(
+                path,
+                dtype=dtype,
+                **{**kwargs, "nrows": sample_rows},
+            )
+            schema = infer_schema(sample)
+
+        # dtypes set by the user are kept, and text dtypes are parsed
+        # directly, as they do not depend on the values
+        schema = {
+            column: column_dtype
+            for column, column_dtype in schema.items()
+            if column not in dtype
+        }
+        text = {
+            column: column_dtype
+            for column, column_dtype in schema.items()
+            if column_dtype not in NUMERIC
+        }
+        optimizer = DtypeOptimizer(schema)
+        with read_csv(
+            path,
+            dtype={**text, **dtype},
+            **{**kwargs, "chunksize": OPTIMIZE_CHUNKSIZE},
+        ) as reader:
+            data = optimizer.concat(optimizer.apply(chunk) for chunk in reader)
+
+        if key is not None:
+            self.schema_cache.set(key, optimizer.schema)
+        return data
+
+    def _check_pyarrow(self, optimize_dtypes):
+        """Validates the options of the pyarrow engine."""
+        unsupported = sorted(set(self.kwargs) - set(PYARROW_ARGUMENTS))
+        if unsupported:
+            raise ValueError(
+                f"The pyarrow engine does not support {unsupported}. "
+                f"Supported arguments: {sorted(PYARROW_ARGUMENTS)}."
+            )
+        if not isinstance(self.kwargs.get("dtype", {}), dict):
+            raise ValueError(
+                "The pyarrow engine only supports dtype as a dict of dtypes "
+                "by column."
+            )
+        if optimize_dtypes:
+            raise ValueError(
+                "optimize_dtypes is not supported by the pyarrow engine."
+            )
+        try:
+            import pyarrow.csv  # noqa: F401
+        except ImportError:
+            raise ImportError("The pyarrow engine requires pyarrow.")
+
+    def _read_pyarrow(self, path):
+        """Reads a csv file with the multithreaded pyarrow reader."""
+        from pyarrow import csv
+
+        read_options, parse_options, convert_options = _pyarrow_options(
+            path, self.kwargs
+        )
+        table = csv.read_csv(
+            path,
+            read_options=read_options,
+            parse_options=parse_options,
+            convert_options=convert_options,
+        )
+        return self._to_pandas(table, 0)
+
+    def _stream_pyarrow(self, path, chunksize):
+        """Yields chunks of a csv file read incrementally by pyarrow."""
+        import pyarrow as pa
+
+        from pyarrow import csv
+
+        read_options, parse_options, convert_options = _pyarrow_options(
+            path, self.kwargs
+        )
+        reader = csv.open_csv(
+            path,
+            read_options=read_options,
+            parse_options=parse_options,
+            convert_options=convert_options,
+        )
+        # record batches follow the block size of the reader, so they are
+        # regrouped into chunks of chunksize rows
+        start = 0
+        pending = []
+        rows = 0
+        for batch in reader:
+            pending.append(batch)
+            rows += batch.num_rows
+            if rows < chunksize:
+                continue
+            table = pa.Table.from_batches(pending)
+            offset = 0
+            while rows - offset >= chunksize:
+                yield self._to_pandas(table.slice(offset, chunksize), start)
+                offset += chunksize
+                start += chunksize
+            pending = table.slice(offset).to_batches()
+            rows -= offset
+        if rows:
+            table = pa.Table.from_batches(pending, schema=reader.schema)
+            yield self._to_pandas(table, start)
+
+    def _to_pandas(self, table, start):
+        """Converts rows of a table read by pyarrow starting at row start to
+        a DataFrame, like pandas.read_csv would return them."""
+        if self.dtype_backend == "pyarrow":
+            from pandas import ArrowDtype
+
+            data = table.to_pandas(types_mapper=ArrowDtype)
+        else:
+            data = table.to_pandas()
+        data.index = RangeIndex(start, start + len(data))
+        if (
+            self.kwargs.get("header", "infer") is None
+            and self.kwargs.get("names") is None
+        ):
+            data.columns = RangeIndex(len(data.columns))
+        index_col = self.kwargs.get("index_col")
+        if index_col is not None and index_col is not False:
+            if not isinstance(index_col, (list, tuple)):
+                index_col = [index_col]
+            keys = [
+                data.columns[column] if isinstance(column, int) else column
+                for column in index_col
+            ]
+            data = data.set_index(keys if len(keys) > 1 else keys[0])
+        return data
@@ -1,12 +1,48 @@
-from pandas import read_excel, DataFrame
+import copy
+import os
 
-from piperoni.operators.extract.extract_file.base import FileExtractor
+from concurrent.futures import ProcessPoolExecutor
+
+from pandas import ExcelFile, DataFrame
+
+from piperoni.operators.extract.extract_file.base import (
+    ColumnFilter,
+    FileExtractor,
+)
+
+try:
+    import python_calamine
+except ImportError:
+    python_calamine = None
 
 """
 This module implements objects for extracting data from excel files.
 """
 
 
+def default_engine():
+    """Returns the fastest installed excel engine supported by pandas.
+
+    calamine, a Rust parser, is used when python-calamine is installed and
+    pandas supports it (pandas >= 2.2). Otherwise None is returned, which lets
+    pandas pick the engine from the file extension, like openpyxl for xlsx
+    files.
+    """
+    if python_calamine is not None and "calamine" in getattr(
+        ExcelFile, "_engines", {}
+    ):
+        return "calamine"
+    return None
+
+
+def _parse_sheet(path, engine, storage_options, sheet, kwargs):
+    """Parses one sheet of an excel file, opening the file on its own."""
+    with ExcelFile(
+        path, engine=engine, storage_options=storage_options
+    ) as excel:
+        return excel.parse(sheet, **kwargs)
+
+
 class ExcelExtractor(FileExtractor):
     """Extracts data from excel files.
 
@@ -14,11 +50,27 @@ class ExcelExtractor(FileExtractor):
     must be aligned in the top left corner and all of the column headers must
     be named.
 
+    The file is opened once and only the requested sheets are parsed, one at
+    a time, so that a sheet failing validation stops the extraction before
+    the remaining sheets are parsed. With max_workers other than 1, several
+    requested sheets are instead parsed in parallel processes. Each process
+    opens and reads the whole file again, so this only pays off for
+    workbooks of several large sheets.
+
     Parameters
     ----------
     sheet_name: str|int|list|None
         Determines which sheets to return. See pandas.read_excel for
         documentation.
+    engine: str or None, optional
+        Excel engine, like "openpyxl", "xlrd" or "calamine". "auto" uses
+        calamine when it is available and lets pandas pick the engine from
+        the file extension otherwise. Defaults to "auto".
+    max_workers: int or None, optional
+        Maximum number of processes parsing sheets in parallel when several
+        sheets are requested. None uses one process per requested sheet, up
+        to the number of processors. Defaults to 1, which parses them in
+        this process.
     kwargs: dict
         Keyword values used to customize extraction. See pandas.read_excel for
         supported arguments.
@@ -29,9 +81,13 @@ class ExcelExtractor(FileExtractor):
     match the arguments in pandas.read_excel, so be careful.
     """
 
-    def __init__(self, sheet_name=None, **kwargs):
+    def __init__(
+        self, sheet_name=None, engine="auto", max_workers=1, **kwargs
+    ):
         self.kwargs = kwargs
         self.kwargs.update({"sheet_name": sheet_name})
+        self.engine = engine
+        self.max_workers = max_workers
 
     @property
     def output_type(self):
@@ -71,19 +127,86 @@ class ExcelExtractor(FileExtractor):
             If there are unnamed column headers or the table is not aligned in
             the top left corner of each sheet.
         """
-        data = read_excel(path, engine="openpyxl", **self.kwargs)
-        if isinstance(data, DataFrame):  # read_excel can return a single df
-            data = {"sheet": data}
-
-        # column headers and location of table in sheet
+        kwargs = dict(self.kwargs)
+        sheet_name = kwargs.pop("sheet_name")
+        storage_options = kwargs.pop("storage_options", None)
+        engine = default_engine() if self.engine == "auto" else self.engine
+
+        with ExcelFile(
+            path, engine=engine, storage_options=storage_options
+        ) as excel:
+            if sheet_name is None:
+                sheets = excel.sheet_names
+            elif isinstance(sheet_name, list):
+                sheets = sheet_name
+            else:
+                # a single sheet is returned under the "sheet" key
+                frame = excel.parse(sheet_name, **kwargs)
+                self._check_headers("sheet", frame)
+                return {"sheet": frame}
+
+            if self.max_workers == 1 or len(sheets) < 2:
+                data = {}
+                for sheet in sheets:
+                    data[sheet] = excel.parse(sheet, **kwargs)
+                    self._check_headers(sheet, data[sheet])
+                return data
+
+        max_workers = self.max_workers
+        if max_workers is None:
+            max_workers = min(len(sheets), os.cpu_count() or 1)
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            futures = {
+                sheet: pool.submit(
+                    _parse_sheet, path, engine, storage_options, sheet, kwargs
+                )
+                for sheet in sheets
+            }
+            data = {
+                sheet: future.result() for sheet, future in futures.items()
+            }
         for sheet, frame in data.items():
-            for header in frame.columns:
-                try:
-                    assert not header.startswith("Unnamed")
-                except AssertionError:
-                    raise Exception(
-                        "Make sure the table in {} is aligned in the top-left "
-                        "corner and all columns have headers".format(sheet)
-                    )
-
+            self._check_headers(sheet, frame)
         return data
+
+    def project(self, columns):
+        """Returns a copy of the extractor that only keeps some columns of
+        every sheet.
+
+        Parameters
+        ----------
+        columns : List[str]
+            Headers of the columns to keep. Headers missing from a sheet are
+            ignored.
+
+        Returns
+        -------
+        ExcelExtractor or None
+            The extractor keeping the columns in the order of the sheets, or
+            None if the extractor already selects columns other than by
+            header, or sets an index column.
+        """
+        usecols = self.kwargs.get("usecols")
+        if usecols is not None:
+            if callable(usecols) or not isinstance(usecols, list):
+                return None
+            if not all(isinstance(column, str) for column in usecols):
+                return None
+            usecols = [column for column in usecols if column in columns]
+        else:
+            usecols = ColumnFilter(columns)
+        if self.kwargs.get("index_col") is not None:
+            return None
+        projected = copy.copy(self)
+        projected.kwargs = {**self.kwargs, "usecols": usecols}
+        return projected
+
+    @staticmethod
+    def _check_headers(sheet, frame):
+        """Checks the column headers and location of the table in a sheet."""
+        headers = frame.columns.astype(str)
+        if headers.str.startswith("Unnamed").any():
+            raise Exception(
+                "Make sure the table in {} is aligned in the top-left "
+                "corner and all columns have headers".format(sheet)
+            )
@@ -1,13 +1,39 @@
-from json import load
+import re
 
-from pandas import DataFrame
+from json import JSONDecodeError, JSONDecoder
+
+from typing import Iterator
+
+from numpy import nan
+from pandas import DataFrame, RangeIndex
 
 from piperoni.operators.extract.extract_file.base import FileExtractor
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import simdjson
+except ImportError:
+    simdjson = None
+
 """
 This module implements objects for extracting data from json files.
 """
 
+# Parser backends, in the order automatic detection tries them
+PARSERS = ("orjson", "simdjson", "json")
+
+# Runs of digits long enough to be integers beyond 64 bits, which orjson
+# turns into floats. Longer floats also match and are only parsed again.
+LONG_INTEGER = re.compile(rb"\d{19}")
+
+WHITESPACE = " \t\n\r"
+# Characters that can follow a value in an array
+DELIMITERS = WHITESPACE + ",]"
+
 
 class JSONExtractor(FileExtractor):
     """Extracts data from json files.
@@ -15,6 +41,10 @@ class JSONExtractor(FileExtractor):
     json is interpreted as records, and there are options for flattening data
     and parsing tensor objects at leaf nodes of the json trees.
 
+    Files holding an array of records are parsed incrementally: records are
+    flattened as they are read and collected column by column, so neither
+    the whole json tree nor a list of flattened records is held in memory.
+
     Parameters
     ----------
     flatten : bool
@@ -23,9 +53,27 @@ class JSONExtractor(FileExtractor):
         Parses tensors at leaf-level values.
     delimiter : str
         Separates different json levels. Only used if flatten is set to `True`.
+    batch_size : int
+        Number of records collected into columns at a time.
+    parser : str
+        json parser backend: "json" (the standard library, the default),
+        "orjson", "simdjson" or "auto", which uses the first one installed
+        in the order of PARSERS. Data the fast backends reject or could
+        change, like NaN literals or integers beyond 64 bits, is parsed
+        again by the standard library, so every backend gives the same
+        output. The fast backends read files holding an array as a whole
+        instead of parsing them incrementally, so the whole file is held in
+        memory.
     kwargs : dict
         Keyword values used to customize extraction. Seejson.load for the
-        accepted keywords.
+        accepted keywords. Only supported by the standard library parser,
+        which "auto" selects when kwargs are given.
+
+    Raises
+    ------
+    ValueError
+        If parser is not a parser backend, or is a fast backend and kwargs
+        are given.
 
     Caution
     -------
@@ -33,10 +81,29 @@ class JSONExtractor(FileExtractor):
     match the arguments in json.load, so be careful.
     """
 
-    def __init__(self, flatten=True, express_tensors=True, sep="|", **kwargs):
+    def __init__(
+        self,
+        flatten=True,
+        express_tensors=True,
+        sep="|",
+        batch_size=10000,
+        parser="json",
+        **kwargs,
+    ):
+        if parser != "auto" and parser not in PARSERS:
+            raise ValueError(
+                f"Unknown json parser {parser}. Expected 'auto' or one of "
+                f"{list(PARSERS)}."
+            )
+        if kwargs and parser not in ("auto", "json"):
+            raise ValueError(
+                f"The {parser} parser does not accept keyword arguments."
+            )
         self.flatten = flatten
         self.express_tensors = express_tensors
         self.sep = sep
+        self.batch_size = batch_size
+        self.parser = parser
         self.kwargs = kwargs
 
     @property
@@ -56,27 +123,123 @@ class JSONExtractor(FileExtractor):
         DataFrame
             Data contained in the file.
         """
+        # column batches are merged before building the DataFrame, so the
+        # dtype of every column is inferred from all of its values
+        columns = {}
+        rows = 0
+        for batch, length in self._batches(path, self.batch_size):
+            for key, values in batch.items():
+                if key not in columns:
+                    columns[key] = [nan] * rows
+                columns[key].extend(values)
+            rows += length
+            for values in columns.values():
+                if len(values) < rows:
+                    values.extend([nan] * (rows - len(values)))
+        return self._frame(columns, 0, rows)
+
+    def transform_chunks(self, path: str, chunksize: int) -> Iterator:
+        """Yields the json records in chunks of rows.
+
+        Concatenating the chunks gives the data of transform. Columns
+        missing from a chunk and dtypes can differ between chunks.
+
+        Parameters
+        ----------
+        path : str
+            Path to json file.
+        chunksize : int
+            Maximum number of rows per chunk.
 
-        # loads json data as records
+        Yields
+        ------
+        DataFrame
+            Consecutive records of the file.
+        """
+        start = 0
+        for batch, length in self._batches(path, chunksize):
+            yield self._frame(batch, start, length)
+            start += length
+
+    def _records(self, path):
+        """Yields the records of a json file."""
+        parser = self._parser()
+        if parser != "json":
+            with open(path, "rb") as fp:
+                data = fp.read()
+            try:
+                records = _parse(parser, data)
+            except ValueError:
+                records = None  # parsed again by the standard library
+            del data
+            if records is not None:
+                yield from records
+                return
         with open(path, "r") as fp:
-            data = load(fp, **self.kwargs)
-            if not isinstance(data, list):
-                data = [data]
-
-        # returns records as a DataFrame
-        if self.flatten:
-            data = [self._flatten_json(record, self.sep) for record in data]
-            if self.express_tensors:
-                data = [
-                    self._express_tensors(record, self.sep) for record in data
-                ]
-        return DataFrame.from_records(data)
+            yield from iter_json_array(fp, self._decoder())
+
+    def _parser(self):
+        """Name of the parser backend to use."""
+        if self.kwargs:
+            return "json"
+        return parser_backend(self.parser)
+
+    def _decoder(self):
+        """The decoder json.load would use with the keyword arguments."""
+        kwargs = dict(self.kwargs)
+        cls = kwargs.pop("cls", None) or JSONDecoder
+        return cls(**kwargs)
+
+    def _batches(self, path, size):
+        """Yields the flattened records of a file in batches of columns.
+
+        Yields
+        ------
+        tuple
+            A dict of equally long lists of values per key and the number of
+            records in the batch.
+        """
+        columns = {}
+        rows = 0
+        for record in self._records(path):
+            if self.flatten:
+                record = self._flatten_json(record, self.sep)
+                if self.express_tensors:
+                    record = self._express_tensors(record, self.sep)
+            items = (
+                record.items()
+                if isinstance(record, dict)
+                else enumerate(record)
+            )
+            for key, value in items:
+                if key not in columns:
+                    columns[key] = [nan] * rows
+                columns[key].append(value)
+            rows += 1
+            for values in columns.values():
+                if len(values) < rows:
+                    values.append(nan)
+            if rows == size:
+                yield columns, rows
+                columns = {}
+                rows = 0
+        if rows:
+            yield columns, rows
+
+    @staticmethod
+    def _frame(columns, start, length):
+        """Builds the DataFrame of a batch of columns."""
+        if not columns:
+            return DataFrame()
+        return DataFrame(columns, index=RangeIndex(start, start + length))
 
     @staticmethod
     def _flatten_json(json, sep):
         """Flattens multilayered json data into one layer.
 
-        Recursive implementation to obtain the flattened json.
+        Iterative implementation, so deeply nested data does not hit the
+        recursion limit. Keys of nested data are joined with sep, and each
+        key prefix is built once and shared by the children of its node.
 
         Parameters
         ----------
@@ -90,34 +253,31 @@ class JSONExtractor(FileExtractor):
         json
             Flattened representation of the data.
         """
-        out = {}
-
-        def flatten(element, name="", sep=sep):
-            """Flatten one layer."""
-
-            # for a dict type
-            if isinstance(element, dict):
-                for key, value in element.items():
-                    flatten(element=value, name=name + key + sep)
+        if not isinstance(json, (dict, list)):
+            return {"": json}
 
-            # for a list type
-            elif isinstance(element, list):
-                for key, value in enumerate(element):
-                    flatten(element=value, name=name + str(key) + sep)
-
-            # for singleton type
+        out = {}
+        # depth-first traversal keeping the order of the data
+        stack = [("", _items(json))]
+        while stack:
+            prefix, items = stack[-1]
+            for key, value in items:
+                name = prefix + str(key)
+                if isinstance(value, (dict, list)):
+                    stack.append((name + sep, _items(value)))
+                    break
+                out[name] = value
             else:
-                name = name[:-1]  # removes the tail delimiter
-                out[name] = element
-
-        flatten(json)
+                stack.pop()
         return out
 
     @staticmethod
     def _express_tensors(flat_json, sep):
         """Parses list-like values in leaf-nodes.
 
-        Recursive implementation to obtain the condensed json.
+        Keys ending in list indices are grouped by the key without them in a
+        single pass, and the values of each group are nested into lists in
+        the order of their indices.
 
         Parameters
         ----------
@@ -132,40 +292,278 @@ class JSONExtractor(FileExtractor):
             Data where the end-lists have been condensed.
         """
         out = {}
+        tensors = {}
+        for key, value in flat_json.items():
+            parent, indices = key, []
+            while True:
+                head, _, token = parent.rpartition(sep)
+                if not token.isdigit():
+                    break
+                indices.append(int(token))
+                parent = head
+            if indices:
+                indices.reverse()
+                tensors.setdefault(parent, []).append((indices, value))
+            else:
+                out[key] = value
 
-        def condense(tree: dict, sep=sep):
-            """Condense one layer."""
+        for parent, elements in tensors.items():
+            out[parent] = _nest(elements)
+        return out
 
-            keys = [i for i in tree.keys()]
-            values = [i for i in tree.values()]
-            tokens = [key.split(sep)[-1] for key in keys]
-            keys_values_tokens = [i for i in zip(keys, values, tokens)]
 
-            # updates persistant output with non-digit keys
-            out.update(
-                {i: j for i, j, k in keys_values_tokens if not k.isdigit()}
-            )
+def _items(element):
+    """Iterates over the keys and values of a dict or list."""
+    if isinstance(element, dict):
+        return iter(element.items())
+    return enumerate(element)
 
-            # checks if there are still lists to condense
-            tree = {i: j for i, j, k in keys_values_tokens if k.isdigit()}
-            if tree:
 
-                # condenses individual lists
-                condensed_tree = {}
-                parent_keys = {
-                    sep.join(i.split(sep)[:-1]) for i in tree.keys()
-                }
-                for substring in parent_keys:
+def _nest(elements):
+    """Nests values into lists following their indices.
 
-                    # orders the list elements from each parent key
-                    group = [(i, j) for i, j in tree.items() if substring in i]
-                    group = sorted(
-                        group, key=lambda x: int(x[0].split(sep)[-1])
-                    )
-                    condensed_tree[substring] = [j for i, j in group]
+    Parameters
+    ----------
+    elements : List[tuple]
+        Pairs of a list of indices and a value.
 
-                # recursively apply condense on the newly condensed tree
-                condense(tree=condensed_tree)
+    Returns
+    -------
+    list
+        Values ordered by their indices, nested one list deep per index.
+    """
+    elements.sort(key=lambda element: element[0])
+    out = []
+    # open nested lists with the index they were created for
+    path = []
+    for indices, value in elements:
+        depth = 0
+        while (
+            depth < len(path)
+            and depth < len(indices) - 1
+            and path[depth][0] == indices[depth]
+        ):
+            depth += 1
+        del path[depth:]
+        container = path[-1][1] if path else out
+        for index in indices[depth:-1]:
+            nested = []
+            container.append(nested)
+            path.append((index, nested))
+            container = nested
+        container.append(value)
+    return out
+
+
+class JSONLinesExtractor(JSONExtractor):
+    """Extracts data from json lines files, which hold one json record per
+    line. Also known as NDJSON.
+
+    Records are flattened as they are read. Accepts the parameters of the
+    JSONExtractor.
+
+    Examples
+    --------
+    Extracting a json lines file in chunks of rows::
+      extractor = JSONLinesExtractor()
+      for chunk in extractor.transform_chunks("records.jsonl", 10000):
+          ...
+    """
 
-        condense(tree=flat_json)
-        return out
+    def _records(self, path):
+        """Yields the records of a json lines file, skipping blank lines."""
+        parser = self._parser()
+        decoder = self._decoder()
+        if parser == "json":
+            with open(path, "r") as fp:
+                for line in fp:
+                    if line.strip():
+                        yield decoder.decode(line)
+            return
+
+        with open(path, "rb") as fp:
+            for line in fp:
+                if not line.strip():
+                    continue
+                try:
+                    yield _parse_value(parser, line)
+                except ValueError:
+                    yield decoder.decode(line.decode())
+
+
+def parser_backend(parser: str = "auto") -> str:
+    """Returns the name of an installed json parser backend.
+
+    Parameters
+    ----------
+    parser : str, optional
+        "orjson", "simdjson", "json" or "auto", which selects the first
+        installed backend of PARSERS.
+
+    Returns
+    -------
+    str
+        The name of the backend.
+
+    Raises
+    ------
+    ImportError
+        If the requested backend is not installed.
+    """
+    installed = {"orjson": orjson, "simdjson": simdjson, "json": True}
+    if parser == "auto":
+        return next(name for name in PARSERS if installed[name])
+    if not installed[parser]:
+        raise ImportError(f"The {parser} json parser is not installed.")
+    return parser
+
+
+def _parse(parser, data):
+    """Parses json bytes with a fast backend.
+
+    Returns
+    -------
+    Iterable
+        The elements of an array, or the parsed value otherwise.
+
+    Raises
+    ------
+    ValueError
+        If the backend cannot parse the data, or the data may hold integers
+        the backend does not parse losslessly.
+    """
+    _check_integers(data)
+    if parser == "orjson":
+        value = orjson.loads(data)
+        return value if isinstance(value, list) else [value]
+
+    # simdjson validates the whole document up front and converts it to
+    # python objects element by element
+    simdjson_parser = simdjson.Parser()
+    document = simdjson_parser.parse(data)
+    if isinstance(document, simdjson.Array):
+        return _iter_simdjson(simdjson_parser, document)
+    return [_simdjson_python(document)]
+
+
+def _iter_simdjson(parser, array):
+    """Yields the elements of a simdjson array, keeping its parser, which
+    owns the parsed document, alive."""
+    for element in array:
+        yield _simdjson_python(element)
+
+
+def _parse_value(parser, data):
+    """Parses one json value with a fast backend."""
+    _check_integers(data)
+    if parser == "orjson":
+        return orjson.loads(data)
+    return simdjson.loads(data)
+
+
+def _check_integers(data):
+    """Raises ValueError if json bytes may hold integers beyond 64 bits."""
+    if LONG_INTEGER.search(data):
+        raise ValueError("Integers may not fit in 64 bits.")
+
+
+def _simdjson_python(value):
+    """Converts a simdjson element to python objects."""
+    if isinstance(value, simdjson.Object):
+        return value.as_dict()
+    if isinstance(value, simdjson.Array):
+        return value.as_list()
+    return value
+
+
+def iter_json_array(fp, decoder=None, block_size=2**16) -> Iterator:
+    """Parses the elements of a json array one at a time.
+
+    The file is read in blocks and only the elements not yet yielded are
+    kept in memory. A file holding another json value yields that value.
+
+    Parameters
+    ----------
+    fp : file
+        Text file holding json data.
+    decoder : JSONDecoder or None, optional
+        Decoder of the elements. Defaults to a JSONDecoder.
+    block_size : int, optional
+        Number of characters read at a time.
+
+    Yields
+    ------
+    object
+        The elements of the array.
+
+    Raises
+    ------
+    JSONDecodeError
+        If the file does not hold valid json.
+    """
+    decoder = decoder or JSONDecoder()
+    buffer = ""
+    pos = 0
+    eof = False
+
+    def read(size):
+        """Reads more of the file, dropping the parsed part of the buffer."""
+        nonlocal buffer, pos, eof
+        block = fp.read(size)
+        eof = not block
+        buffer = buffer[pos:] + block
+        pos = 0
+
+    def skip_whitespace():
+        """Moves pos to the next character, reading more if needed.
+        Returns whether there is one."""
+        nonlocal pos
+        while True:
+            while pos < len(buffer) and buffer[pos] in WHITESPACE:
+                pos += 1
+            if pos < len(buffer) or eof:
+                return pos < len(buffer)
+            read(block_size)
+
+    if not skip_whitespace() or buffer[pos] != "[":
+        # not an array, decoded as a whole like json.load
+        buffer += fp.read()
+        yield decoder.decode(buffer)
+        return
+    pos += 1
+
+    expect_value = True
+    first = True
+    while True:
+        if not skip_whitespace():
+            raise JSONDecodeError("Expecting value", buffer, pos)
+        if buffer[pos] == "]" and (first or not expect_value):
+            pos += 1
+            break
+        if not expect_value:
+            if buffer[pos] != ",":
+                raise JSONDecodeError("Expecting ',' delimiter", buffer, pos)
+            pos += 1
+            expect_value = True
+            continue
+
+        # a number might go on after the buffer, so values are only
+        # accepted when followed by a delimiter or the end of the file
+        while True:
+            try:
+                value, end = decoder.raw_decode(buffer, pos)
+                if eof or (end < len(buffer) and buffer[end] in DELIMITERS):
+                    break
+            except JSONDecodeError:
+                if eof:
+                    raise
+            # reads as much as is buffered, so large values are parsed a
+            # bounded number of times
+            read(max(block_size, len(buffer) - pos))
+        pos = end
+        yield value
+        expect_value = False
+        first = False
+
+    if skip_whitespace():
+        raise JSONDecodeError("Extra data", buffer, pos)
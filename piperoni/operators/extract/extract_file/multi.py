@@ -0,0 +1,203 @@
+import copy
+import glob
+import os
+
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from pandas import DataFrame, concat
+
+from piperoni.operators.extract.extract_file.base import FileExtractor
+
+"""
+This module implements objects for extracting data from many files at once.
+"""
+
+EXECUTORS = {"thread": ThreadPoolExecutor, "process": ProcessPoolExecutor}
+
+
+def _extract(extractor, path):
+    """Extracts one file, returning its data or the error raised."""
+    try:
+        return extractor(path), None
+    except Exception as caught_exception:
+        return None, caught_exception
+
+
+class MultiFileExtractor(FileExtractor):
+    """Extracts data from many files with a file extractor and concatenates
+    it.
+
+    Files are read in parallel, and the data of all files is combined in a
+    single concat, with the union of their columns in order of appearance.
+    Files that cannot be read are logged and skipped, and their errors are
+    kept in the failures attribute.
+
+    Parameters
+    ----------
+    extractor : FileExtractor
+        Extractor applied to every file.
+    executor : str, optional
+        "thread" reads files in a thread pool, which suits extractors
+        spending their time in I/O or in pandas parsers releasing the GIL.
+        "process" uses a process pool, for extractors running python code
+        like the JSONExtractor. "serial" reads one file at a time. Defaults
+        to "thread".
+    max_workers : int or None, optional
+        Maximum number of threads or processes. Defaults to the pool
+        default.
+    path_column : str or None, optional
+        Name of a column added with the path of the file of every row.
+    ignore_index : bool, optional
+        Whether the output has a new default index instead of the indexes of
+        the files. Defaults to True.
+    errors : str, optional
+        "skip" skips files that cannot be read, "raise" raises the first
+        error. Defaults to "skip".
+
+    Attributes
+    ----------
+    failures : dict
+        Errors of the files that could not be read in the last transform,
+        by path.
+
+    Raises
+    ------
+    ValueError
+        If executor or errors are not valid options.
+
+    Examples
+    --------
+    Extracting a directory of csv files::
+      extractor = MultiFileExtractor(CSVExtractor(), path_column="file")
+      data = extractor("path/to/directory/*.csv")
+      extractor.failures
+    """
+
+    def __init__(
+        self,
+        extractor: FileExtractor,
+        executor="thread",
+        max_workers=None,
+        path_column=None,
+        ignore_index=True,
+        errors="skip",
+    ):
+        if executor != "serial" and executor not in EXECUTORS:
+            raise ValueError(
+                f"executor must be one of {['serial', *EXECUTORS]}, "
+                f"but got {executor}"
+            )
+        if errors not in ("skip", "raise"):
+            raise ValueError(
+                f"errors must be 'skip' or 'raise', but got {errors}"
+            )
+        self.extractor = extractor
+        self.executor = executor
+        self.max_workers = max_workers
+        self.path_column = path_column
+        self.ignore_index = ignore_index
+        self.errors = errors
+        self.failures = {}
+
+    @property
+    def input_type(self):
+        return (str, list, tuple)
+
+    @property
+    def output_type(self):
+        return DataFrame
+
+    def transform(self, paths) -> DataFrame:
+        """Returns the concatenated data of many files.
+
+        Parameters
+        ----------
+        paths : str or List[str]
+            A glob pattern or a list of file paths. Files matched by a
+            pattern are read in sorted order.
+
+        Returns
+        -------
+        DataFrame
+            Data contained in the files that could be read, in the order of
+            the paths.
+
+        Raises
+        ------
+        FileNotFoundError
+            If no file matches the pattern.
+        RuntimeError
+            If none of the files can be read.
+        """
+        if isinstance(paths, str):
+            pattern = paths
+            paths = sorted(glob.glob(pattern, recursive=True))
+            if not paths:
+                raise FileNotFoundError(f"No files match {pattern}.")
+
+        self.failures = {}
+        frames = []
+        for path, (data, error) in zip(paths, self._extract_all(paths)):
+            if error is not None:
+                if self.errors == "raise":
+                    raise error
+                self.logger.warning("Could not extract %s: %r", path, error)
+                self.failures[path] = error
+                continue
+            if self.path_column is not None:
+                data[self.path_column] = path
+            frames.append(data)
+
+        if not frames:
+            raise RuntimeError(f"None of the {len(paths)} files was read.")
+        if self.failures:
+            self.logger.warning(
+                "Could not extract %d of %d files.",
+                len(self.failures),
+                len(paths),
+            )
+        return concat(
+            frames,
+            ignore_index=self.ignore_index,
+            sort=False,
+            copy=False,
+        )
+
+    def project(self, columns):
+        """Returns a copy of the extractor whose file extractor only reads
+        some columns, or None if the file extractor cannot."""
+        project = getattr(self.extractor, "project", None)
+        extractor = project(columns) if callable(project) else None
+        if extractor is None:
+            return None
+        projected = copy.copy(self)
+        projected.extractor = extractor
+        return projected
+
+    def _extract_all(self, paths):
+        """Extracts every path, returning data and error pairs in order."""
+        if self.executor == "serial" or len(paths) == 1:
+            return [_extract(self.extractor, path) for path in paths]
+        # sends files to processes in batches to amortize the transfers
+        workers = self.max_workers or os.cpu_count() or 1
+        chunksize = max(1, len(paths) // (4 * workers))
+        with EXECUTORS[self.executor](max_workers=self.max_workers) as pool:
+            return list(
+                pool.map(
+                    _extract,
+                    [self.extractor] * len(paths),
+                    paths,
+                    chunksize=chunksize,
+                )
+            )
+
+    def __getstate__(self):
+        """Drops the failures of the last transform, which are not part of
+        the configuration."""
+        state = self.__dict__.copy()
+        state.pop("failures", None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.failures = {}
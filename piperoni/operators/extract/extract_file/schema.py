@@ -0,0 +1,286 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from pandas.api.types import (
+    is_bool_dtype,
+    is_float_dtype,
+    is_integer_dtype,
+    is_object_dtype,
+    is_string_dtype,
+    union_categoricals,
+)
+
+from piperoni.utils import fingerprint
+
+"""
+This module implements the inference of compact dtypes for extracted data.
+
+A schema maps column names to dtype names. It is inferred from a sample of
+the data and applied chunk by chunk; a chunk whose values do not fit the
+schema widens it, so the schema only ever loses precision the sample allowed
+and the data is never truncated.
+
+Examples
+--------
+Applying an inferred schema to the chunks of a csv file::
+  sample = read_csv(path, nrows=10000)
+  optimizer = DtypeOptimizer(infer_schema(sample))
+  data = optimizer.concat(
+      optimizer.apply(chunk) for chunk in read_csv(path, chunksize=100000)
+  )
+"""
+
+# Numeric dtypes of schemas. Other dtypes hold text.
+# Integer dtypes go from the most to the least compact.
+UNSIGNED_INTEGERS = ["uint8", "uint16", "uint32", "uint64"]
+SIGNED_INTEGERS = ["int8", "int16", "int32", "int64"]
+NUMERIC = UNSIGNED_INTEGERS + SIGNED_INTEGERS + ["float32", "float64"]
+
+
+def compact_integer(minimum, maximum) -> str:
+    """Returns the smallest integer dtype holding values in a range."""
+    dtypes = UNSIGNED_INTEGERS if minimum >= 0 else SIGNED_INTEGERS
+    for dtype in dtypes:
+        info = np.iinfo(dtype)
+        if info.min <= minimum and maximum <= info.max:
+            return dtype
+    return "int64"
+
+
+def string_dtype() -> str:
+    """Returns the pyarrow string dtype when pyarrow is installed, and the
+    object dtype otherwise."""
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return "object"
+    return "string[pyarrow]"
+
+
+def infer_schema(
+    df: pd.DataFrame, category_ratio: float = 0.5, strings="auto"
+) -> dict:
+    """Infers compact dtypes for the columns of a sample of data.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        The sample.
+    category_ratio : float, optional
+        Text columns whose number of distinct values is at most this
+        fraction of their values become categorical.
+    strings : str, optional
+        dtype of the other text columns. "auto" uses pyarrow strings when
+        pyarrow is installed.
+
+    Returns
+    -------
+    dict
+        dtype names by column. Columns without a more compact dtype, like
+        booleans and dates, are left out.
+    """
+    if strings == "auto":
+        strings = string_dtype()
+    schema = {}
+    for column, values in df.items():
+        if is_bool_dtype(values.dtype):
+            continue
+        if is_integer_dtype(values.dtype):
+            if len(values):
+                schema[column] = compact_integer(values.min(), values.max())
+        elif is_float_dtype(values.dtype):
+            if _fits_float32(values):
+                schema[column] = "float32"
+        elif is_object_dtype(values.dtype):
+            if not values.map(type).isin([str, float]).all():
+                continue  # mixed python objects
+            distinct = values.nunique()
+            if distinct and distinct <= category_ratio * values.count():
+                schema[column] = "category"
+            elif strings != "object":
+                schema[column] = strings
+    return schema
+
+
+class DtypeOptimizer:
+    """Applies a schema to chunks of data, widening it when needed.
+
+    Parameters
+    ----------
+    schema : dict
+        dtype names by column, like the output of infer_schema.
+
+    Attributes
+    ----------
+    schema : dict
+        The schema, widened to fit every applied chunk.
+    """
+
+    def __init__(self, schema: dict):
+        self.schema = dict(schema)
+
+    def apply(self, chunk: pd.DataFrame) -> pd.DataFrame:
+        """Casts a chunk to the schema, widening the schema first where
+        values of the chunk do not fit.
+
+        Parameters
+        ----------
+        chunk : pd.DataFrame
+            Data as parsed without a schema.
+
+        Returns
+        -------
+        pd.DataFrame
+            The chunk with compact dtypes.
+        """
+        dtypes = {}
+        for column, dtype in self.schema.items():
+            if column not in chunk.columns:
+                continue
+            dtype = self._widen(dtype, chunk[column])
+            self.schema[column] = dtype
+            if dtype is not None:
+                dtypes[column] = dtype
+        self.schema = {
+            column: dtype
+            for column, dtype in self.schema.items()
+            if dtype is not None
+        }
+        return chunk.astype(dtypes, copy=False)
+
+    def concat(self, chunks) -> pd.DataFrame:
+        """Concatenates chunks returned by apply.
+
+        Chunks cast before the schema was widened are cast to the final
+        schema, and categorical columns get the union of their categories.
+
+        Parameters
+        ----------
+        chunks : Iterable[pd.DataFrame]
+            Chunks returned by apply.
+
+        Returns
+        -------
+        pd.DataFrame
+            The data of all chunks.
+        """
+        chunks = list(chunks)
+        if not chunks:
+            return pd.DataFrame()
+        for column, dtype in self.schema.items():
+            parts = [chunk for chunk in chunks if column in chunk.columns]
+            if dtype == "category":
+                categories = union_categoricals(
+                    [chunk[column] for chunk in parts]
+                ).categories
+                for chunk in parts:
+                    chunk[column] = chunk[column].cat.set_categories(
+                        categories
+                    )
+            else:
+                for chunk in parts:
+                    if chunk[column].dtype != dtype:
+                        chunk[column] = chunk[column].astype(dtype)
+        # columns dropped from the schema get the dtype pandas gives their
+        # differently typed parts
+        return pd.concat(chunks, copy=False)
+
+    @staticmethod
+    def _widen(dtype, values):
+        """Returns a dtype of the same kind as dtype holding values, or None
+        if values cannot be cast to that kind."""
+        if values.dtype == pd.api.types.pandas_dtype(dtype):
+            return dtype
+        if dtype in UNSIGNED_INTEGERS or dtype in SIGNED_INTEGERS:
+            if is_float_dtype(values.dtype):
+                # missing values are parsed as floats
+                return "float32" if _fits_float32(values) else "float64"
+            if not is_integer_dtype(values.dtype):
+                return None
+            if not len(values):
+                return dtype
+            widest = compact_integer(values.min(), values.max())
+            return _wider_integer(dtype, widest)
+        if dtype == "float32":
+            if is_integer_dtype(values.dtype) or is_float_dtype(values.dtype):
+                return dtype if _fits_float32(values) else "float64"
+            return None
+        if dtype == "float64":
+            numeric = is_integer_dtype(values.dtype)
+            return dtype if numeric or is_float_dtype(values.dtype) else None
+        text = (
+            is_object_dtype(values.dtype)
+            or is_string_dtype(values.dtype)
+            or isinstance(values.dtype, pd.CategoricalDtype)
+        )
+        # text columns parsed as numbers or booleans are dropped
+        return dtype if text else None
+
+
+def _fits_float32(values) -> bool:
+    """Whether values are exactly represented as float32."""
+    values = values.to_numpy(dtype="float64", na_value=np.nan)
+    with np.errstate(over="ignore"):
+        compact = values.astype("float32").astype("float64")
+    return bool(((compact == values) | np.isnan(values)).all())
+
+
+def _wider_integer(first, second) -> str:
+    """Smallest integer dtype holding the values of two integer dtypes."""
+    first, second = np.iinfo(first), np.iinfo(second)
+    return compact_integer(
+        min(first.min, second.min), max(first.max, second.max)
+    )
+
+
+class SchemaCache:
+    """Stores inferred schemas by source, so files with the same header are
+    only sampled once.
+
+    Parameters
+    ----------
+    path : str or None, optional
+        Directory holding the schemas as json files, created if it does not
+        exist. If None, schemas are kept in memory.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self.schemas = {}
+        if path is not None:
+            os.makedirs(path, exist_ok=True)
+
+    @staticmethod
+    def key(columns, options) -> str:
+        """Key of the schema of data with columns read with options."""
+        return fingerprint((list(columns), options))
+
+    def get(self, key: str):
+        """Returns the schema stored under key, or None."""
+        if key not in self.schemas and self.path is not None:
+            try:
+                with open(self._file(key)) as fh:
+                    self.schemas[key] = json.load(fh)
+            except FileNotFoundError:
+                return None
+        return self.schemas.get(key)
+
+    def set(self, key: str, schema: dict) -> None:
+        """Stores a schema under key."""
+        self.schemas[key] = dict(schema)
+        if self.path is not None:
+            with open(self._file(key), "w") as fh:
+                json.dump(schema, fh)
+
+    def __getstate__(self):
+        """Only the location of the cache is pickled."""
+        return {"path": self.path}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    def _file(self, key):
+        return os.path.join(self.path, f"{key}.json")
@@ -3,8 +3,10 @@ import pytest
 
 import piperoni as etl
 
-from pandas import read_csv
+from pandas import DataFrame, concat, read_csv
+from pandas.testing import assert_frame_equal
 
+from piperoni.operators.extract.extract_file import csv_
 from piperoni.operators.extract.extract_file.csv_ import CSVExtractor
 
 """
@@ -67,3 +69,92 @@ class TestCSVExtractor:
         # using the default instance on the tsv should fail
         with pytest.raises(AssertionError):
             assert default_instance(TSV_TEST_FILE).equals(EXPECTED_TSV)
+
+    def test_optimize_dtypes(self, tmp_path, monkeypatch):
+        """Tests that optimized dtypes hold the same values in less
+        memory, widening across chunks."""
+        optimized = CSVExtractor(optimize_dtypes=True)(CSV_TEST_FILE)
+        assert optimized.astype(object).equals(EXPECTED_CSV.astype(object))
+        assert (
+            optimized.memory_usage(deep=True).sum()
+            < EXPECTED_CSV.memory_usage(deep=True).sum()
+        )
+
+        path = str(tmp_path / "data.csv")
+        data = DataFrame(
+            {
+                "count": list(range(100)) + [100000],
+                "level": ["low", "high"] * 50 + ["medium"],
+                "value": [0.5] * 100 + [0.1],
+            }
+        )
+        data.to_csv(path, index=False)
+        monkeypatch.setattr(csv_, "OPTIMIZE_CHUNKSIZE", 10)
+        output = CSVExtractor(optimize_dtypes=True, sample_rows=10)(path)
+        assert output["count"].dtype == "uint32"
+        assert output["level"].dtype == "category"
+        assert set(output["level"].cat.categories) == {"low", "high", "medium"}
+        # 0.1 is not exact in float32
+        assert output["value"].dtype == "float64"
+        assert output.astype(object).equals(read_csv(path).astype(object))
+
+    def test_schema_cache(self, tmp_path):
+        """Tests that inferred dtypes are reused by files with the same
+        header."""
+        extractor = CSVExtractor(
+            optimize_dtypes=True, schema_cache=str(tmp_path)
+        )
+        expected = extractor(CSV_TEST_FILE)
+        assert len(list(tmp_path.glob("*.json"))) == 1
+        # a sample without any rows infers no dtype
+        extractor.sample_rows = 0
+        output = extractor(CSV_TEST_FILE)
+        assert (output.dtypes == expected.dtypes).all()
+
+    def test_forced_read_options(self, tmp_path):
+        """Tests that reads setting their own nrows or chunksize override
+        those passed to the extractor."""
+        extractor = CSVExtractor(
+            optimize_dtypes=True, schema_cache=str(tmp_path), nrows=5
+        )
+        output = extractor(CSV_TEST_FILE)
+        assert output.astype(object).equals(
+            EXPECTED_CSV.head(5).astype(object)
+        )
+
+        extractor = CSVExtractor(optimize_dtypes=True, chunksize=None)
+        assert len(extractor(CSV_TEST_FILE)) == len(EXPECTED_CSV)
+        chunks = list(extractor.transform_chunks(CSV_TEST_FILE, 10))
+        assert concat(chunks).equals(EXPECTED_CSV)
+
+    def test_pyarrow_engine(self):
+        """Tests that the pyarrow engine reads like the C engine."""
+        pytest.importorskip("pyarrow")
+        extractor = CSVExtractor(engine="pyarrow")
+        assert_frame_equal(extractor(CSV_TEST_FILE), EXPECTED_CSV)
+        chunks = list(extractor.transform_chunks(CSV_TEST_FILE, 100))
+        assert max(len(chunk) for chunk in chunks) == 100
+        assert_frame_equal(concat(chunks), EXPECTED_CSV)
+
+        extractor = CSVExtractor(
+            engine="pyarrow", sep="\t", header=None, index_col=0
+        )
+        assert_frame_equal(
+            extractor(TSV_TEST_FILE),
+            read_csv(TSV_TEST_FILE, sep="\t", header=None, index_col=0),
+        )
+
+        extractor = CSVExtractor(engine="pyarrow", dtype_backend="pyarrow")
+        output = extractor(CSV_TEST_FILE)
+        assert str(output["Band gap"].dtype) == "double[pyarrow]"
+        band_gap, expected = output["Band gap"], EXPECTED_CSV["Band gap"]
+        assert (band_gap.isna() == expected.isna()).all()
+        assert band_gap.dropna().tolist() == expected.dropna().tolist()
+
+    def test_invalid_engine(self):
+        with pytest.raises(ValueError):
+            CSVExtractor(engine="rust")
+        with pytest.raises(ValueError):
+            CSVExtractor(dtype_backend="pyarrow")
+        with pytest.raises(ValueError):
+            CSVExtractor(engine="pyarrow", nrows=10)
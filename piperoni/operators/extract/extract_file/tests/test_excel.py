@@ -1,10 +1,11 @@
 import os
 import pytest
 
-from pandas import DataFrame
+from pandas import DataFrame, ExcelWriter
 
 import piperoni as etl
 
+from piperoni.operators.extract.extract_file import excel
 from piperoni.operators.extract.extract_file.excel import ExcelExtractor
 
 """
@@ -50,3 +51,61 @@ class TestExcelExtractor:
         assert isinstance(sheet, DataFrame)
         cell_value = sheet["Band gap"][536]
         assert cell_value == 2.26
+
+    @pytest.mark.parametrize("max_workers", [1, 2, None])
+    def test_sheets(self, tmp_path, max_workers):
+        """Tests reading several sheets in this or parallel processes."""
+        path = str(tmp_path / "sheets.xlsx")
+        frames = {
+            "first": DataFrame({"a": [1, 2], "b": ["x", "y"]}),
+            "second": DataFrame({"c": [1.5, 2.5]}),
+            "third": DataFrame({"d": [True, False]}),
+        }
+        with ExcelWriter(path) as writer:
+            for sheet, frame in frames.items():
+                frame.to_excel(writer, sheet_name=sheet, index=False)
+
+        data = ExcelExtractor(max_workers=max_workers)(path)
+        assert list(data) == list(frames)
+        for sheet, frame in frames.items():
+            assert data[sheet].equals(frame)
+
+        data = ExcelExtractor(
+            sheet_name=["third", "first"], max_workers=max_workers
+        )(path)
+        assert list(data) == ["third", "first"]
+
+        # a single sheet is returned under the "sheet" key
+        data = ExcelExtractor(sheet_name="second", engine="openpyxl")(path)
+        assert data["sheet"].equals(frames["second"])
+
+    def test_serial_default(self, tmp_path, monkeypatch):
+        """Tests that sheets are parsed in this process by default."""
+
+        def no_pool(*args, **kwargs):
+            raise AssertionError("A process pool was started")
+
+        monkeypatch.setattr(excel, "ProcessPoolExecutor", no_pool)
+        path = str(tmp_path / "sheets.xlsx")
+        with ExcelWriter(path) as writer:
+            for sheet in ("first", "second"):
+                DataFrame({"a": [1]}).to_excel(
+                    writer, sheet_name=sheet, index=False
+                )
+        assert list(ExcelExtractor()(path)) == ["first", "second"]
+
+    def test_unaligned_sheet(self):
+        """Tests that unaligned tables are reported by sheet."""
+        extractor = ExcelExtractor(sheet_name=["messy sheet"])
+        with pytest.raises(Exception, match="messy sheet"):
+            extractor(EXCEL_TEST_FILE)
+
+    def test_project(self):
+        """Tests that a projected extractor only keeps some columns."""
+        extractor = ExcelExtractor(sheet_name="Strehlow and Cook")
+        expected = extractor(EXCEL_TEST_FILE)["sheet"]
+        projected = extractor.project(["Color", "Band gap", "missing"])
+        data = projected(EXCEL_TEST_FILE)["sheet"]
+        assert list(data.columns) == ["Band gap", "Color"]
+        assert data.equals(expected[["Band gap", "Color"]])
+        assert "usecols" not in extractor.kwargs
@@ -1,9 +1,21 @@
 import os
+import sys
 import pytest
 
 import piperoni as etl
 
-from piperoni.operators.extract.extract_file.json_ import JSONExtractor
+from io import StringIO
+from json import JSONDecodeError, dump, dumps, load
+
+from pandas import concat
+
+from piperoni.operators.extract.extract_file.json_ import (
+    JSONExtractor,
+    JSONLinesExtractor,
+    PARSERS,
+    iter_json_array,
+    parser_backend,
+)
 
 """
 This module implements tests for the JSONExtractor.
@@ -66,3 +78,129 @@ class TestJSONExtractor:
         data = with_raw(SC_TEST_FILE)
         cell_value = data["Band gap"][536]
         assert cell_value == 2.26
+
+    def test_flatten(self):
+        """Tests flattening and tensor expression of nested records."""
+        record = {
+            "matrix": [[1, 2], [3, 4]],
+            "x": [1],
+            "xx": [2],
+            "sites": [{"label": "a", "xyz": [0, 1]}],
+            "empty": [],
+            "name": "test",
+        }
+        flat = JSONExtractor._flatten_json(record, "|")
+        assert list(flat) == [
+            "matrix|0|0",
+            "matrix|0|1",
+            "matrix|1|0",
+            "matrix|1|1",
+            "x|0",
+            "xx|0",
+            "sites|0|label",
+            "sites|0|xyz|0",
+            "sites|0|xyz|1",
+            "name",
+        ]
+        assert JSONExtractor._express_tensors(flat, "|") == {
+            "matrix": [[1, 2], [3, 4]],
+            "x": [1],
+            "xx": [2],
+            "sites|0|label": "a",
+            "sites|0|xyz": [0, 1],
+            "name": "test",
+        }
+
+    def test_deep_flatten(self):
+        """Tests nesting deeper than the recursion limit."""
+        record = value = {}
+        for _ in range(sys.getrecursionlimit() + 100):
+            value["child"] = {}
+            value = value["child"]
+        value["leaf"] = 1
+        flat = JSONExtractor._flatten_json(record, "|")
+        assert list(flat.values()) == [1]
+
+    def test_iter_json_array(self):
+        """Tests that arrays parsed in small blocks match json.load."""
+        with open(SC_TEST_FILE) as fp:
+            data = load(fp)
+        text = dumps(data, indent=1)
+        for block_size in [1, 3, 1000]:
+            parsed = list(iter_json_array(StringIO(text), None, block_size))
+            assert parsed == data
+        assert list(iter_json_array(StringIO("[1, 2.5e3, -7]"), None, 1)) == [
+            1,
+            2.5e3,
+            -7,
+        ]
+        assert list(iter_json_array(StringIO('{"a": 1}'))) == [{"a": 1}]
+        for invalid in ["[1,]", "[1 2]", "[1", "[1] 2"]:
+            with pytest.raises(JSONDecodeError):
+                list(iter_json_array(StringIO(invalid), None, 2))
+
+    def test_batches(self, with_flatten_and_tensors):
+        """Tests that batching and chunking keep the output unchanged."""
+        expected = with_flatten_and_tensors(SC_TEST_FILE)
+        data = JSONExtractor(batch_size=7)(SC_TEST_FILE)
+        assert data.equals(expected)
+        assert (data.dtypes == expected.dtypes).all()
+
+        chunks = list(JSONExtractor().transform_chunks(SC_TEST_FILE, 100))
+        assert max(len(chunk) for chunk in chunks) == 100
+        assert concat(chunks).index.equals(expected.index)
+
+    def test_json_lines(self, tmp_path, with_flatten_and_tensors):
+        """Tests that json lines give the output of a json array."""
+        with open(SC_TEST_FILE) as fp:
+            data = load(fp)
+        path = str(tmp_path / "records.jsonl")
+        with open(path, "w") as fp:
+            for record in data:
+                dump(record, fp)
+                fp.write("\n\n")
+        expected = with_flatten_and_tensors(SC_TEST_FILE)
+        assert JSONLinesExtractor()(path).equals(expected)
+
+    @pytest.mark.parametrize("parser", PARSERS)
+    def test_parsers(self, tmp_path, parser, with_flatten_and_tensors):
+        """Tests that every installed parser gives the same output."""
+        try:
+            parser_backend(parser)
+        except ImportError:
+            pytest.skip(f"{parser} is not installed")
+        expected = with_flatten_and_tensors(SC_TEST_FILE)
+        data = JSONExtractor(parser=parser)(SC_TEST_FILE)
+        assert data.equals(expected)
+        assert (data.dtypes == expected.dtypes).all()
+
+        # values fast parsers reject are parsed by the standard library
+        path = str(tmp_path / "special.json")
+        with open(path, "w") as fp:
+            fp.write('[{"a": NaN, "b": 123456789012345678901234567890}]')
+        data = JSONExtractor(parser=parser)(path)
+        assert data["b"][0] == 123456789012345678901234567890
+        # and integers they would turn into floats
+        with open(path, "w") as fp:
+            fp.write('[{"a": 1, "b": 100000000000000000001}]')
+        data = JSONExtractor(parser=parser)(path)
+        assert data["b"][0] == 100000000000000000001
+        path = str(tmp_path / "special.jsonl")
+        with open(path, "w") as fp:
+            fp.write('{"a": [1, 2]}\n{"a": [3, 4], "b": Infinity}\n')
+        data = JSONLinesExtractor(parser=parser)(path)
+        assert data["a"][1] == [3, 4]
+        assert data["b"][1] == float("inf")
+        with open(path, "w") as fp:
+            fp.write('{"a": -9223372036854775809}\n')
+        data = JSONLinesExtractor(parser=parser)(path)
+        assert data["a"][0] == -9223372036854775809
+
+    def test_invalid_parser(self):
+        with pytest.raises(ValueError):
+            JSONExtractor(parser="yaml")
+        with pytest.raises(ValueError):
+            JSONExtractor(parser="orjson", parse_float=str)
+        assert JSONExtractor(parse_float=str)._parser() == "json"
+        # the default parses arrays incrementally
+        assert JSONExtractor()._parser() == "json"
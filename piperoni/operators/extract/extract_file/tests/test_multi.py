@@ -0,0 +1,72 @@
+import os
+import pytest
+
+from pandas import concat, read_csv
+
+from piperoni.operators.extract.extract_file.csv_ import CSVExtractor
+from piperoni.operators.extract.extract_file.multi import MultiFileExtractor
+
+"""
+This module implements tests for the MultiFileExtractor.
+"""
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+CSV_TEST_FILE = os.path.join(
+    ROOT_DIR,
+    "..",
+    "..",
+    "..",
+    "..",
+    "..",
+    "test_files",
+    "Strehlow and Cook.csv",
+)
+
+
+class TestMultiFileExtractor:
+    """Tests funtionality of MultiFileExtractor"""
+
+    @pytest.fixture
+    def directory(self, tmp_path):
+        """Splits the test file into five csv files."""
+        data = read_csv(CSV_TEST_FILE)
+        size = len(data) // 5 + 1
+        for i in range(5):
+            part = data.iloc[i * size : (i + 1) * size]
+            part.to_csv(tmp_path / f"part_{i}.csv", index=False)
+        return tmp_path
+
+    @pytest.mark.parametrize("executor", ["serial", "thread", "process"])
+    def test_transform(self, directory, executor):
+        """Tests that the files are combined in order."""
+        extractor = MultiFileExtractor(
+            CSVExtractor(), executor=executor, path_column="file"
+        )
+        data = extractor(str(directory / "*.csv"))
+        expected = read_csv(CSV_TEST_FILE)
+        assert data.drop(columns="file").equals(expected)
+        assert data["file"].iloc[0].endswith("part_0.csv")
+        assert data["file"].iloc[-1].endswith("part_4.csv")
+        assert extractor.failures == {}
+
+    def test_failures(self, directory):
+        """Tests that unreadable files are reported and skipped."""
+        paths = [str(directory / "part_0.csv"), str(directory / "missing.csv")]
+        extractor = MultiFileExtractor(CSVExtractor())
+        data = extractor(paths)
+        assert data.equals(read_csv(paths[0]))
+        assert list(extractor.failures) == [paths[1]]
+        assert isinstance(extractor.failures[paths[1]], FileNotFoundError)
+
+        with pytest.raises(FileNotFoundError):
+            MultiFileExtractor(CSVExtractor(), errors="raise")(paths)
+        with pytest.raises(RuntimeError):
+            extractor(paths[1:])
+        with pytest.raises(FileNotFoundError):
+            extractor(str(directory / "*.json"))
+
+    def test_invalid_options(self):
+        with pytest.raises(ValueError):
+            MultiFileExtractor(CSVExtractor(), executor="cluster")
+        with pytest.raises(ValueError):
+            MultiFileExtractor(CSVExtractor(), errors="ignore")
@@ -0,0 +1,63 @@
+import numpy as np
+
+from pandas import DataFrame
+
+from piperoni.operators.extract.extract_file.schema import (
+    DtypeOptimizer,
+    SchemaCache,
+    compact_integer,
+    infer_schema,
+)
+
+"""
+This module implements tests for the inference of compact dtypes.
+"""
+
+
+def test_compact_integer():
+    assert compact_integer(0, 255) == "uint8"
+    assert compact_integer(-1, 127) == "int8"
+    assert compact_integer(-129, 0) == "int16"
+    assert compact_integer(0, 2**40) == "uint64"
+
+
+def test_infer_schema():
+    sample = DataFrame(
+        {
+            "small": [1, 2, 3, 4],
+            "negative": [-40000, 0, 1, 2],
+            "exact": [0.5, 0.25, np.nan, 1.0],
+            "inexact": [0.1, 0.2, 0.3, 0.4],
+            "repeated": ["a", "b", "a", "b"],
+            "distinct": ["a", "b", "c", "d"],
+            "flag": [True, False, True, False],
+        }
+    )
+    schema = infer_schema(sample, strings="object")
+    assert schema == {
+        "small": "uint8",
+        "negative": "int32",
+        "exact": "float32",
+        "repeated": "category",
+    }
+
+
+def test_widen():
+    optimizer = DtypeOptimizer({"a": "uint8", "b": "float32", "c": "uint8"})
+    first = optimizer.apply(DataFrame({"a": [1], "b": [0.5], "c": [1]}))
+    second = optimizer.apply(
+        DataFrame({"a": [-300], "b": [0.1], "c": ["text"]})
+    )
+    assert optimizer.schema == {"a": "int16", "b": "float64"}
+    output = optimizer.concat([first, second])
+    assert output["a"].tolist() == [1, -300]
+    assert output["b"].tolist() == [0.5, 0.1]
+    assert output["c"].tolist() == [1, "text"]
+
+
+def test_schema_cache(tmp_path):
+    key = SchemaCache.key(["a", "b"], {"sep": ","})
+    assert key != SchemaCache.key(["a", "b"], {"sep": ";"})
+    SchemaCache(str(tmp_path)).set(key, {"a": "uint8"})
+    assert SchemaCache(str(tmp_path)).get(key) == {"a": "uint8"}
+    assert SchemaCache().get(key) is None
@@ -0,0 +1,132 @@
+"""Implements a content-addressed cache for the results of pipe steps."""
+
+import os
+import pickle
+import shutil
+import tempfile
+
+from piperoni.utils import fingerprint, file_fingerprint
+
+
+def step_keys(steps: list, input_: object, file_content=True) -> list:
+    """Computes a key identifying the output of every step of a pipe.
+
+    The key of a step hashes its configuration together with the key of
+    the previous step, so it changes whenever the step, any earlier step or
+    the input of the pipe changes. Only the input of the pipe needs to be
+    hashed; string inputs naming a file are hashed with the content of that
+    file.
+
+    Parameters
+    ----------
+    steps: List[BaseOperator]
+        The steps of the pipe.
+    input_: object
+        The input passed to the first step.
+    file_content: bool, optional
+        Whether a file input is hashed with its content, by default True.
+        If False, it is hashed with its size and modification time instead,
+        which does not read the file.
+
+    Returns
+    -------
+    List[str]
+        One key per step.
+    """
+    if isinstance(input_, str) and os.path.isfile(input_):
+        if file_content:
+            key = fingerprint((input_, file_fingerprint(input_)))
+        else:
+            stat = os.stat(input_)
+            key = fingerprint((input_, stat.st_size, stat.st_mtime_ns))
+    else:
+        key = fingerprint(input_)
+    keys = []
+    for step in steps:
+        key = fingerprint((key, step))
+        keys.append(key)
+    return keys
+
+
+class ResultCache:
+    """An on-disk cache of results, keyed on the content that produced them.
+
+    Results are pickled, so any picklable object can be cached and
+    DataFrames come back with their dtypes and index intact. Writes are
+    atomic, which lets several pipes or processes share one cache directory.
+
+    Parameters
+    ----------
+    path: str
+        Directory holding the cached results. Created if it does not exist.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+
+    def __contains__(self, key: str) -> bool:
+        return os.path.isfile(self._file(key))
+
+    def load(self, key: str) -> object:
+        """Reads back the result stored under key.
+
+        Parameters
+        ----------
+        key: str
+            The cache key of the result.
+
+        Returns
+        -------
+        object
+            The cached result.
+        """
+        with open(self._file(key), "rb") as fh:
+            return pickle.load(fh)
+
+    def save(self, key: str, result: object) -> None:
+        """Stores a result under key.
+
+        Parameters
+        ----------
+        key: str
+            The cache key of the result.
+        result: object
+            The result to cache. Must be picklable.
+        """
+        fd, tmp_path = tempfile.mkstemp(dir=self.path, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as fh:
+                pickle.dump(result, fh, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self._file(key))
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+
+    def delete(self, key: str) -> None:
+        """Removes the result stored under key, if any.
+
+        Parameters
+        ----------
+        key: str
+            The cache key of the result.
+        """
+        try:
+            os.remove(self._file(key))
+        except FileNotFoundError:
+            pass
+
+    def clear(self) -> None:
+        """Removes every cached result."""
+        shutil.rmtree(self.path)
+        os.makedirs(self.path)
+
+    def step_keys(self, steps: list, input_: object) -> list:
+        """Computes the cache key of every step of a pipe.
+
+        See the step_keys function.
+        """
+        return step_keys(steps, input_)
+
+    def _file(self, key: str) -> str:
+        return os.path.join(self.path, f"{key}.pkl")
@@ -1,25 +1,209 @@
-"""Implements checkpoints, which save intermediate data to a file."""
+"""Implements checkpoints, which save intermediate data to a file.
 
-from pandas import DataFrame
+Checkpoints can be written in several formats. CSV is readable anywhere,
+while the binary columnar formats are smaller, faster to write and read
+back, and keep the dtypes and index of the data. They require pyarrow.
+
+Examples
+--------
+Checkpointing to compressed Parquet and reading the checkpoint back::
+  Checkpoint("checkpoint.parquet", compression="zstd")(df)
+  df = read_checkpoint("checkpoint.parquet")
+"""
+
+import os
+import threading
+
+from concurrent.futures import ThreadPoolExecutor
+
+from pandas import DataFrame, read_csv, read_parquet
 from piperoni.operators.passthrough_operator import PassthroughOperator
+from piperoni.utils import snapshot
+
+
+def _write_csv(df, path, compression, **kwargs):
+    # like pandas, infer the codec from the extension, e.g. ".csv.gz"
+    df.to_csv(path, compression=compression or "infer", **kwargs)
+
+
+def _read_csv(path, compression, **kwargs):
+    # Checkpoints keep the index of the data unless told otherwise
+    kwargs.setdefault("index_col", 0)
+    return read_csv(path, compression=compression or "infer", **kwargs)
+
+
+def _write_parquet(df, path, compression, **kwargs):
+    df.to_parquet(path, compression=compression, **kwargs)
+
+
+def _read_parquet(path, compression, **kwargs):
+    return read_parquet(path, **kwargs)
+
+
+def _write_feather(df, path, compression, **kwargs):
+    import pyarrow as pa
+    from pyarrow import feather
+
+    # DataFrame.to_feather cannot store an index, so the table is built here
+    table = pa.Table.from_pandas(df, preserve_index=True)
+    feather.write_feather(
+        table, path, compression=compression or "uncompressed", **kwargs
+    )
+
+
+def _read_feather(path, compression, **kwargs):
+    from pyarrow import feather
+
+    return feather.read_table(path, **kwargs).to_pandas()
+
+
+def _write_arrow(df, path, compression, **kwargs):
+    import pyarrow as pa
+
+    table = pa.Table.from_pandas(df, preserve_index=True)
+    options = pa.ipc.IpcWriteOptions(compression=compression, **kwargs)
+    with pa.OSFile(path, "wb") as sink:
+        with pa.ipc.new_file(sink, table.schema, options=options) as writer:
+            writer.write_table(table)
+
+
+def _read_arrow(path, compression, **kwargs):
+    import pyarrow as pa
+
+    with pa.memory_map(path) as source:
+        return pa.ipc.open_file(source).read_pandas(**kwargs)
+
+
+# Checkpoint formats by name: file extension, writer and reader. Writers
+# take the DataFrame, the path, the compression and keyword arguments,
+# readers take the path, the compression and keyword arguments. Binary
+# formats store their compression and ignore it when reading.
+CHECKPOINT_FORMATS = {
+    "csv": (".csv", _write_csv, _read_csv),
+    "parquet": (".parquet", _write_parquet, _read_parquet),
+    "feather": (".feather", _write_feather, _read_feather),
+    "arrow": (".arrow", _write_arrow, _read_arrow),
+}
+
+
+def register_checkpoint_format(name, extension, writer, reader):
+    """Adds a checkpoint format or replaces an existing one.
+
+    Parameters
+    ----------
+    name: str
+        Name of the format.
+    extension: str
+        File extension of the format, including the leading dot.
+    writer: Callable
+        Function writing a DataFrame, called as
+        writer(df, path, compression, **kwargs).
+    reader: Callable
+        Function reading a DataFrame, called as
+        reader(path, compression, **kwargs).
+    """
+    CHECKPOINT_FORMATS[name] = (extension, writer, reader)
+
+
+def checkpoint_format(path: str, format=None) -> str:
+    """Returns the name of the checkpoint format of a file.
+
+    Parameters
+    ----------
+    path: str
+        File path of the checkpoint.
+    format: str or None, optional
+        Name of the format. If None, it is inferred from the file extension,
+        falling back to CSV.
+
+    Returns
+    -------
+    str
+        The name of the format.
+
+    Raises
+    ------
+    ValueError
+        If format is not a registered checkpoint format.
+    """
+    if format is None:
+        extension = os.path.splitext(path)[1].lower()
+        for name, (format_extension, _, _) in CHECKPOINT_FORMATS.items():
+            if extension == format_extension:
+                return name
+        return "csv"
+    if format not in CHECKPOINT_FORMATS:
+        raise ValueError(
+            f"Unknown checkpoint format {format}. Expected one of "
+            f"{list(CHECKPOINT_FORMATS)}."
+        )
+    return format
+
+
+def read_checkpoint(
+    path: str, format=None, compression=None, **kwargs: dict
+) -> DataFrame:
+    """Reads back the data saved by a checkpoint.
+
+    Parameters
+    ----------
+    path: str
+        File path of the checkpoint.
+    format: str or None, optional
+        Name of the checkpoint format. If None, it is inferred from the file
+        extension.
+    compression: str or None, optional
+        Compression codec the checkpoint was written with. Only needed for
+        CSV checkpoints whose extension does not name the codec.
+    kwargs: keyword arguments
+        Keyword arguments passed to the reader of the format. CSV
+        checkpoints are read with index_col=0 unless it is given.
+
+    Returns
+    -------
+    DataFrame
+        The checkpointed data.
+    """
+    reader = CHECKPOINT_FORMATS[checkpoint_format(path, format)][2]
+    return reader(path, compression, **kwargs)
 
 
 class Checkpoint(PassthroughOperator):
     """A checkpoint for saving the state of data in a pipe.
 
-    The checkpoint is saved in CSV format.
-
     Parameters
     ----------
     path: str
         File path for the checkpoint file.
+    format: str or None, optional
+        Checkpoint format: "csv", "parquet", "feather", "arrow" (the Arrow
+        IPC file format) or any registered format. If None, it is inferred
+        from the extension of path, falling back to CSV.
+    compression: str or None, optional
+        Compression codec of the file, e.g. "gzip" for CSV, "snappy" or
+        "zstd" for Parquet and "lz4" or "zstd" for Feather and Arrow. If
+        None, CSV files are compressed with the codec their extension
+        names, like "x.csv.gz", and files of other formats are not
+        compressed.
     kwargs: keyword arguments
         Customizes the checkpoint file. Keyword arguments passed to the
-        DataFrame.to_csv method
+        writer of the format, like the DataFrame.to_csv method for CSV.
+
+    Raises
+    ------
+    ValueError
+        If format is not a registered checkpoint format.
     """
 
-    def __init__(self, path: str, **kwargs: dict):
+    # Hashes the data instead of holding a copy of it
+    verification = "fingerprint"
+
+    def __init__(
+        self, path: str, format=None, compression=None, **kwargs: dict
+    ):
         self.path = path
+        self.format = checkpoint_format(path, format)
+        self.compression = compression
         self.kwargs = kwargs
 
     def test_equals(self, input_, output_) -> bool:
@@ -38,5 +222,122 @@ class Checkpoint(PassthroughOperator):
         DataFrame
             The unaltered data.
         """
-        df.to_csv(self.path, **self.kwargs)
+        writer = CHECKPOINT_FORMATS[self.format][1]
+        writer(df, self.path, self.compression, **self.kwargs)
         return df
+
+
+class CheckpointWriter:
+    """Writes checkpoints in background threads.
+
+    Submitting a checkpoint takes a snapshot of the data, unless told the
+    data is not modified before the write ends, and returns immediately, so
+    the pipe can continue while the file is written. Once max_pending writes
+    are queued, submitting blocks until one of them ends before taking the
+    snapshot, so at most max_pending snapshots are held in memory.
+
+    Parameters
+    ----------
+    max_workers: int, optional
+        Number of writer threads. Defaults to 1.
+    max_pending: int, optional
+        Maximum number of queued or running writes. Defaults to 2.
+
+    Examples
+    --------
+    Writing checkpoints in the background::
+      writer = CheckpointWriter()
+      writer.submit(Checkpoint("step_1.parquet"), df)
+      writer.flush()
+    """
+
+    def __init__(self, max_workers: int = 1, max_pending: int = 2):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self._executor = None
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._futures = []
+
+    def submit(
+        self,
+        checkpoint: Checkpoint,
+        df: DataFrame,
+        callback=None,
+        copy: bool = True,
+    ) -> None:
+        """Queues a checkpoint of df.
+
+        Parameters
+        ----------
+        checkpoint: Checkpoint
+            The checkpoint to write.
+        df: DataFrame
+            The data to checkpoint.
+        callback: Callable or None, optional
+            Function called without arguments in the writer thread once the
+            checkpoint is written.
+        copy: bool, optional
+            Whether to write a snapshot of df, so that later changes to it
+            are not written. Without copy-on-write the snapshot is a deep
+            copy, so pass False when df is not modified until flush.
+            Defaults to True.
+        """
+        # the slot is taken before the snapshot, so that no more than
+        # max_pending snapshots exist at once
+        self._slots.acquire()
+        try:
+            data = snapshot(df) if copy else df
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(self.max_workers)
+            future = self._executor.submit(
+                self._write, checkpoint, data, callback
+            )
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        self._futures.append(future)
+
+    @staticmethod
+    def _write(checkpoint, data, callback):
+        checkpoint.transform(data)
+        if callback is not None:
+            callback()
+
+    def __getstate__(self):
+        """Only the configuration of the writer is pickled."""
+        return {
+            "max_workers": self.max_workers,
+            "max_pending": self.max_pending,
+        }
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    @property
+    def pending(self) -> int:
+        """Number of queued or running writes."""
+        return sum(not future.done() for future in self._futures)
+
+    def flush(self) -> None:
+        """Waits for every queued write to end.
+
+        Raises
+        ------
+        Exception
+            The first error raised by a write, after all writes ended.
+        """
+        futures, self._futures = self._futures, []
+        errors = [future.exception() for future in futures]
+        for error in errors:
+            if error is not None:
+                raise error
+
+    def close(self) -> None:
+        """Waits for every queued write and stops the writer threads."""
+        try:
+            self.flush()
+        finally:
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
@@ -0,0 +1,140 @@
+import os
+import pytest
+
+from functools import partial
+
+from pandas import DataFrame, read_csv
+
+from piperoni.operators.extract.extract_file.csv_ import CSVExtractor
+from piperoni.operators.load.cache import ResultCache
+from piperoni.operators.pipe import Pipe
+from piperoni.operators.transform.featurize.featurizer import (
+    CustomFeaturizer,
+)
+from piperoni.operators.transform.transform_value.value_transformers import (
+    Normalizer,
+)
+from piperoni.utils import fingerprint
+
+"""
+This module implements tests for the ResultCache.
+"""
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+CSV_TEST_FILE = os.path.join(
+    ROOT_DIR, "..", "..", "..", "..", "test_files", "Strehlow and Cook.csv"
+)
+
+
+class CountingNormalizer(Normalizer):
+    """Normalizer that counts how many times it is applied."""
+
+    calls = 0
+
+    def transform(self, df: DataFrame) -> DataFrame:
+        CountingNormalizer.calls += 1
+        return super().transform(df)
+
+
+class TestResultCache:
+    """Tests funtionality of ResultCache"""
+
+    def test_fingerprint(self):
+        """Tests that fingerprints follow content, not identity."""
+        df = read_csv(CSV_TEST_FILE)
+        assert fingerprint(df) == fingerprint(df.copy())
+        modified = df.copy()
+        modified.iloc[0, 1] = "modified"
+        assert fingerprint(df) != fingerprint(modified)
+        assert fingerprint(Normalizer(["a"], [1.0])) == fingerprint(
+            Normalizer(["a"], [1.0])
+        )
+        assert fingerprint(Normalizer(["a"], [1.0])) != fingerprint(
+            Normalizer(["a"], [2.0])
+        )
+
+    def test_pipe(self, tmp_path):
+        """Tests that only steps after a changed step are recomputed."""
+        cache = ResultCache(str(tmp_path))
+
+        def build_pipe(delta):
+            return Pipe(
+                [
+                    CSVExtractor(),
+                    CountingNormalizer(["Band gap"], [1.0]),
+                    Normalizer(["Band gap"], [delta]),
+                ],
+                cache=cache,
+            )
+
+        CountingNormalizer.calls = 0
+        expected = build_pipe(1.0)(CSV_TEST_FILE)
+        assert CountingNormalizer.calls == 1
+
+        # unchanged pipe is fully read back from the cache
+        assert build_pipe(1.0)(CSV_TEST_FILE).equals(expected)
+        assert CountingNormalizer.calls == 1
+
+        # changing the last step reuses the output of the earlier steps
+        output = build_pipe(2.0)(CSV_TEST_FILE)
+        assert CountingNormalizer.calls == 1
+        difference = (output["Band gap"] - expected["Band gap"]).dropna()
+        assert difference.round(6).eq(1).all()
+
+        cache.clear()
+        build_pipe(1.0)(CSV_TEST_FILE)
+        assert CountingNormalizer.calls == 2
+
+    def test_fingerprint_framing(self):
+        """Tests that nested containers do not run together."""
+        assert fingerprint([[1], 2]) != fingerprint([[1, 2]])
+        assert fingerprint(("a", "b")) != fingerprint(("ab",))
+        assert fingerprint([[1], 2]) == fingerprint([[1], 2])
+
+    def test_fingerprint_functions(self):
+        """Tests that functions are hashed with the values they close over
+        and the globals they read."""
+
+        def make(delta):
+            def add(df):
+                return df + delta
+
+            return add
+
+        assert fingerprint(make(1)) == fingerprint(make(1))
+        assert fingerprint(make(1)) != fingerprint(make(2))
+        assert fingerprint(partial(max, 1)) != fingerprint(partial(max, 2))
+
+        global OFFSET
+        OFFSET = 1
+        before = fingerprint(read_offset)
+        OFFSET = 2
+        assert fingerprint(read_offset) != before
+
+    def test_pipe_closures(self, tmp_path):
+        """Tests that steps built from different closures are not read back
+        from each other's cached results."""
+        cache = ResultCache(str(tmp_path))
+
+        def make(delta):
+            def shift(df):
+                return DataFrame({"shifted": df["Band gap"] + delta})
+
+            return shift
+
+        def build_pipe(delta):
+            return Pipe(
+                [CSVExtractor(), CustomFeaturizer(make(delta))], cache=cache
+            )
+
+        first = build_pipe(1.0)(CSV_TEST_FILE)
+        second = build_pipe(2.0)(CSV_TEST_FILE)
+        difference = (second["shifted"] - first["shifted"]).dropna()
+        assert difference.round(6).eq(1).all()
+
+
+OFFSET = 0
+
+
+def read_offset(df):
+    return df + OFFSET
@@ -1,19 +1,38 @@
 import os
+import pickle
 import pytest
+import threading
 
 import piperoni as etl
 
 from glob import glob
 
-from pandas import read_csv
+from pandas import DataFrame, read_csv
 
-from piperoni.operators.load.checkpoint import Checkpoint
+from piperoni.operators.load import checkpoint
+from piperoni.operators.load.checkpoint import (
+    Checkpoint,
+    CheckpointWriter,
+    read_checkpoint,
+)
 
 """
 This module implements tests for the Checkpoint.
 """
 
 
+class BlockedCheckpoint(Checkpoint):
+    """Checkpoint whose writes wait for an event."""
+
+    def __init__(self, path, event):
+        super().__init__(path)
+        self.event = event
+
+    def transform(self, df):
+        self.event.wait(5)
+        return super().transform(df)
+
+
 class TestCheckpoint:
     """Tests funtionality of Checkpoint"""
 
@@ -61,9 +80,150 @@ class TestCheckpoint:
         )
         assert result.equals(dataframe)
 
+    @pytest.mark.parametrize(
+        "format,compression",
+        [
+            ("csv", None),
+            ("csv", "gzip"),
+            ("parquet", None),
+            ("parquet", "zstd"),
+            ("feather", None),
+            ("feather", "lz4"),
+            ("arrow", None),
+            ("arrow", "zstd"),
+        ],
+    )
+    def test_formats(self, tmp_path, dataframe, format, compression):
+        """Tests that every format reads back the checkpointed data."""
+        pytest.importorskip("pyarrow")
+        df = dataframe.set_index(dataframe.index * 2)
+        path = str(tmp_path / f"checkpoint.{format}")
+        assert Checkpoint(path, format, compression)(df).equals(df)
+        if format == "csv":
+            result = read_checkpoint(
+                path, compression=compression, float_precision="round_trip"
+            )
+        else:
+            result = read_checkpoint(path)
+        assert result.equals(df)
+        if format != "csv":
+            # binary formats keep the dtypes and the index
+            assert (result.dtypes == df.dtypes).all()
+
+    def test_compression_extension(self, tmp_path, dataframe):
+        """Tests that CSV checkpoints are compressed like their extension
+        names."""
+        path = str(tmp_path / "checkpoint.csv.gz")
+        Checkpoint(path)(dataframe)
+        with open(path, "rb") as fh:
+            assert fh.read(2) == b"\x1f\x8b"
+        result = read_checkpoint(path, float_precision="round_trip")
+        assert result.equals(dataframe)
+
+    def test_invalid_format(self):
+        with pytest.raises(ValueError):
+            Checkpoint("checkpoint.csv", "xml")
+
     @classmethod
     def teardown_class(cls):
         """Cleans up checkpoint files."""
         files = glob("./checkpoint*.csv")
         for f in files:
             os.remove(f)
+
+
+class TestCheckpointWriter:
+    """Tests funtionality of CheckpointWriter"""
+
+    def test_submit(self, tmp_path):
+        """Tests that writes see the data as it was when submitted."""
+        writer = CheckpointWriter()
+        df = DataFrame({"a": [1, 2, 3]})
+        path = str(tmp_path / "checkpoint.csv")
+        writer.submit(Checkpoint(path), df)
+        df.loc[0, "a"] = 10
+        writer.close()
+        assert read_checkpoint(path)["a"].tolist() == [1, 2, 3]
+
+    def test_submit_without_copy(self, tmp_path, monkeypatch):
+        """Tests that data is written as is when no copy is asked for."""
+        monkeypatch.setattr(checkpoint, "snapshot", None)
+        writer = CheckpointWriter()
+        df = DataFrame({"a": [1, 2, 3]})
+        path = str(tmp_path / "checkpoint.csv")
+        writer.submit(Checkpoint(path), df, copy=False)
+        writer.close()
+        assert read_checkpoint(path)["a"].tolist() == [1, 2, 3]
+
+    def test_backpressure(self, tmp_path):
+        """Tests that submitting blocks once max_pending writes wait."""
+        writer = CheckpointWriter(max_pending=1)
+        event = threading.Event()
+        df = DataFrame({"a": [1]})
+        writer.submit(BlockedCheckpoint(str(tmp_path / "1.csv"), event), df)
+        blocked = threading.Thread(
+            target=writer.submit,
+            args=(Checkpoint(str(tmp_path / "2.csv")), df),
+        )
+        blocked.start()
+        blocked.join(0.2)
+        assert blocked.is_alive()
+        assert not os.path.exists(tmp_path / "2.csv")
+
+        event.set()
+        blocked.join(5)
+        writer.flush()
+        assert writer.pending == 0
+        assert os.path.exists(tmp_path / "2.csv")
+        writer.close()
+
+    def test_snapshot_after_slot(self, tmp_path, monkeypatch):
+        """Tests that data is only snapshotted once a slot is free, and that
+        the slot is freed when the snapshot fails."""
+        snapshots = []
+
+        def counting_snapshot(df):
+            snapshots.append(df)
+            return df.copy()
+
+        monkeypatch.setattr(checkpoint, "snapshot", counting_snapshot)
+        writer = CheckpointWriter(max_pending=1)
+        event = threading.Event()
+        df = DataFrame({"a": [1]})
+        writer.submit(BlockedCheckpoint(str(tmp_path / "1.csv"), event), df)
+        blocked = threading.Thread(
+            target=writer.submit,
+            args=(Checkpoint(str(tmp_path / "2.csv")), df),
+        )
+        blocked.start()
+        blocked.join(0.2)
+        assert len(snapshots) == 1
+
+        event.set()
+        blocked.join(5)
+        writer.flush()
+        assert len(snapshots) == 2
+
+        def failing_snapshot(df):
+            raise MemoryError
+
+        monkeypatch.setattr(checkpoint, "snapshot", failing_snapshot)
+        with pytest.raises(MemoryError):
+            writer.submit(Checkpoint(str(tmp_path / "3.csv")), df)
+        monkeypatch.setattr(checkpoint, "snapshot", counting_snapshot)
+        writer.submit(Checkpoint(str(tmp_path / "3.csv")), df)
+        writer.close()
+        assert os.path.exists(tmp_path / "3.csv")
+
+    def test_flush_errors(self, tmp_path):
+        """Tests that errors of background writes are raised by flush."""
+        writer = CheckpointWriter()
+        path = str(tmp_path / "missing" / "checkpoint.csv")
+        writer.submit(Checkpoint(path), DataFrame({"a": [1]}))
+        with pytest.raises(OSError):
+            writer.flush()
+        writer.close()
+
+    def test_pickle(self):
+        writer = pickle.loads(pickle.dumps(CheckpointWriter(2, 4)))
+        assert (writer.max_workers, writer.max_pending) == (2, 4)
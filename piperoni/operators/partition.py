@@ -0,0 +1,313 @@
+"""Implements the partitioned execution of streamable steps in processes.
+
+A partitioned Pipe splits a DataFrame into shards of consecutive rows and
+applies its streamable steps to every shard in a process pool. Streamable
+steps are row-local, so concatenating the transformed shards in order gives
+the output of applying the steps to the whole DataFrame. Steps that are not
+streamable declare that they are not partition-safe, and run on the merged
+output.
+
+Shards travel between processes through shared memory instead of being
+pickled into the pipes of the pool: a shard is written once into a shared
+memory block, as an Arrow IPC stream when pyarrow is installed and the data
+has a lossless Arrow representation, or pickled otherwise, and the other
+process reads it from there.
+
+Examples
+--------
+Applying steps to four shards of a DataFrame::
+  df = apply_partitioned([HeaderMap(config), Normalizer(columns, deltas)],
+                         df, partitions=4)
+"""
+
+import os
+import pickle
+
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from pandas.api.types import infer_dtype, is_extension_array_dtype
+
+# dtype kinds of numpy columns with a lossless Arrow representation:
+# booleans, integers, floats, datetimes and timedeltas
+ARROW_KINDS = "biufmM"
+
+
+class SharedFrame:
+    """A DataFrame stored in a shared memory block.
+
+    SharedFrames are small, so they are cheap to send to other processes,
+    which read the DataFrame from the block they name. The process creating
+    a SharedFrame owns its block until it is read with unlink=True or
+    released.
+
+    Parameters
+    ----------
+    name : str
+        Name of the shared memory block.
+    size : int
+        Number of bytes of the DataFrame in the block.
+    format : str
+        "arrow" for an Arrow IPC stream, "pickle" for a pickled DataFrame.
+    """
+
+    def __init__(self, name: str, size: int, format: str):
+        self.name = name
+        self.size = size
+        self.format = format
+
+    @classmethod
+    def write(cls, df: pd.DataFrame) -> "SharedFrame":
+        """Writes a DataFrame into a new shared memory block.
+
+        Parameters
+        ----------
+        df : pd.DataFrame
+            The DataFrame.
+
+        Returns
+        -------
+        SharedFrame
+            The stored DataFrame.
+        """
+        table = arrow_table(df)
+        if table is None:
+            data = pickle.dumps(df, protocol=pickle.HIGHEST_PROTOCOL)
+            block = _create(len(data))
+            block.buf[: len(data)] = data
+            block.close()
+            return cls(block.name, len(data), "pickle")
+
+        import pyarrow as pa
+
+        mock = pa.MockOutputStream()
+        with pa.ipc.new_stream(mock, table.schema) as writer:
+            writer.write_table(table)
+        block = _create(mock.size())
+        sink = pa.FixedSizeBufferWriter(pa.py_buffer(block.buf))
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        sink.close()
+        # the writers reference the block, which cannot be closed before
+        # they are released
+        del sink, writer
+        block.close()
+        return cls(block.name, mock.size(), "arrow")
+
+    def read(self, unlink: bool = False) -> pd.DataFrame:
+        """Reads the DataFrame.
+
+        Parameters
+        ----------
+        unlink : bool, optional
+            Whether to release the block after reading it, by default False
+
+        Returns
+        -------
+        pd.DataFrame
+            A copy of the stored DataFrame, independent from the block.
+        """
+        block = shared_memory.SharedMemory(name=self.name)
+        try:
+            if self.format == "pickle":
+                return pickle.loads(block.buf[: self.size])
+            df = self._read_arrow(block)
+            try:
+                block.close()
+            except BufferError:
+                # some columns, like categorical codes, are views of the
+                # block
+                df = df.copy()
+            return df
+        finally:
+            block.close()
+            if unlink:
+                block.unlink()
+
+    def release(self) -> None:
+        """Frees the shared memory block."""
+        block = shared_memory.SharedMemory(name=self.name)
+        block.close()
+        block.unlink()
+
+    def _read_arrow(self, block):
+        import pyarrow as pa
+
+        source = pa.py_buffer(block.buf)[: self.size]
+        with pa.ipc.open_stream(source) as reader:
+            table = reader.read_all()
+        del source, reader
+        return table.to_pandas()
+
+
+def _create(size):
+    # shared memory blocks cannot be empty
+    return shared_memory.SharedMemory(create=True, size=max(size, 1))
+
+
+def arrow_table(df):
+    """Returns df as an Arrow table if pyarrow is installed and the table
+    converts back to an identical DataFrame, and None otherwise."""
+    try:
+        import pyarrow as pa
+    except ImportError:
+        return None
+    # Arrow requires unique string column names
+    if not all(isinstance(column, str) for column in df.columns):
+        return None
+    if df.columns.has_duplicates:
+        return None
+    for _, values in df.items():
+        if not _arrow_compatible(values):
+            return None
+    try:
+        return pa.Table.from_pandas(df, preserve_index=True)
+    except (pa.ArrowException, TypeError, ValueError):
+        return None
+
+
+def _arrow_compatible(values):
+    """Whether a column keeps its dtype and values through Arrow."""
+    dtype = values.dtype
+    if isinstance(dtype, pd.CategoricalDtype):
+        return infer_dtype(dtype.categories, skipna=True) in (
+            "string",
+            "integer",
+            "floating",
+        )
+    if is_extension_array_dtype(dtype):
+        if getattr(dtype, "storage", "python") != "python":
+            return False  # pyarrow strings come back as python strings
+        # nullable booleans, integers, floats and strings, and dates with a
+        # time zone
+        return dtype.name.lower().startswith(
+            ("boolean", "int", "uint", "float", "string", "datetime64")
+        )
+    if dtype.kind == "O":
+        # other objects, like lists, come back as different types
+        return infer_dtype(values, skipna=True) in ("string", "empty")
+    return dtype.kind in ARROW_KINDS
+
+
+def split_rows(df: pd.DataFrame, partitions: int) -> list:
+    """Splits a DataFrame into partitions of consecutive rows of similar
+    sizes, leaving out empty partitions.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        The DataFrame.
+    partitions : int
+        Number of partitions.
+
+    Returns
+    -------
+    List[pd.DataFrame]
+        The partitions, in order. There are fewer partitions than requested
+        when df has fewer rows.
+    """
+    bounds = np.linspace(0, len(df.index), partitions + 1).astype(int)
+    return [
+        df.iloc[start:stop]
+        for start, stop in zip(bounds[:-1], bounds[1:])
+        if stop > start
+    ]
+
+
+def _reindexed(df):
+    """Shallow copy of df with a 0-based index."""
+    df = df.copy(deep=False)
+    df.index = pd.RangeIndex(len(df.index))
+    return df
+
+
+def _apply_shard(steps, shard):
+    """Applies steps to the DataFrame of a SharedFrame, in a worker."""
+    df = shard.read()
+    for step in steps:
+        df = step(df)
+    return SharedFrame.write(df)
+
+
+def apply_partitioned(
+    steps: list, df: pd.DataFrame, partitions: int, max_workers=None
+) -> pd.DataFrame:
+    """Applies streamable steps to shards of a DataFrame in parallel
+    processes.
+
+    Each shard is given a fresh 0-based index while it is transformed, like
+    a whole DataFrame would have, and gets its original index back
+    afterwards.
+
+    Parameters
+    ----------
+    steps : List[BaseOperator]
+        Streamable steps.
+    df : pd.DataFrame
+        Input of the first step.
+    partitions : int
+        Number of shards.
+    max_workers : int or None, optional
+        Maximum number of processes. Defaults to the number of shards, up to
+        the number of processors.
+
+    Returns
+    -------
+    pd.DataFrame
+        The transformed shards, concatenated in order.
+    """
+    shards = split_rows(df, partitions)
+    indexes = [shard.index for shard in shards]
+    if len(shards) < 2:
+        outputs = []
+        for shard in shards:
+            shard = _reindexed(shard)
+            for step in steps:
+                shard = step(shard)
+            outputs.append(shard)
+    else:
+        outputs = _apply_in_pool(steps, shards, max_workers)
+    if not outputs:
+        for step in steps:
+            df = step(df)
+        return df
+    for output, index in zip(outputs, indexes):
+        output.index = index
+    return pd.concat(outputs, copy=False)
+
+
+def _apply_in_pool(steps, shards, max_workers):
+    """Applies steps to shards in a process pool, sharing the shards and
+    their outputs through shared memory."""
+    if max_workers is None:
+        max_workers = min(len(shards), os.cpu_count() or 1)
+    inputs = []
+    results = []
+    try:
+        for shard in shards:
+            inputs.append(SharedFrame.write(_reindexed(shard)))
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            futures = [
+                pool.submit(_apply_shard, steps, shard) for shard in inputs
+            ]
+            # the blocks of all completed shards are collected before an
+            # error is raised, so that they can be freed
+            for future in futures:
+                try:
+                    results.append(future.result())
+                except Exception as caught_exception:
+                    results.append(caught_exception)
+        for result in results:
+            if isinstance(result, Exception):
+                raise result
+        return [result.read() for result in results]
+    finally:
+        for shared in inputs + results:
+            if isinstance(shared, SharedFrame):
+                try:
+                    shared.release()
+                except FileNotFoundError:
+                    pass
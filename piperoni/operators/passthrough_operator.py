@@ -4,6 +4,8 @@ from abc import abstractmethod
 from copy import deepcopy
 import pandas as pd
 
+from piperoni.utils import fingerprint
+
 """
 This module implements the PassthroughOperator object.
 
@@ -23,8 +25,19 @@ class PassthroughOperator(BaseOperator):
     """
     Base operator for operations that should not
     modify the data and pass it through unchanged.
+
+    Attributes
+    ----------
+    verification: str or None
+        How calling the operator checks that the data passed through
+        unchanged. "copy" deep-copies the input and compares it to the
+        output with test_equals. "fingerprint" compares content hashes of
+        the input before and of the output after the transform, so no copy
+        of the data is held in memory. None skips the check.
     """
 
+    verification = "copy"
+
     def test_equals(self, input_, output_) -> bool:
         if isinstance(input_, pd.DataFrame):
             return input_.equals(output_)
@@ -36,6 +49,19 @@ class PassthroughOperator(BaseOperator):
 
     def __call__(self, *args, **kwargs) -> object:
         """Class instances emulate callable methods."""
+        if self.verification is None:
+            return self.transform(*args, **kwargs)
+        if self.verification == "fingerprint":
+            input_fingerprint = fingerprint(args[0])
+            output_ = self.transform(*args, **kwargs)
+            if fingerprint(output_) != input_fingerprint:
+                raise RuntimeError(self.error_message(args[0], output_))
+            return output_
+        if self.verification != "copy":
+            raise ValueError(
+                f"verification must be 'copy', 'fingerprint' or None, "
+                f"but got {self.verification}"
+            )
         # TODO: Is this a problem?
         input_ = deepcopy(args[0])
         output_ = self.transform(*args, **kwargs)
@@ -1,16 +1,33 @@
-from functools import reduce
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import partial, reduce
 
-from typing import List
+from typing import Iterator, List
 
 from abc import ABC, abstractmethod
 
 from sys import exit
 import warnings
+import glob
+import json
 import os
 
 from piperoni.operators.base import BaseOperator
 from piperoni.operators.analyze.comparer import CompareOperator
-from piperoni.operators.load.checkpoint import Checkpoint
+from piperoni.operators.load.cache import ResultCache, step_keys
+from piperoni.operators.load.checkpoint import (
+    CHECKPOINT_FORMATS,
+    Checkpoint,
+    CheckpointWriter,
+    read_checkpoint,
+)
+from piperoni.operators.partition import apply_partitioned
+from piperoni.operators.plan import (
+    modifies_input,
+    optimize_steps,
+    required_columns,
+)
+from piperoni.operators.profiling import Profiler
 from piperoni.utils import datetime_to_prettystr
 
 import logging
@@ -18,6 +35,35 @@ import pandas as pd
 import numpy as np
 import copy
 
+# Format of pipe log records. The fields besides the message are attributes
+# given to records by the pipe.
+LOG_FORMAT = "%(indent)s%(pipe_tag)s - %(operator)s: %(message)s"
+
+
+# Context of the pipe running in the current thread, or None
+_LOG_CONTEXT = ContextVar("piperoni_log_context", default=None)
+
+# Context of records logged outside of a pipe run
+_NO_LOG_CONTEXT = {"indent": "", "pipe_tag": "", "operator": ""}
+
+
+class _LogContextFilter(logging.Filter):
+    """Adds pipe context to log records emitted without it.
+
+    Operators log through the shared logger directly, so their records get
+    the context of the pipe applying them in the current thread or task.
+    """
+
+    def filter(self, record):
+        context = _LOG_CONTEXT.get() or _NO_LOG_CONTEXT
+        for key, value in context.items():
+            if not hasattr(record, key):
+                setattr(record, key, value)
+        return True
+
+
+_LOG_CONTEXT_FILTER = _LogContextFilter()
+
 
 class Pipe(BaseOperator):
     """A chain of lower-level operators.
@@ -51,10 +97,76 @@ class Pipe(BaseOperator):
     autocheckpoint: bool, optional
         Whether to turn on auto-checkpointing dataframes post transforms.
 
+    checkpoint_format: str, optional
+        Format of the autocheckpoint files: "csv", "parquet", "feather",
+        "arrow" or any other registered checkpoint format. Defaults to
+        "csv".
+
+    checkpoint_compression: str or None, optional
+        Compression codec of the autocheckpoint files. Defaults to None.
+
+    background_checkpoint: bool, optional
+        Whether autocheckpoints are written in a background thread while
+        the pipe continues. The pipe waits for the pending writes before it
+        returns. Defaults to False.
+
+    max_pending_checkpoints: int, optional
+        Number of background autocheckpoint writes after which the pipe
+        waits for one of them to end before continuing. Defaults to 2.
+
+    cache: ResultCache or str or None, optional
+        Cache for the output of every step, or the directory of one. Steps
+        whose configuration, earlier steps and pipe input are unchanged are
+        read back from the cache instead of being recomputed.
+
+    chunksize: int or None, optional
+        Turns on streaming when the first step can read its input in chunks
+        (it has a transform_chunks method, like CSVExtractor). Chunks of at
+        most chunksize rows are pushed one by one through the streamable
+        steps that follow it, and are only concatenated before the first
+        step that is not streamable. Autocompare is skipped and
+        autocheckpoint applies to the concatenated output of the streamed
+        steps.
+
+    profile: bool, optional
+        Whether to record a StepProfile of wall time, CPU time, memory and
+        data sizes for every applied operator in the report attribute.
+        Profiling also turns on when a callback is subscribed.
+
+    trace_memory: bool, optional
+        Whether profiles measure memory peaks with tracemalloc, which slows
+        down the pipe. Defaults to False.
+
+    lazy: bool, optional
+        Whether the steps are optimized into a plan before every run, see
+        optimize_steps. The plan fuses consecutive renames and
+        normalizations, makes the extractor read only the columns that
+        later steps declare they need and removes copies of intermediate
+        data.
+        Step indices of checkpoints, cached results, profiles and restart
+        then refer to the steps of the plan attribute. Defaults to False.
+
+    partitions: int or None, optional
+        Turns on partitioned execution. A DataFrame passed to a streamable
+        step is split into this number of shards of consecutive rows, and
+        the streamable steps from that step onwards are applied to the
+        shards in a process pool, before their outputs are concatenated in
+        order. Steps that are not streamable are not partition-safe and
+        run on the concatenated output. Shards are exchanged through shared
+        memory, see apply_partitioned. Autocompare is skipped and
+        autocheckpoint applies to the concatenated output of the sharded
+        steps.
+
+    max_workers: int or None, optional
+        Maximum number of processes of partitioned execution. Defaults to
+        the number of partitions, up to the number of processors.
+
     Raises
     ------
     AssertionError
         If the steps passed to the pipe are not instances of BaseOperator.
+    ValueError
+        If checkpoint_format is not a registered checkpoint format.
     """
 
     def __init__(
@@ -67,6 +179,17 @@ class Pipe(BaseOperator):
         file_logging_level=None,
         autocompare=False,
         autocheckpoint=False,
+        checkpoint_format="csv",
+        checkpoint_compression=None,
+        background_checkpoint=False,
+        max_pending_checkpoints=2,
+        cache=None,
+        chunksize=None,
+        profile=False,
+        trace_memory=False,
+        lazy=False,
+        partitions=None,
+        max_workers=None,
     ) -> None:
 
         # Instance variables
@@ -81,6 +204,28 @@ class Pipe(BaseOperator):
         self.file_logging_level = file_logging_level
         self.autocompare = autocompare
         self.autocheckpoint = autocheckpoint
+        if checkpoint_format not in CHECKPOINT_FORMATS:
+            raise ValueError(
+                f"Unknown checkpoint format {checkpoint_format}. Expected "
+                f"one of {list(CHECKPOINT_FORMATS)}."
+            )
+        self.checkpoint_format = checkpoint_format
+        self.checkpoint_compression = checkpoint_compression
+        self.checkpoint_writer = None
+        if background_checkpoint:
+            self.checkpoint_writer = CheckpointWriter(
+                max_pending=max_pending_checkpoints
+            )
+        if isinstance(cache, str):
+            cache = ResultCache(cache)
+        self.cache = cache
+        self.chunksize = chunksize
+        self.profile = profile
+        self.profiler = Profiler(self.name, trace_memory)
+        self.lazy = lazy
+        self.partitions = partitions
+        self.max_workers = max_workers
+        self._plan = steps
 
         # Set up logging
         self._setup_logging()
@@ -88,61 +233,256 @@ class Pipe(BaseOperator):
         # Verify pipe
         self._verify_pipe()
 
-    def transform(self, input_: object) -> object:
+    def transform(self, input_: object, resume: bool = False) -> object:
         """Apply the pipe steps to the input data.
 
         Parameters
         ----------
         input_: object
             The input data passed to the first step in the pipe.
+        resume: bool, optional
+            Whether to continue from the furthest autocheckpoint in
+            logging_path that a previous run of the same steps wrote for the
+            same input, for instance after a crash. Defaults to False.
 
         Returns
         -------
         object
             The output of the final step of the pipe.
+
+        Raises
+        ------
+        RuntimeError
+            If resume is True and logging_path is not set.
         """
-        f = logging.Formatter(
-            f"{self._tag} - {self.__class__.__name__}: %(message)s"
-        )
-        for handler in self.logger.handlers:
-            handler.setFormatter(f)
-        self.logger.info(f"Starting execution of pipe.")
-        for i, step in enumerate(self.steps):
-            loggable_transform = self._autologable(input_)
-            if loggable_transform:
-                autocompare_transform = CompareOperator(
-                    input_, self.uid_column
+        if resume and self.logging_path is None:
+            raise RuntimeError(
+                "Resuming requires a file path. Please provide a logging_path variable."
+            )
+        self.timestamp = datetime_to_prettystr()
+        self._log_context["pipe_tag"] = self._tag
+        with self._logging_context():
+            self._log.info("Starting execution of pipe.")
+            self._start_plan()
+            start = 0
+            keys = checkpoint_keys = None
+            if self.cache is not None:
+                keys = step_keys(self._plan, input_)
+            if self.autocheckpoint or resume:
+                # autocheckpoints of a file are matched on its size and
+                # modification time, so runs do not read the file to hash it
+                checkpoint_keys = step_keys(
+                    self._plan, input_, file_content=False
                 )
-            input_ = self._apply(step, input_)
-            if loggable_transform:
-                input_ = self._apply(autocompare_transform, input_)
-
-            # TODO: Allow custom checkpointers here.
-            if isinstance(input_, pd.DataFrame) and self.autocheckpoint:
-                autosave_transform = Checkpoint(
-                    os.path.join(
-                        self.logging_path, f"{self.timestamp}_{i}.csv"
+            if self.cache is not None:
+                for i in reversed(range(len(self._plan))):
+                    if keys[i] in self.cache:
+                        self._log.info(
+                            "Loaded output of step %d from cache.", i
+                        )
+                        input_ = self.cache.load(keys[i])
+                        start = i + 1
+                        break
+            if resume:
+                manifest = self._resumable_checkpoint(checkpoint_keys, start)
+                if manifest is None:
+                    self._log.info("No checkpoint to resume from.")
+                else:
+                    path = os.path.join(self.logging_path, manifest["path"])
+                    self._log.info("Resuming from checkpoint %s.", path)
+                    input_ = read_checkpoint(
+                        path, manifest["format"], manifest["compression"]
                     )
-                )
-                input_ = self._apply(autosave_transform, input_)
+                    start = manifest["step"] + 1
 
-        f = logging.Formatter(
-            f"{self._tag} - {self.__class__.__name__}: %(message)s"
-        )
-        for handler in self.logger.handlers:
-            handler.setFormatter(f)
-        self.logger.info(f"Ended execution of pipe.")
+            output = self._run(input_, start, keys, checkpoint_keys)
+            self._log.info("Ended execution of pipe.")
+            return output
+
+    def restart(self, step: int, path=None) -> object:
+        """Resume the pipe from the checkpoint of a step.
+
+        The checkpointed output of the step is read back and only the steps
+        after it are applied.
+
+        Parameters
+        ----------
+        step: int
+            Index of the checkpointed step.
+        path: str or None, optional
+            File path of the checkpoint. If None, the most recent
+            autocheckpoint of the step in logging_path is used.
+
+        Returns
+        -------
+        object
+            The output of the final step of the pipe.
+
+        Raises
+        ------
+        FileNotFoundError
+            If path is None and there is no autocheckpoint of the step.
+        """
+        if path is None:
+            path = self._latest_checkpoint(step)
+        self.timestamp = datetime_to_prettystr()
+        self._log_context["pipe_tag"] = self._tag
+        with self._logging_context():
+            self._log.info("Restarting pipe from checkpoint %s.", path)
+            self._start_plan()
+            input_ = read_checkpoint(
+                path, self.checkpoint_format, self.checkpoint_compression
+            )
+            output = self._run(input_, step + 1, None, None)
+            self._log.info("Ended execution of pipe.")
+        return output
+
+    def _run(self, input_, start, keys, checkpoint_keys):
+        """Apply the steps from index start onwards."""
+        try:
+            output = self._run_steps(input_, start, keys, checkpoint_keys)
+        except BaseException:
+            # a failed write must not replace the error of the step
+            self._flush_checkpoints(raise_errors=False)
+            raise
+        self._flush_checkpoints()
+        return output
+
+    def _flush_checkpoints(self, raise_errors=True):
+        """Wait for the background checkpoints, raising the error of a
+        failed write or only logging it."""
+        if self.checkpoint_writer is None:
+            return
+        self._log.info("Waiting for background checkpoints.")
+        try:
+            self.checkpoint_writer.flush()
+        except Exception as caught_exception:
+            if raise_errors:
+                raise
+            self._log.error("Background checkpoint failed:")
+            self._log.exception("%s", caught_exception)
+
+    def _run_steps(self, input_, start, keys, checkpoint_keys):
+        i = start
+        while i < len(self._plan):
+            if i == 0 and self._streams_input():
+                end = self._streamable_end(1)
+                names = " -> ".join(
+                    step.__class__.__name__ for step in self._plan[:end]
+                )
+                profile = self._start_profile(end - 1, names, input_)
+                try:
+                    chunks = list(self._stream(self._plan[:end], input_))
+                except Exception:
+                    self._cancel_profile(profile)
+                    raise
+                input_ = pd.concat(chunks)
+                self._stop_profile(profile, input_)
+                i = end - 1
+            elif self._partitions_input(i, input_):
+                end = self._streamable_end(i)
+                input_ = self._apply_partitioned(i, end, input_)
+                i = end - 1
+            else:
+                input_ = self._apply_step(i, self._plan[i], input_)
+            input_ = self._finish_step(i, input_, keys, checkpoint_keys)
+            i += 1
         return input_
 
+    def stream(self, input_: object) -> Iterator:
+        """Apply the pipe chunk by chunk.
+
+        Only a bounded number of rows is held in memory at a time, so inputs
+        larger than memory can be processed. Requires chunksize to be set,
+        a first step that can read its input in chunks and streamable
+        remaining steps.
+
+        Parameters
+        ----------
+        input_: object
+            The input data passed to the first step in the pipe.
+
+        Returns
+        -------
+        Iterator
+            Consecutive chunks of the output of the pipe, as DataFrames.
+
+        Raises
+        ------
+        RuntimeError
+            If the pipe cannot be streamed.
+        """
+        self._start_plan()
+        if not (
+            self._streams_input()
+            and self._streamable_end(1) == len(self._plan)
+        ):
+            raise RuntimeError(
+                "Streaming requires chunksize, a first step with a "
+                "transform_chunks method and streamable remaining steps."
+            )
+        return self._in_logging_context(self._stream(self._plan, input_))
+
+    def input_columns(self, columns):
+        """Columns of the input needed by the steps, see required_columns."""
+        return required_columns(self.steps, columns)
+
+    @property
+    def plan(self) -> list:
+        """Steps applied by a run: the steps optimized by optimize_steps if
+        the pipe is lazy, and the steps themselves otherwise."""
+        if not self.lazy:
+            return self.steps
+        # autocompare compares the inputs of steps to their outputs, so
+        # steps must not modify their inputs
+        return optimize_steps(self.steps, elide_copies=not self.autocompare)
+
+    @property
+    def report(self):
+        """RunReport of the profiled steps of every run."""
+        return self.profiler.report
+
+    def subscribe(self, callback):
+        """Calls callback with the StepProfile of every applied operator.
+
+        Parameters
+        ----------
+        callback: Callable
+            Function accepting a StepProfile.
+        """
+        self.profiler.subscribe(callback)
+
+    @property
+    def streamable(self):
+        """A pipe is streamable when all of its steps are."""
+        return all(step.streamable for step in self.steps)
+
+    def __getstate__(self):
+        """Drops the logging handlers, which cannot be pickled, the logging
+        context and the state of past runs: their timestamp, profiles and
+        subscribers."""
+        state = self.__dict__.copy()
+        for key in [
+            "filehandler",
+            "streamhandler",
+            "timestamp",
+            "_log",
+            "_log_context",
+        ]:
+            state.pop(key, None)
+        state["profiler"] = Profiler(self.name, self.profiler.trace_memory)
+        return state
+
+    def __setstate__(self, state):
+        """Restores a pickled pipe, which logs through the handlers already
+        set up in the process it is restored in."""
+        self.__dict__.update(state)
+        self._setup_log_context()
+
     @property
     def _tag(self):
-        """Create a timestamped unique name for pipe"""
-        self.timestamp = datetime_to_prettystr()
-        if self.name is not None:
-            tag = self.timestamp + " - " + self.name
-        else:
-            tag = self.timestamp + " - " + self.__class__.__name__
-        return tag
+        """Timestamped unique name of the pipe run"""
+        return f"{self.timestamp} - {self.name}"
 
     def _setup_logging(self):
         """Sets up logging based on pipe options. Initializes a stream logger and a file logger."""
@@ -165,8 +505,9 @@ class Pipe(BaseOperator):
         # root_logger = logging.getLogger()
         # root_logger.handlers = []
 
-        # Set up logger
-        self.logger.setLevel(10)
+        # Set up logger. Per-step context is passed to the handlers as
+        # record attributes, so formatters are only created once.
+        self._setup_log_context()
         self.logger.handlers = []
 
         # Set up file handler
@@ -182,25 +523,70 @@ class Pipe(BaseOperator):
         self.streamhandler.setLevel(self.stream_logging_level)
         self.logger.handlers.append(self.streamhandler)
 
-        f = logging.Formatter(
-            f"{self._tag} - {self.__class__.__name__}: %(message)s"
-        )
+        formatter = logging.Formatter(LOG_FORMAT)
         for handler in self.logger.handlers:
-            handler.setFormatter(f)
+            handler.setFormatter(formatter)
+            handler.addFilter(_LOG_CONTEXT_FILTER)
+
+        # Records below every handler level are dropped by the logger before
+        # they are created. Level 0 would defer to the root logger.
+        self.logger.setLevel(
+            max(1, min(handler.level for handler in self.logger.handlers))
+        )
+
+    def _setup_log_context(self):
+        """Creates the adapter passing pipe context to log records."""
+        self.timestamp = datetime_to_prettystr()
+        self._log_context = {
+            "indent": "",
+            "pipe_tag": self._tag,
+            "operator": self.__class__.__name__,
+        }
+        self._log = logging.LoggerAdapter(self.logger, self._log_context)
+
+    @contextmanager
+    def _logging_context(self):
+        """Gives the records that operators log in the current thread the
+        context of this pipe."""
+        token = _LOG_CONTEXT.set(self._log_context)
+        try:
+            yield
+        finally:
+            _LOG_CONTEXT.reset(token)
+
+    def _in_logging_context(self, chunks):
+        """Iterates over chunks, producing each in the logging context of
+        this pipe but leaving it before yielding to the caller."""
+        chunks = iter(chunks)
+        while True:
+            with self._logging_context():
+                chunk = next(chunks, None)
+            if chunk is None:
+                return
+            yield chunk
+
+    def _set_log_operator(self, operator=None):
+        """Sets the operator named in log records, or the pipe if None."""
+        if operator is None:
+            self._log_context["indent"] = ""
+            self._log_context["operator"] = self.__class__.__name__
+        else:
+            self._log_context["indent"] = "  "
+            self._log_context["operator"] = operator
 
     def _verify_pipe(self):
-        self.logger.info(f"Pipe initialized.")
-        self.logger.info(f"The pipe consists of the following transforms:")
+        self._log.info("Pipe initialized.")
+        self._log.info("The pipe consists of the following transforms:")
         for step in self.steps:
             if not isinstance(step, BaseOperator):
                 raise RuntimeError(
                     "Pipe steps must be a subclass of BaseOperator"
                 )
-            self.logger.info(f"{step.__class__.__name__}")
+            self._log.info("%s", step.__class__.__name__)
 
-    def _apply(self, transform, input_):
+    def _apply(self, transform, input_, step=None):
         """
-        Apply a single transform with logging.
+        Apply a single transform with logging and profiling.
 
         Parameters
         ----------
@@ -208,6 +594,8 @@ class Pipe(BaseOperator):
             Transform to apply.
         input_ : Any
             Object to apply transform to.
+        step : int or None, optional
+            Index of the pipe step the transform belongs to.
 
         Returns
         -------
@@ -215,20 +603,248 @@ class Pipe(BaseOperator):
             Post-transform object.
         """
         transform_name = transform.__class__.__name__
-        f = logging.Formatter(f"  {self._tag} - {transform_name}: %(message)s")
-        for handler in self.logger.handlers:
-            handler.setFormatter(f)
-        self.logger.info(f"Applying transform")
+        self._set_log_operator(transform_name)
+        self._log.info("Applying transform")
+        profile = self._start_profile(step, transform_name, input_)
         try:
             output = transform(input_)
         except Exception as caught_exception:
-            self.logger.error(f"Fatal error encountered in transform:")
-            self.logger.exception(f"{caught_exception}")
+            self._cancel_profile(profile)
+            self._log.error("Fatal error encountered in transform:")
+            self._log.exception("%s", caught_exception)
             raise caught_exception
-        self.logger.info(f"Applied transform")
+        self._stop_profile(profile, output)
+        self._log.info("Applied transform")
+        self._set_log_operator()
+
+        return output
+
+    def _apply_step(self, i, step, input_):
+        """Apply the step at index i, comparing its output to its input if
+        autocompare is turned on."""
+        loggable_transform = self._autologable(input_)
+        if loggable_transform:
+            # steps may modify their input in place and return it, so the
+            # reference is snapshotted before the step runs
+            autocompare_transform = CompareOperator(
+                input_, self.uid_column, copy_reference=True
+            )
+        input_ = self._apply(step, input_, i)
+        if loggable_transform:
+            input_ = self._apply(autocompare_transform, input_, i)
+        return input_
 
+    def _finish_step(self, i, output, keys, checkpoint_keys):
+        """Checkpoint and cache the output of the step at index i.
+
+        keys are the cache keys of the steps, or None without a cache.
+        checkpoint_keys are the step keys written to the manifests of
+        autocheckpoints, or None when the pipe restarts from a checkpoint,
+        whose checkpoints cannot be resumed from.
+        """
+        if isinstance(output, pd.DataFrame) and self.autocheckpoint:
+            extension = CHECKPOINT_FORMATS[self.checkpoint_format][0]
+            autosave_transform = Checkpoint(
+                os.path.join(
+                    self.logging_path, f"{self.timestamp}_{i}{extension}"
+                ),
+                self.checkpoint_format,
+                self.checkpoint_compression,
+            )
+            write_manifest = None
+            if checkpoint_keys is not None:
+                write_manifest = partial(
+                    self._write_manifest,
+                    autosave_transform,
+                    i,
+                    checkpoint_keys[i],
+                )
+            if self.checkpoint_writer is None:
+                output = self._apply(autosave_transform, output, i)
+                if write_manifest is not None:
+                    write_manifest()
+            else:
+                self._log.info(
+                    "Checkpointing %s in the background.",
+                    autosave_transform.path,
+                )
+                # the output is only snapshotted when a later step may
+                # modify it in place while it is written
+                self.checkpoint_writer.submit(
+                    autosave_transform,
+                    output,
+                    write_manifest,
+                    copy=modifies_input(self._plan[i + 1 :]),
+                )
+
+        if self.cache is not None and keys is not None:
+            self.cache.save(keys[i], output)
         return output
 
+    def _write_manifest(self, checkpoint, i, key):
+        """Describe a written autocheckpoint in a JSON file next to it.
+
+        The manifest is written once the checkpoint is complete, so the
+        checkpoints of crashed runs are only resumed from when they are
+        whole.
+        """
+        manifest = {
+            "pipe": self.name,
+            "step": i,
+            "key": key,
+            "path": os.path.basename(checkpoint.path),
+            "format": checkpoint.format,
+            "compression": checkpoint.compression,
+        }
+        with open(checkpoint.path + ".json", "w") as fh:
+            json.dump(manifest, fh)
+
+    def _resumable_checkpoint(self, keys, start):
+        """Manifest of the furthest autocheckpoint after step start - 1
+        whose step key matches the current run, or None."""
+        best = None
+        for path in glob.glob(
+            os.path.join(glob.escape(self.logging_path), "*.json")
+        ):
+            try:
+                with open(path) as fh:
+                    manifest = json.load(fh)
+                step = manifest["step"]
+                valid = (
+                    start <= step < len(keys)
+                    and manifest["key"] == keys[step]
+                    and os.path.isfile(
+                        os.path.join(self.logging_path, manifest["path"])
+                    )
+                )
+            except (OSError, ValueError, KeyError, TypeError):
+                continue  # not a manifest
+            if not valid:
+                continue
+            order = (step, os.path.getmtime(path))
+            if best is None or order > best[0]:
+                best = (order, manifest)
+        return None if best is None else best[1]
+
+    def _latest_checkpoint(self, step):
+        """Path of the most recent autocheckpoint of a step."""
+        extension = CHECKPOINT_FORMATS[self.checkpoint_format][0]
+        paths = glob.glob(
+            os.path.join(
+                glob.escape(self.logging_path or ""), f"*_{step}{extension}"
+            )
+        )
+        if not paths:
+            raise FileNotFoundError(
+                f"No {self.checkpoint_format} autocheckpoint of step {step} "
+                f"found in {self.logging_path}."
+            )
+        return max(paths, key=os.path.getmtime)
+
+    def _start_profile(self, step, name, input_):
+        """Start profiling an operator if profiling is turned on."""
+        if self.profile or self.profiler.callbacks:
+            return self.profiler.start(self.timestamp, step, name, input_)
+        return None
+
+    def _stop_profile(self, profile, output):
+        if profile is not None:
+            self.profiler.stop(profile, output)
+
+    def _cancel_profile(self, profile):
+        if profile is not None:
+            self.profiler.cancel(profile)
+
+    def _start_plan(self):
+        """Sets the steps applied by the run that is starting."""
+        self._plan = self.plan
+        if self.lazy:
+            self._log.info(
+                "Optimized plan: %s",
+                " -> ".join(step.__class__.__name__ for step in self._plan),
+            )
+
+    def _streams_input(self):
+        """Whether the first step should read the pipe input in chunks."""
+        return self.chunksize is not None and callable(
+            getattr(self._plan[0], "transform_chunks", None)
+        )
+
+    def _streamable_end(self, start):
+        """Index of the first step at or after start that is not
+        streamable."""
+        end = start
+        while end < len(self._plan) and self._plan[end].streamable:
+            end += 1
+        return end
+
+    def _partitions_input(self, i, input_):
+        """Whether the step at index i should be applied to shards of its
+        input."""
+        return (
+            self.partitions is not None
+            and isinstance(input_, pd.DataFrame)
+            and self._plan[i].streamable
+        )
+
+    def _apply_partitioned(self, start, end, input_):
+        """Apply the steps from index start to end to shards of the input in
+        a process pool."""
+        steps = self._plan[start:end]
+        names = " -> ".join(step.__class__.__name__ for step in steps)
+        self._log.info("Applying %s to %d partitions", names, self.partitions)
+        profile = self._start_profile(end - 1, names, input_)
+        try:
+            output = apply_partitioned(
+                steps, input_, self.partitions, self.max_workers
+            )
+        except Exception as caught_exception:
+            self._cancel_profile(profile)
+            self._log.error("Fatal error encountered in transform:")
+            self._log.exception("%s", caught_exception)
+            raise caught_exception
+        self._stop_profile(profile, output)
+        self._log.info("Applied %s to %d partitions", names, self.partitions)
+        return output
+
+    def _stream(self, steps, input_):
+        """
+        Read the input in chunks with the first step and push each chunk
+        through the remaining steps.
+
+        Each chunk is given a fresh 0-based index while it is transformed,
+        like a whole DataFrame would have, and gets its original index back
+        afterwards.
+
+        Parameters
+        ----------
+        steps : List[BaseOperator]
+            A step with a transform_chunks method followed by streamable
+            steps.
+        input_ : Any
+            Input of the first step.
+
+        Yields
+        ------
+        DataFrame
+            Transformed chunks.
+        """
+        names = " -> ".join(step.__class__.__name__ for step in steps)
+        self._log.info("Streaming chunks through %s", names)
+        try:
+            for chunk in steps[0].transform_chunks(input_, self.chunksize):
+                index = chunk.index
+                chunk.index = pd.RangeIndex(len(index))
+                for step in steps[1:]:
+                    chunk = step(chunk)
+                chunk.index = index
+                yield chunk
+        except Exception as caught_exception:
+            self._log.error("Fatal error encountered in transform:")
+            self._log.exception("%s", caught_exception)
+            raise caught_exception
+        self._log.info("Streamed chunks through %s", names)
+
     def _autologable(self, input_):
         if (
             (isinstance(input_, pd.DataFrame))
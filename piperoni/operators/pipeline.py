@@ -1,7 +1,27 @@
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    wait,
+)
+
 from piperoni.operators.pipe import Pipe
 from piperoni.operators.base import BaseOperator
+from piperoni.operators.load.cache import ResultCache
+from piperoni.operators.profiling import RunReport
+from piperoni.utils import fingerprint
+from piperoni.operators.transport import (
+    FrameStore,
+    MappedFrame,
+    resolve_value,
+    share_value,
+)
+from collections import Counter
 from dagre_py.core import plot
+from functools import partial
 import copy
+import uuid
+import pandas as pd
 
 """
 This module implements Pipeline object.
@@ -19,6 +39,27 @@ class PipelineData(dict):
     pass
 
 
+# Executors that can be used to run independent pipes at the same time.
+EXECUTORS = {"thread": ThreadPoolExecutor, "process": ProcessPoolExecutor}
+
+# Ways DataFrames are sent to and from pipes run by the process executor.
+TRANSPORTS = ("pickle", "shared")
+
+
+def _execute_pipe(pipe, pipe_input):
+    """Applies a pipe to its input.
+
+    Defined at the module level so that it can be sent to process pools.
+    """
+    return pipe(pipe_input)
+
+
+def _execute_pipe_shared(pipe, pipe_input, directory):
+    """Applies a pipe to an input holding MappedFrames, and writes the
+    DataFrames of its output to mapped files in directory."""
+    return share_value(pipe(resolve_value(pipe_input)), directory)
+
+
 class Pipeline:
     """
     Encapsulates several pipes with branching outputs to provide
@@ -47,6 +88,29 @@ class Pipeline:
         This is for pipes that have inputs that are not outputs
         of other pipes.
 
+    cache: ResultCache or str or None, optional
+        On-disk result cache, or the directory of one, given to every
+        pipe that does not have a cache of its own. Re-runs then only
+        recompute the steps whose configuration or input changed.
+
+    evict: bool, optional
+        Whether intermediate results are removed from results_dict once
+        every pipe of the run consuming them is done, so that memory holds
+        the results of the pipes being run rather than of the whole
+        pipeline. Final outputs, raw inputs and pinned codenames are kept.
+        A later run needing an evicted result runs its pipe again.
+        Defaults to False.
+
+    pinned: List[str] or None, optional
+        Codenames of intermediate results that are never evicted.
+
+    spill: ResultCache or str or None, optional
+        On-disk cache, or the directory of one, to which evicted results
+        are written instead of being dropped. They are read back when a
+        later run needs them, and their files are deleted once read back
+        or invalidated. Spills are keyed per Pipeline, so several
+        Pipelines can share a directory. Setting spill turns on eviction.
+
     """
 
     # TODO: Need to figure out a way to detect all pipes with
@@ -57,7 +121,16 @@ class Pipeline:
     # by a simple deepcopy of the input by the transform
     # Generally, we should come up with a consistent deepcopy scheme
     # for piperoni. Currently it's a bit random.
-    def __init__(self, inputs_dict, outputs_dict, raw_inputs):
+    def __init__(
+        self,
+        inputs_dict,
+        outputs_dict,
+        raw_inputs,
+        cache=None,
+        evict=False,
+        pinned=None,
+        spill=None,
+    ):
 
         # TODO: Input validation
 
@@ -66,6 +139,27 @@ class Pipeline:
         self.raw_inputs = self._listify_dict_values(raw_inputs)
 
         self.results_dict = raw_inputs
+        self.raw_codenames = set(raw_inputs)
+
+        if isinstance(spill, str):
+            spill = ResultCache(spill)
+        self.spill = spill
+        # keeps the spills of pipelines sharing a directory apart
+        self._spill_token = uuid.uuid4().hex
+        self.evict = evict or spill is not None
+        self.pinned = set(pinned or [])
+        # codenames of evicted results, dropped or spilled
+        self._dropped = set()
+        self._spilled = set()
+        # number of pipes of the current run still to consume every codename
+        self._consumers = Counter()
+
+        if isinstance(cache, str):
+            cache = ResultCache(cache)
+        if cache is not None:
+            for pipe in self.inputs_dict:
+                if isinstance(pipe, Pipe) and pipe.cache is None:
+                    pipe.cache = cache
 
         # TODO: Add check that an output is not duplicated!
         self.all_inputs_list = self._gather_listed_values(self.inputs_dict)
@@ -129,14 +223,23 @@ class Pipeline:
 
         # Check if a cached result exists
         if len(pipe_outputs) == 1:
-            if pipe_outputs[0] in self.results_dict:
-                return self.results_dict[pipe_outputs[0]]
+            if self._is_available(pipe_outputs[0]):
+                return self._result(pipe_outputs[0])
         elif all(
-            [pipe_output in self.results_dict for pipe_output in pipe_outputs]
+            [
+                self._is_available(pipe_output)
+                # dropped outputs no pipe of the run needs
+                or (
+                    pipe_output in self._dropped
+                    and not self._consumers[pipe_output]
+                )
+                for pipe_output in pipe_outputs
+            ]
         ):
             return_dict = PipelineData()
             for pipe_output in pipe_outputs:
-                return_dict[pipe_output] = self.results_dict[pipe_output]
+                if self._is_available(pipe_output):
+                    return_dict[pipe_output] = self._result(pipe_output)
             return return_dict
 
         # If no cached result exists, must execute pipe and cache it
@@ -144,7 +247,7 @@ class Pipeline:
         missing_inputs = [
             pipe_input
             for pipe_input in pipe_inputs
-            if pipe_input not in self.results_dict
+            if not self._is_available(pipe_input)
         ]
         if missing_inputs:
             # If not, we need to get those first
@@ -154,23 +257,299 @@ class Pipeline:
                 self._recursive_execute_pipe(prerequisite_pipe)
 
         # There should no longer be any missing inputs
-        if len(pipe_inputs) == 1:
-            pipe_results = pipe(self.results_dict[pipe_inputs[0]])
-        else:
-            pipe_inputs_dict = PipelineData()
-            for pipe_input in pipe_inputs:
-                pipe_inputs_dict[pipe_input] = self.results_dict[pipe_input]
-            pipe_results = pipe(pipe_inputs_dict)
+        pipe_results = pipe(self._gather_pipe_input(pipe))
+        self._store_pipe_results(pipe, pipe_results)
+        self._consume_inputs(pipe)
 
+        return pipe_results
+
+    def _gather_pipe_input(self, pipe, lookup=None):
+        """Collects the cached results a pipe takes as its input.
+
+        lookup returns the value passed to the pipe for a codename, by
+        default its cached result.
+        """
+        if lookup is None:
+            lookup = self._result
+        pipe_inputs = self.inputs_dict[pipe]
+        if len(pipe_inputs) == 1:
+            return lookup(pipe_inputs[0])
+        pipe_inputs_dict = PipelineData()
+        for pipe_input in pipe_inputs:
+            pipe_inputs_dict[pipe_input] = lookup(pipe_input)
+        return pipe_inputs_dict
+
+    def _store_pipe_results(self, pipe, pipe_results):
+        """Caches the results of a pipe under its output codenames."""
         if isinstance(pipe_results, PipelineData):
             self.results_dict.update(pipe_results)
         else:
-            self.results_dict[pipe_outputs[0]] = pipe_results
+            self.results_dict[self.outputs_dict[pipe][0]] = pipe_results
+        for codename in self.outputs_dict[pipe]:
+            self._dropped.discard(codename)
+            self._discard_spill(codename)
+
+    def _is_available(self, codename):
+        """Whether the result of a codename is cached or spilled."""
+        return codename in self.results_dict or codename in self._spilled
+
+    def _result(self, codename):
+        """Returns the cached result of a codename, reading it back from
+        the spill if it was spilled.
+
+        A result read back is cached in results_dict again and its spill
+        is deleted; it is spilled anew once its consumers are done.
+        """
+        if codename in self.results_dict:
+            return self.results_dict[codename]
+        if codename in self._spilled:
+            value = self.spill.load(self._spill_key(codename))
+            self.results_dict[codename] = value
+            self._discard_spill(codename)
+            return value
+        raise KeyError(codename)
+
+    def _spill_key(self, codename):
+        """Key of the spilled result of a codename."""
+        return fingerprint((self._spill_token, codename))
+
+    def _discard_spill(self, codename):
+        """Deletes the spilled result of a codename, if any."""
+        if codename in self._spilled:
+            self.spill.delete(self._spill_key(codename))
+            self._spilled.discard(codename)
+
+    def _count_consumers(self, pending):
+        """Counts the pending pipes consuming every codename."""
+        self._consumers = Counter(
+            pipe_input
+            for pipe in pending
+            for pipe_input in self.inputs_dict[pipe]
+        )
 
-        return pipe_results
+    def _consume_inputs(self, pipe, store=None):
+        """Records that a pipe is done with its inputs, and evicts the
+        results that no pending pipe consumes anymore.
+
+        Results mapped by store are always evicted when they are not
+        kept, since store deletes their files.
+        """
+        for codename in self.inputs_dict[pipe]:
+            if self._consumers[codename] <= 0:
+                continue
+            self._consumers[codename] -= 1
+            if self._consumers[codename]:
+                continue
+            value = self.results_dict.get(codename)
+            if self._is_kept(codename):
+                if isinstance(value, MappedFrame):
+                    self.results_dict[codename] = value.read(copy=True)
+            elif self.evict or isinstance(value, MappedFrame):
+                self._evict(codename)
+            if store is not None:
+                store.release(codename)
+
+    def _is_kept(self, codename):
+        """Whether the result of a codename is never evicted."""
+        return (
+            codename in self.final_outputs_inferred
+            or codename in self.raw_codenames
+            or codename in self.pinned
+        )
+
+    def _evict(self, codename):
+        """Removes a result from results_dict, spilling it if a spill is
+        set."""
+        value = self.results_dict.pop(codename, None)
+        if self.spill is None:
+            self._dropped.add(codename)
+            return
+        if isinstance(value, MappedFrame):
+            value = value.read(copy=True)
+        self.spill.save(self._spill_key(codename), value)
+        self._spilled.add(codename)
+
+    def _gather_pending_pipes(self, outputs):
+        """Finds every pipe that must still run to obtain the outputs.
+
+        Returns
+        -------
+        dict
+            Keys are the pending pipes, values are the sets of pending pipes
+            each of them depends on.
+        """
+        pending = {}
+        queue = list(outputs)
+        while queue:
+            pipe_output = queue.pop()
+            if self._is_available(pipe_output):
+                continue
+            for pipe in self._gather_prerequisite_pipes_for_outputs(
+                [pipe_output]
+            ):
+                if pipe in pending:
+                    continue
+                missing_inputs = [
+                    pipe_input
+                    for pipe_input in self.inputs_dict[pipe]
+                    if not self._is_available(pipe_input)
+                ]
+                pending[pipe] = set(
+                    self._gather_prerequisite_pipes_for_outputs(missing_inputs)
+                )
+                queue += missing_inputs
+        return pending
+
+    def _execute_concurrently(self, executor, max_workers, store=None):
+        """Runs pending pipes in a pool as soon as their inputs are ready.
+
+        Parameters
+        ----------
+        executor: str
+            Key in EXECUTORS selecting the pool.
+        max_workers: int or None
+            Maximum number of pipes running at the same time.
+        store: FrameStore or None, optional
+            Store through which DataFrames are sent to and from the pipes,
+            instead of being pickled. Cached results stored in it are freed
+            once every pending pipe consuming them is done.
+        """
+        pending = self._gather_pending_pipes(self.final_outputs_inferred)
+        # Keeps scheduling order deterministic
+        order = [pipe for pipe in self.inputs_dict if pipe in pending]
+        running = {}
+        if store is not None:
+            lookup = partial(self._share_result, store)
+        with EXECUTORS[executor](max_workers=max_workers) as pool:
+            while order or running:
+                for pipe in [p for p in order if not pending[p]]:
+                    order.remove(pipe)
+                    if store is None:
+                        future = pool.submit(
+                            _execute_pipe, pipe, self._gather_pipe_input(pipe)
+                        )
+                    else:
+                        future = pool.submit(
+                            _execute_pipe_shared,
+                            pipe,
+                            self._gather_pipe_input(pipe, lookup),
+                            store.directory,
+                        )
+                    running[future] = pipe
+                if not running:
+                    raise RuntimeError(
+                        "Pipeline contains pipes whose inputs can never be "
+                        "computed. Check the pipeline for cycles."
+                    )
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    pipe = running.pop(future)
+                    try:
+                        pipe_results = future.result()
+                    except Exception:
+                        for other in running:
+                            other.cancel()
+                        raise
+                    self._store_pipe_results(pipe, pipe_results)
+                    if store is not None:
+                        self._adopt_shared_results(pipe, pipe_results, store)
+                    self._consume_inputs(pipe, store)
+                    for dependencies in pending.values():
+                        dependencies.discard(pipe)
+
+    def _share_result(self, store, codename):
+        """Returns the cached result of a codename, with a DataFrame stored
+        in store when it can be mapped."""
+        value = self._result(codename)
+        if isinstance(value, pd.DataFrame):
+            shared = store.get(codename)
+            if shared is None:
+                shared = store.put(codename, value)
+            return value if shared is None else shared
+        return value
+
+    def _adopt_shared_results(self, pipe, pipe_results, store):
+        """Hands the mapped outputs of a finished pipe to store, which
+        deletes their files once they are consumed."""
+        if not isinstance(pipe_results, PipelineData):
+            pipe_results = {self.outputs_dict[pipe][0]: pipe_results}
+        for codename, value in pipe_results.items():
+            if isinstance(value, MappedFrame):
+                store.adopt(codename, value)
+
+    def _resolve_shared_results(self):
+        """Reads the mapped results left in results_dict into DataFrames
+        owning their data."""
+        for codename, value in self.results_dict.items():
+            if isinstance(value, MappedFrame):
+                self.results_dict[codename] = value.read(copy=True)
 
     # TODO: Wipe internal state every run?
-    def run(self):
+    def run(self, executor="serial", max_workers=None, transport="pickle"):
+        """Runs the pipeline and returns its final outputs.
+
+        Parameters
+        ----------
+        executor: str, optional
+            How pipes are executed. "serial" (default) runs one pipe at a
+            time. "thread" and "process" run every pipe whose inputs are
+            ready at the same time in a thread or process pool. Pipes,
+            their inputs and their outputs must be picklable to use
+            "process".
+        max_workers: int or None, optional
+            Maximum number of pipes running at the same time. Defaults to
+            the default of the selected pool.
+        transport: str, optional
+            How DataFrames are sent to and from the pipes run by the
+            "process" executor. "pickle" (default) pickles them through the
+            pool. "shared" writes them once into Arrow files in shared
+            memory, which the pipes map: their numeric columns are
+            read-only views rather than copies, so operators must not
+            modify their input in place. The file of an intermediate result
+            is deleted once every pipe consuming it is done, and the result
+            is evicted unless it is pinned. DataFrames that do not convert
+            to Arrow without loss, or when pyarrow is not installed, are
+            pickled.
+
+        Returns
+        -------
+        dict
+            Keys are the final output codenames, values are the outputs.
+
+        Raises
+        ------
+        ValueError
+            If the executor or the transport is not supported.
+        """
+        if transport not in TRANSPORTS:
+            raise ValueError(
+                f"transport must be one of {list(TRANSPORTS)}, "
+                f"but got {transport}"
+            )
+        self._count_consumers(
+            self._gather_pending_pipes(self.final_outputs_inferred)
+        )
+        if executor != "serial":
+            if executor not in EXECUTORS:
+                raise ValueError(
+                    f"executor must be one of {['serial', *EXECUTORS]}, "
+                    f"but got {executor}"
+                )
+            if executor == "process" and transport == "shared":
+                store = FrameStore()
+                try:
+                    self._execute_concurrently(executor, max_workers, store)
+                    self._resolve_shared_results()
+                finally:
+                    # results still mapped after an error cannot be read
+                    for codename, value in list(self.results_dict.items()):
+                        if isinstance(value, MappedFrame):
+                            del self.results_dict[codename]
+                            self._dropped.add(codename)
+                    store.close()
+            else:
+                self._execute_concurrently(executor, max_workers)
+
         return_dict = {}
         for prerequisite_pipe in self._gather_prerequisite_pipes_for_outputs(
             self.final_outputs_inferred
@@ -185,6 +564,113 @@ class Pipeline:
         return_dict = {k: return_dict[k] for k in self.final_outputs_inferred}
         return return_dict
 
+    def update_input(self, codename, value) -> list:
+        """Replaces a raw input, invalidating the results computed from it.
+
+        The next run only runs the pipes whose results were invalidated.
+        Nothing is invalidated when the new value has the same content as
+        the current one.
+
+        Parameters
+        ----------
+        codename: str
+            Codename of the raw input.
+        value: object
+            The new raw input.
+
+        Returns
+        -------
+        List[str]
+            Codenames of the invalidated results, see invalidate.
+
+        Raises
+        ------
+        ValueError
+            If codename is the output of a pipe.
+        """
+        if codename in self.all_outputs_list:
+            raise ValueError(
+                f"{codename} is the output of a pipe, not a raw input. "
+                "Use invalidate to recompute it."
+            )
+        unchanged = codename in self.results_dict and fingerprint(
+            self.results_dict[codename]
+        ) == fingerprint(value)
+        self.results_dict[codename] = value
+        self.raw_codenames.add(codename)
+        if unchanged:
+            return []
+        return self.invalidate(codename)
+
+    def invalidate(self, target) -> list:
+        """Invalidates cached results, so that the next run computes them
+        again.
+
+        Use it when a pipe changed, or when a raw input was modified in
+        place. Only the results computed from the target are invalidated,
+        and the next run only runs the pipes producing them.
+
+        Parameters
+        ----------
+        target: BaseOperator or str
+            A pipe of the pipeline, whose outputs and the results computed
+            from them are invalidated, or a codename, whose result (unless
+            it is a raw input) and the results computed from it are
+            invalidated.
+
+        Returns
+        -------
+        List[str]
+            Codenames of the invalidated results, sorted.
+
+        Raises
+        ------
+        KeyError
+            If target is neither a pipe nor a codename of the pipeline.
+        """
+        if isinstance(target, BaseOperator):
+            if target not in self.outputs_dict:
+                raise KeyError(target)
+            queue = list(self.outputs_dict[target])
+            invalidated = set(queue)
+        elif target in self.raw_codenames:
+            # raw inputs cannot be computed again, so they are kept
+            queue = [target]
+            invalidated = set()
+        elif target in self.all_outputs_list:
+            queue = [target]
+            invalidated = {target}
+        else:
+            raise KeyError(target)
+
+        while queue:
+            codename = queue.pop()
+            for pipe in self._gather_pipes_on_inputs([codename]):
+                for pipe_output in self.outputs_dict[pipe]:
+                    if pipe_output not in invalidated:
+                        invalidated.add(pipe_output)
+                        queue.append(pipe_output)
+
+        for codename in invalidated:
+            self.results_dict.pop(codename, None)
+            self._dropped.discard(codename)
+            self._discard_spill(codename)
+        return sorted(invalidated)
+
+    @property
+    def report(self):
+        """RunReport combining the profiles recorded by every pipe.
+
+        Pipes record profiles when they are created with profile=True or
+        have subscribers. Pipes run by the "process" executor profile in the
+        worker processes, so their profiles are not included.
+        """
+        report = RunReport()
+        for pipe in self.inputs_dict:
+            if isinstance(pipe, Pipe):
+                report += pipe.report
+        return report
+
     def visualize(self, full=False):
 
         nodes, edges = [], []  # dagre-py
@@ -212,15 +698,15 @@ class Pipeline:
                 "source": self._determine_object_id_for_dagre_node_label(src),
             }
             if full and isinstance(target, Pipe):
-                edge[
-                    "target"
-                ] = self._determine_object_id_for_dagre_node_label(
-                    target.steps[0]
+                edge["target"] = (
+                    self._determine_object_id_for_dagre_node_label(
+                        target.steps[0]
+                    )
                 )
             else:
-                edge[
-                    "target"
-                ] = self._determine_object_id_for_dagre_node_label(target)
+                edge["target"] = (
+                    self._determine_object_id_for_dagre_node_label(target)
+                )
             edges.append(edge)
             if target not in visited:
                 output_dict_key = target
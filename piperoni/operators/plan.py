@@ -0,0 +1,260 @@
+"""Implements the optimization of the steps of a lazy pipe into a plan.
+
+A plan is the list of operators a lazy pipe applies instead of its steps.
+It gives the same output as the steps, with less work:
+
+- consecutive HeaderMaps are fused into one, and so are consecutive
+  Normalizers, so the data is renamed or normalized in a single pass;
+- column selections are pushed down through renames and normalizations;
+- the extractor only reads the columns that later steps need, as declared
+  by their input_columns methods;
+- HeaderMaps and Normalizers modify data produced by an earlier step of the
+  plan in place instead of copying it.
+
+The operators passed to optimize_steps are never modified: rewritten steps
+are new operators.
+
+Examples
+--------
+Comparing the steps of a pipe with its plan::
+  steps = [
+      CSVExtractor(),
+      HeaderMap({"Band gap": "band_gap"}, complete_map=False),
+      HeaderMap({"band_gap": "gap"}, complete_map=False),
+      SelectColumns(["gap"]),
+  ]
+  optimize_steps(steps)
+  # [CSVExtractor(usecols=["Band gap"]), HeaderMap(...), SelectColumns(...)]
+"""
+
+import copy
+
+from piperoni.operators.extract.extract_file.csv_ import CSVExtractor
+from piperoni.operators.extract.extract_file.json_ import JSONExtractor
+from piperoni.operators.extract.extract_file.multi import MultiFileExtractor
+from piperoni.operators.load.checkpoint import Checkpoint
+from piperoni.operators.passthrough_operator import PassthroughOperator
+from piperoni.operators.transform.transform_name.header_map import HeaderMap
+from piperoni.operators.transform.transform_name.select_columns import (
+    SelectColumns,
+)
+from piperoni.operators.transform.transform_value.value_transformers import (
+    Normalizer,
+)
+
+# Operators returning new data that no other object references, which the
+# next step can modify in place. Other operators declare it with the
+# owns_output attribute.
+OWNING_OPERATORS = (
+    CSVExtractor,
+    JSONExtractor,
+    MultiFileExtractor,
+    SelectColumns,
+)
+
+
+def optimize_steps(steps: list, elide_copies: bool = True) -> list:
+    """Rewrites the steps of a pipe into an equivalent plan.
+
+    Parameters
+    ----------
+    steps: List[BaseOperator]
+        The steps of the pipe.
+    elide_copies: bool, optional
+        Whether HeaderMaps and Normalizers modify data produced by an earlier
+        step in place. Must be False when the inputs of steps are used after
+        the steps are applied, like by autocompare. Defaults to True.
+
+    Returns
+    -------
+    List[BaseOperator]
+        The steps of the plan.
+    """
+    plan = _fuse(list(steps))
+    plan = _push_projections(plan)
+    plan = _project_extractor(plan)
+    if elide_copies:
+        plan = _elide_copies(plan)
+    return plan
+
+
+def _fuse(plan):
+    """Fuses consecutive HeaderMaps and consecutive Normalizers."""
+    fused = []
+    for step in plan:
+        previous = fused[-1] if fused else None
+        merged = None
+        if isinstance(previous, HeaderMap) and isinstance(step, HeaderMap):
+            merged = _fuse_header_maps(previous, step)
+        elif isinstance(previous, Normalizer) and isinstance(step, Normalizer):
+            merged = _fuse_normalizers(previous, step)
+        if merged is None:
+            fused.append(step)
+        else:
+            fused[-1] = merged
+    return fused
+
+
+def _fuse_header_maps(first, second):
+    """Returns a HeaderMap renaming columns like first then second, or None
+    if a single config cannot express it."""
+    if first.copy != second.copy:
+        return None
+    if not second.complete_map:
+        config = {
+            old: second.config.get(new, new)
+            for old, new in first.config.items()
+        }
+        if not first.complete_map:
+            # headers passed through first are renamed by second
+            for old, new in second.config.items():
+                config.setdefault(old, new)
+        return HeaderMap(config, first.complete_map, first.copy)
+    if first.complete_map and all(
+        new in second.config for new in first.config.values()
+    ):
+        config = {old: second.config[new] for old, new in first.config.items()}
+        return HeaderMap(config, True, first.copy)
+    return None
+
+
+def _fuse_normalizers(first, second):
+    """Returns a Normalizer applying the shifts of first then second.
+
+    The shifts are applied one after the other rather than summed, so the
+    values are identical to applying both operators.
+    """
+    if first.copy != second.copy:
+        return None
+    return Normalizer(
+        list(first.columns) + list(second.columns),
+        list(first.delta_mus) + list(second.delta_mus),
+        first.copy,
+    )
+
+
+def required_columns(steps: list, columns=None):
+    """Returns the columns of the input of steps needed to compute columns of
+    their output.
+
+    Parameters
+    ----------
+    steps: List[BaseOperator]
+        Operators applied one after the other.
+    columns: List[str] or None, optional
+        Headers of the needed columns of the output of the last step, or
+        None if every column is needed.
+
+    Returns
+    -------
+    List[str] or None
+        Headers of the needed columns of the input of the first step, or
+        None if every column may be needed.
+    """
+    for step in reversed(steps):
+        columns = step.input_columns(columns)
+    return columns
+
+
+def modifies_input(steps: list) -> bool:
+    """Whether applying steps one after the other may modify the input of
+    the first step in place.
+
+    HeaderMaps and Normalizers only modify their input when their copy is
+    turned off, and SelectColumns never does. Passthrough operators return
+    their input, so the steps after them are checked too. Other operators
+    may modify their input.
+
+    Parameters
+    ----------
+    steps: List[BaseOperator]
+        Operators applied one after the other.
+
+    Returns
+    -------
+    bool
+        False if no step can modify the input in place.
+    """
+    for step in steps:
+        if isinstance(step, (HeaderMap, Normalizer)):
+            return not step.copy
+        if isinstance(step, SelectColumns):
+            return False
+        if not isinstance(step, PassthroughOperator):
+            return True
+    return False
+
+
+def _project_extractor(plan):
+    """Makes the first step only read the columns needed by the others."""
+    if not plan or not callable(getattr(plan[0], "project", None)):
+        return plan
+    columns = required_columns(plan[1:])
+    if columns is None:
+        return plan
+    projected = plan[0].project(columns)
+    if projected is None:
+        return plan
+    return [projected] + plan[1:]
+
+
+def _push_projections(plan):
+    """Pushes every SelectColumns down through renames, normalizations and
+    earlier selections."""
+    for j in reversed(range(len(plan))):
+        if isinstance(plan[j], SelectColumns):
+            _push_projection(plan, j)
+    return [step for step in plan if step is not None]
+
+
+def _push_projection(plan, j):
+    """Narrows the steps before the SelectColumns at index j to the columns
+    it selects, replacing dropped steps with None."""
+    columns = _unique(plan[j].columns)
+    for i in reversed(range(j)):
+        step = plan[i]
+        if step is None:
+            continue
+        if isinstance(step, HeaderMap):
+            columns = step.input_columns(columns)
+        elif isinstance(step, Normalizer):
+            kept = [
+                (column, delta)
+                for column, delta in zip(step.columns, step.delta_mus)
+                if column in columns
+            ]
+            if kept:
+                plan[i] = Normalizer(
+                    [column for column, _ in kept],
+                    [delta for _, delta in kept],
+                    step.copy,
+                )
+            else:
+                plan[i] = None
+        elif isinstance(step, SelectColumns):
+            plan[i] = SelectColumns(
+                [column for column in step.columns if column in columns]
+            )
+        else:
+            return
+
+
+def _unique(columns):
+    return list(dict.fromkeys(columns))
+
+
+def _elide_copies(plan):
+    """Turns off the copies of HeaderMaps and Normalizers whose input is
+    owned by the plan."""
+    elided = []
+    owned = False
+    for step in plan:
+        if isinstance(step, (HeaderMap, Normalizer)):
+            if owned and step.copy:
+                step = copy.copy(step)
+                step.copy = False
+            owned = owned or step.copy
+        elif not isinstance(step, Checkpoint):
+            owned = isinstance(step, OWNING_OPERATORS) or step.owns_output
+        elided.append(step)
+    return elided
@@ -0,0 +1,267 @@
+"""Implements per-step profiling of pipes.
+
+A Pipe with profiling turned on records a StepProfile for every operator it
+applies and collects them in a RunReport. Callbacks subscribed to the pipe
+receive each StepProfile as soon as its step ends, which lets exporters
+stream measurements to other systems.
+
+Examples
+--------
+Profiling a pipe::
+  pipe = Pipe([CSVExtractor(), HeaderMap(config)], profile=True)
+  pipe.subscribe(print)
+  pipe("path/to/file.csv")
+  pipe.report.to_dataframe()
+"""
+
+import json
+import time
+import tracemalloc
+
+from typing import Callable
+
+import pandas as pd
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+
+class StepProfile:
+    """Measurements of one operator applied by a pipe.
+
+    Measurement starts when the profile is created and ends with stop.
+
+    Parameters
+    ----------
+    pipe: str
+        Name of the pipe.
+    run: str
+        Timestamp of the pipe run.
+    step: int or None
+        Index of the step in the pipe.
+    operator: str
+        Class name of the applied operator.
+    input_: object
+        Input of the operator.
+    trace_memory: bool, optional
+        Whether to measure the peak of memory allocated during the step with
+        tracemalloc. Slows down the step. Tracing started for the step is
+        stopped with it. Defaults to False.
+
+    Attributes
+    ----------
+    wall_time: float
+        Elapsed seconds.
+    cpu_time: float
+        Seconds of CPU time used by the process.
+    peak_memory: int or None
+        Peak bytes allocated during the step above the allocations at its
+        start, when memory is traced.
+    max_rss_delta: int or None
+        Growth of the maximum resident set size of the process in kilobytes
+        (bytes on macOS), where available.
+    input_rows, input_columns, input_bytes: int or None
+        Shape and memory usage of DataFrame or Series inputs, including the
+        objects of object columns, such as strings.
+    output_rows, output_columns, output_bytes: int or None
+        Shape and memory usage of DataFrame or Series outputs.
+    """
+
+    def __init__(
+        self,
+        pipe: str,
+        run: str,
+        step,
+        operator: str,
+        input_: object,
+        trace_memory: bool = False,
+    ):
+        self.pipe = pipe
+        self.run = run
+        self.step = step
+        self.operator = operator
+        (
+            self.input_rows,
+            self.input_columns,
+            self.input_bytes,
+        ) = _describe(input_)
+        self.output_rows = self.output_columns = self.output_bytes = None
+        self.wall_time = self.cpu_time = None
+        self.peak_memory = self.max_rss_delta = None
+
+        self._trace_memory = trace_memory
+        # tracing slows down every allocation of the process, so it is only
+        # stopped by the profile that started it
+        self._started_tracing = trace_memory and not tracemalloc.is_tracing()
+        if trace_memory:
+            if self._started_tracing:
+                tracemalloc.start()
+            if hasattr(tracemalloc, "reset_peak"):  # Python >= 3.9
+                tracemalloc.reset_peak()
+            else:
+                tracemalloc.clear_traces()
+            self._traced_start = tracemalloc.get_traced_memory()[0]
+        self._max_rss_start = _max_rss()
+        self._cpu_start = time.process_time()
+        self._wall_start = time.perf_counter()
+
+    def stop(self, output: object) -> "StepProfile":
+        """Ends the measurement.
+
+        Parameters
+        ----------
+        output: object
+            Output of the operator.
+
+        Returns
+        -------
+        StepProfile
+            The profile itself.
+        """
+        self.wall_time = time.perf_counter() - self._wall_start
+        self.cpu_time = time.process_time() - self._cpu_start
+        if self._trace_memory:
+            peak = tracemalloc.get_traced_memory()[1]
+            self.peak_memory = peak - self._traced_start
+        self.cancel()
+        if self._max_rss_start is not None:
+            self.max_rss_delta = _max_rss() - self._max_rss_start
+        (
+            self.output_rows,
+            self.output_columns,
+            self.output_bytes,
+        ) = _describe(output)
+        return self
+
+    def cancel(self) -> None:
+        """Stops tracing memory if the profile started it, like when the
+        step fails."""
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    def to_dict(self) -> dict:
+        """Returns the measurements as a dict."""
+        return {
+            key: value
+            for key, value in vars(self).items()
+            if not key.startswith("_")
+        }
+
+    def __repr__(self):
+        return f"StepProfile({self.to_dict()})"
+
+
+class RunReport:
+    """A queryable collection of StepProfiles.
+
+    Parameters
+    ----------
+    profiles: List[StepProfile] or None, optional
+        Initial profiles.
+    """
+
+    def __init__(self, profiles=None):
+        self.profiles = list(profiles or [])
+
+    def append(self, profile: StepProfile) -> None:
+        self.profiles.append(profile)
+
+    def clear(self) -> None:
+        self.profiles = []
+
+    def __len__(self):
+        return len(self.profiles)
+
+    def __iter__(self):
+        return iter(self.profiles)
+
+    def __add__(self, other: "RunReport") -> "RunReport":
+        return RunReport(self.profiles + other.profiles)
+
+    def to_dataframe(self) -> pd.DataFrame:
+        """Returns one row per profile and one column per measurement."""
+        return pd.DataFrame([profile.to_dict() for profile in self.profiles])
+
+    def to_json(self, path=None):
+        """Serializes the profiles to a JSON list of records.
+
+        Parameters
+        ----------
+        path: str or None, optional
+            File to write to. If None, the JSON string is returned.
+
+        Returns
+        -------
+        str or None
+            The JSON string if path is None.
+        """
+        records = json.dumps([profile.to_dict() for profile in self.profiles])
+        if path is None:
+            return records
+        with open(path, "w") as fh:
+            fh.write(records)
+
+
+class Profiler:
+    """Creates StepProfiles for a pipe and sends them to subscribers.
+
+    Parameters
+    ----------
+    pipe: str
+        Name of the pipe.
+    trace_memory: bool, optional
+        Whether to measure memory peaks with tracemalloc.
+    """
+
+    def __init__(self, pipe: str, trace_memory: bool = False):
+        self.pipe = pipe
+        self.trace_memory = trace_memory
+        self.report = RunReport()
+        self.callbacks = []
+
+    def subscribe(self, callback: Callable) -> None:
+        """Calls callback with every StepProfile once its step has ended."""
+        self.callbacks.append(callback)
+
+    def start(self, run: str, step, operator: str, input_) -> StepProfile:
+        """Starts measuring an operator applied to input_."""
+        return StepProfile(
+            self.pipe, run, step, operator, input_, self.trace_memory
+        )
+
+    def stop(self, profile: StepProfile, output: object) -> None:
+        """Ends measuring and records a profile."""
+        self.record(profile.stop(output))
+
+    def cancel(self, profile: StepProfile) -> None:
+        """Ends measuring without recording a profile."""
+        profile.cancel()
+
+    def record(self, profile: StepProfile) -> None:
+        """Adds an ended profile to the report and notifies subscribers."""
+        self.report.append(profile)
+        for callback in self.callbacks:
+            callback(profile)
+
+
+def _describe(data):
+    """Returns the rows, columns and bytes of DataFrames and Series."""
+    if isinstance(data, pd.DataFrame):
+        return (
+            len(data.index),
+            len(data.columns),
+            int(data.memory_usage(index=True, deep=True).sum()),
+        )
+    if isinstance(data, pd.Series):
+        return len(data), 1, int(data.memory_usage(index=True, deep=True))
+    return None, None, None
+
+
+def _max_rss():
+    """Maximum resident set size of the process so far, if available."""
+    if resource is None:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
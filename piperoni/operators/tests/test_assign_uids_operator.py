@@ -0,0 +1,105 @@
+import os
+import pickle
+
+import numpy as np
+
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from pandas import DataFrame
+
+from piperoni.operators.transform.assign_uids_operator import (
+    AssignUIDsOperator,
+    MemoryAllocator,
+    SQLiteAllocator,
+)
+from piperoni.utils import copy_on_write_enabled
+
+"""
+Implements tests for the AssignUIDsOperator and its allocators.
+"""
+
+
+def allocate_from(path):
+    """Allocates ranges from a SQLiteAllocator, in another process."""
+    allocator = SQLiteAllocator(path)
+    return [allocator.allocate(10) for _ in range(20)]
+
+
+class TestAssignUIDsOperator:
+    """Tests the AssignUIDsOperator class."""
+
+    def test_new_column(self):
+        df = DataFrame({"a": [1, 2, 3]})
+        operator = AssignUIDsOperator("uid", uid_start=5, unique_prepend="u")
+        output = operator(df)
+        assert output["uid"].tolist() == ["u5", "u6", "u7"]
+        assert "uid" not in df.columns
+        assert operator.uid_counter == 8
+
+        output = operator(df)
+        assert output["uid"].tolist() == ["u8", "u9", "u10"]
+
+    def test_missing_uids(self):
+        df = DataFrame({"uid": ["x", None, "y", np.nan], "a": [1, 2, 3, 4]})
+        operator = AssignUIDsOperator("uid", unique_prepend="u")
+        output = operator(df)
+        assert output["uid"].tolist() == ["x", "u0", "y", "u1"]
+        assert df["uid"].isna().sum() == 2
+        # other columns are only shared with copy-on-write
+        assert (
+            np.shares_memory(output["a"].to_numpy(), df["a"].to_numpy())
+            == copy_on_write_enabled()
+        )
+
+        # a complete column is returned as is
+        assert operator(output) is output
+        assert operator.uid_counter == 2
+
+        df = DataFrame({"uid": [np.nan, np.nan]})
+        output = operator(df)
+        assert output["uid"].tolist() == ["u2", "u3"]
+
+    def test_sqlite_allocator(self, tmp_path):
+        path = str(tmp_path / "uids.sqlite")
+        operator = AssignUIDsOperator("uid", 10, "u", allocator=path)
+        first = operator(DataFrame({"a": range(3)}))
+        assert first["uid"].tolist() == ["u10", "u11", "u12"]
+
+        # a new run continues from the stored counter, without gaps
+        operator = AssignUIDsOperator("uid", 0, "u", allocator=path)
+        assert operator.uid_counter == 13
+        second = operator(DataFrame({"uid": [None, "x"]}))
+        assert second["uid"].tolist() == ["u13", "x"]
+
+        # counters are separate by name
+        other = SQLiteAllocator(path, name="other")
+        assert other.allocate(2) == 0
+        assert SQLiteAllocator(path).peek() == 14
+
+    def test_parallel_allocations(self, tmp_path):
+        path = str(tmp_path / "uids.sqlite")
+        allocator = SQLiteAllocator(path)
+        with ThreadPoolExecutor(4) as pool:
+            starts = list(pool.map(allocator.allocate, [10] * 40))
+        with ProcessPoolExecutor(2) as pool:
+            for result in pool.map(allocate_from, [path] * 2):
+                starts += result
+        assert sorted(starts) == list(range(0, 800, 10))
+
+        memory = MemoryAllocator()
+        with ThreadPoolExecutor(4) as pool:
+            starts = list(pool.map(memory.allocate, [10] * 40))
+        assert sorted(starts) == list(range(0, 400, 10))
+
+    def test_pickle(self, tmp_path):
+        operator = AssignUIDsOperator("uid", 3)
+        operator(DataFrame({"a": range(2)}))
+        copied = pickle.loads(pickle.dumps(operator))
+        assert copied.uid_counter == 5
+        assert copied.allocator.allocate(1) == 5
+
+        path = os.path.join(str(tmp_path), "uids.sqlite")
+        operator = AssignUIDsOperator("uid", allocator=path)
+        copied = pickle.loads(pickle.dumps(operator))
+        copied.allocator.allocate(4)
+        assert operator.uid_counter == 4
@@ -0,0 +1,74 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from piperoni.operators.partition import (
+    SharedFrame,
+    apply_partitioned,
+    split_rows,
+)
+from piperoni.operators.transform.transform_name.header_map import HeaderMap
+
+"""
+Implements tests for the partitioned execution of steps.
+"""
+
+
+@pytest.fixture
+def frame():
+    return pd.DataFrame(
+        {
+            "integer": np.arange(10),
+            "float": np.linspace(0.0, 1.0, 10),
+            "text": ["a", None] * 5,
+            "category": pd.Categorical(["x", "y"] * 5),
+            "nullable": pd.array([1, None] * 5, dtype="Int64"),
+        },
+        index=np.arange(10, 20),
+    )
+
+
+def test_shared_frame(frame):
+    pytest.importorskip("pyarrow")
+    shared = SharedFrame.write(frame)
+    assert shared.format == "arrow"
+    pd.testing.assert_frame_equal(shared.read(unlink=True), frame)
+
+    # data without a lossless Arrow representation is pickled
+    frame["lists"] = [[i] for i in range(10)]
+    frame[0] = 0
+    shared = SharedFrame.write(frame)
+    assert shared.format == "pickle"
+    pd.testing.assert_frame_equal(shared.read(), frame)
+    shared.release()
+    with pytest.raises(FileNotFoundError):
+        shared.read()
+
+
+def test_split_rows(frame):
+    shards = split_rows(frame, 3)
+    assert [len(shard) for shard in shards] == [3, 3, 4]
+    pd.testing.assert_frame_equal(pd.concat(shards), frame)
+    assert len(split_rows(frame.head(2), 4)) == 2
+
+
+def shared_blocks():
+    """Names of the shared memory blocks, where the system lists them."""
+    if not os.path.isdir("/dev/shm"):
+        return set()
+    return set(os.listdir("/dev/shm"))
+
+
+def test_apply_partitioned(frame):
+    steps = [HeaderMap({"integer": "number"}, complete_map=False)]
+    expected = steps[0](frame)
+    blocks = shared_blocks()
+    for partitions in [1, 4]:
+        output = apply_partitioned(steps, frame, partitions, max_workers=2)
+        pd.testing.assert_frame_equal(output, expected)
+    output = apply_partitioned(steps, frame.head(0), 4)
+    pd.testing.assert_frame_equal(output, expected.head(0))
+    # the shards and outputs are freed
+    assert shared_blocks() <= blocks
@@ -61,6 +61,25 @@ class CustomTestEqualsWithListInvalid2(PassthroughOperator):
         return input_
 
 
+class FingerprintValid(PassthroughOperator):
+    """Passthrough verified by fingerprints"""
+
+    verification = "fingerprint"
+
+    def transform(self, input_: list) -> list:
+        return input_
+
+
+class FingerprintInvalid(PassthroughOperator):
+    """Passthrough verified by fingerprints that modifies its input"""
+
+    verification = "fingerprint"
+
+    def transform(self, input_: list) -> list:
+        input_.reverse()
+        return input_
+
+
 class CustomErrorMessage(PassthroughOperator):
     def error_message(self, input_, output_):
         return "Custom message"
@@ -93,3 +112,15 @@ class TestPassthroughOperator:
     def test_customtestequalswithlistinvalid2(self):
         with pytest.raises(RuntimeError) as record:
             CustomTestEqualsWithListInvalid2()(["a", "b"])
+
+    def test_fingerprintvalid(self):
+        assert FingerprintValid()(["a", "b"]) == ["a", "b"]
+
+    def test_fingerprintinvalid(self):
+        with pytest.raises(RuntimeError):
+            FingerprintInvalid()(["a", "b"])
+
+    def test_noverification(self):
+        operator = FingerprintInvalid()
+        operator.verification = None
+        assert operator(["a", "b"]) == ["b", "a"]
@@ -0,0 +1,481 @@
+import logging
+import os
+import pytest
+import shutil
+import threading
+import tracemalloc
+
+from concurrent.futures import ThreadPoolExecutor
+
+from pandas import DataFrame, concat, isna, read_csv, read_pickle
+
+from piperoni.operators.extract.extract_file.csv_ import CSVExtractor
+from piperoni.operators.load import cache, checkpoint
+from piperoni.operators.load.checkpoint import (
+    CHECKPOINT_FORMATS,
+    read_checkpoint,
+    register_checkpoint_format,
+)
+from piperoni.operators.pipe import Pipe
+from piperoni.operators.transform.featurize.featurizer import (
+    CustomFeaturizer,
+)
+from piperoni.operators.transform.transform_name.header_map import HeaderMap
+from piperoni.operators.transform.transform_name.select_columns import (
+    SelectColumns,
+)
+from piperoni.operators.transform.transform_value.value_transformers import (
+    Normalizer,
+)
+from piperoni.operators.transform_operator import TransformOperator
+
+"""
+Implements tests for the execution modes of the Pipe object.
+"""
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+CSV_TEST_FILE = os.path.join(
+    ROOT_DIR, "..", "..", "..", "test_files", "Strehlow and Cook.csv"
+)
+
+
+def double_band_gap(df: DataFrame) -> DataFrame:
+    """Returns a new column with a default index, like most featurizers."""
+    return DataFrame({"Band gap x2": df["band_gap"].values * 2.0})
+
+
+class CountRows(TransformOperator):
+    """Non-streamable operator recording the sizes of its inputs."""
+
+    def __init__(self):
+        self.sizes = []
+
+    def transform(self, df: DataFrame) -> DataFrame:
+        self.sizes.append(len(df))
+        return df
+
+
+class Crash(TransformOperator):
+    """Operator failing while crashing is set."""
+
+    crashing = False
+
+    def transform(self, df: DataFrame) -> DataFrame:
+        if Crash.crashing:
+            raise RuntimeError("Crashed")
+        return df
+
+
+class Warner(TransformOperator):
+    """Operator logging a warning once all parties reach a barrier."""
+
+    def __init__(self, barrier):
+        self.barrier = barrier
+
+    def transform(self, input_):
+        self.barrier.wait(timeout=10)
+        self.logger.warning("warned")
+        return input_
+
+
+class SetFirst(TransformOperator):
+    """Operator modifying its input in place and returning it."""
+
+    def transform(self, df: DataFrame) -> DataFrame:
+        df.loc[0, "v"] = 99
+        return df
+
+
+def _write_pickle(df, path, compression, **kwargs):
+    df.to_pickle(path, compression=compression, **kwargs)
+
+
+def _read_pickle(path, compression, **kwargs):
+    return read_pickle(path, compression=compression or "infer", **kwargs)
+
+
+def fail(df, path, compression, **kwargs):
+    raise OSError(f"Cannot write {path}")
+
+
+def build_steps():
+    return [
+        CSVExtractor(),
+        HeaderMap({"Band gap": "band_gap"}, complete_map=False),
+        Normalizer(["band_gap"], [1.0]),
+        CustomFeaturizer(double_band_gap, streamable=True),
+    ]
+
+
+class TestStreaming:
+    """Tests streaming execution of a pipe."""
+
+    def test_transform(self):
+        """Tests that streaming gives the same output as a full read."""
+        expected = Pipe(build_steps() + [CountRows()])(CSV_TEST_FILE)
+        counter = CountRows()
+        output = Pipe(build_steps() + [counter], chunksize=100)(CSV_TEST_FILE)
+        assert output.equals(expected)
+        # chunks are collected before the non-streamable step
+        assert counter.sizes == [len(expected)]
+
+    def test_stream(self):
+        """Tests that a streamable pipe yields bounded chunks."""
+        expected = Pipe(build_steps())(CSV_TEST_FILE)
+        chunks = list(Pipe(build_steps(), chunksize=100).stream(CSV_TEST_FILE))
+        assert max(len(chunk) for chunk in chunks) == 100
+        assert concat(chunks).equals(expected)
+
+        with pytest.raises(RuntimeError):
+            Pipe(build_steps() + [CountRows()], chunksize=100).stream(
+                CSV_TEST_FILE
+            )
+        with pytest.raises(RuntimeError):
+            Pipe(build_steps()).stream(CSV_TEST_FILE)
+
+
+class TestProfiling:
+    """Tests profiling of a pipe."""
+
+    def test_report(self):
+        """Tests that every step is profiled and sent to subscribers."""
+        pipe = Pipe(build_steps(), name="Profiled", trace_memory=True)
+        received = []
+        pipe.subscribe(received.append)
+        output = pipe(CSV_TEST_FILE)
+
+        report = pipe.report.to_dataframe()
+        assert list(report["operator"]) == [
+            "CSVExtractor",
+            "HeaderMap",
+            "Normalizer",
+            "CustomFeaturizer",
+        ]
+        assert list(report["step"]) == [0, 1, 2, 3]
+        assert (report["pipe"] == "Profiled").all()
+        assert report["run"].nunique() == 1
+        assert (report["wall_time"] >= 0).all()
+        assert (report["peak_memory"] >= 0).all()
+        assert isna(report["input_rows"][0])
+        assert report["output_rows"].iloc[-1] == len(output)
+        assert report["output_columns"].iloc[-1] == len(output.columns)
+        assert [profile.operator for profile in received] == list(
+            report["operator"]
+        )
+        assert "CustomFeaturizer" in pipe.report.to_json()
+
+    def test_trace_memory_stopped(self):
+        """Tests that memory tracing started for a step is stopped after
+        it, even when the step fails, and that strings are measured."""
+        assert not tracemalloc.is_tracing()
+        pipe = Pipe(build_steps(), trace_memory=True, profile=True)
+        pipe(CSV_TEST_FILE)
+        assert not tracemalloc.is_tracing()
+
+        Crash.crashing = True
+        try:
+            with pytest.raises(RuntimeError):
+                Pipe([Crash()], trace_memory=True, profile=True)(DataFrame())
+        finally:
+            Crash.crashing = False
+        assert not tracemalloc.is_tracing()
+
+        df = DataFrame({"name": ["a" * 100] * 10})
+        pipe = Pipe([CountRows()], profile=True)
+        pipe(df)
+        assert pipe.report.profiles[0].input_bytes > 1000
+
+    def test_disabled(self):
+        """Tests that nothing is recorded by default."""
+        pipe = Pipe(build_steps())
+        pipe(CSV_TEST_FILE)
+        assert len(pipe.report) == 0
+
+
+class TestLogging:
+    """Tests the logging of a pipe."""
+
+    def test_context(self, caplog):
+        """Tests that records carry the pipe and operator context."""
+        pipe = Pipe(build_steps(), name="Logged")
+        with caplog.at_level(logging.INFO, logger="base"):
+            pipe(CSV_TEST_FILE)
+        records = [r for r in caplog.records if r.msg == "Applying transform"]
+        assert [record.operator for record in records] == [
+            "CSVExtractor",
+            "HeaderMap",
+            "Normalizer",
+            "CustomFeaturizer",
+        ]
+        # the timestamp is computed once per run
+        assert len({record.pipe_tag for record in records}) == 1
+        assert records[0].pipe_tag == f"{pipe.timestamp} - Logged"
+
+    def test_operator_records(self, capsys):
+        """Tests that records logged by operators get the context of the
+        pipe applying them, also when pipes run in parallel threads."""
+        barrier = threading.Barrier(2)
+        first = Pipe([Warner(barrier)], name="First")
+        second = Pipe([Warner(barrier)], name="Second")
+        with ThreadPoolExecutor(2) as pool:
+            futures = [pool.submit(pipe, 0) for pipe in (first, second)]
+            for future in futures:
+                future.result()
+        lines = capsys.readouterr().err.splitlines()
+        assert f"  {first._tag} - Warner: warned" in lines
+        assert f"  {second._tag} - Warner: warned" in lines
+
+    def test_disabled_levels(self):
+        """Tests that levels below every handler are disabled."""
+        pipe = Pipe(build_steps(), stream_logging_level=logging.WARNING)
+        assert not pipe.logger.isEnabledFor(logging.INFO)
+        pipe = Pipe(build_steps(), stream_logging_level=logging.DEBUG)
+        assert pipe.logger.isEnabledFor(logging.DEBUG)
+
+
+class TestAutocompare:
+    """Tests the comparison of the inputs of steps to their outputs."""
+
+    def test_in_place_step(self):
+        """Tests that changes made in place by a step are reported."""
+        pipe = Pipe([SetFirst()], autocompare=True, uid_column="uid")
+        with pytest.warns(UserWarning) as record:
+            pipe(DataFrame({"uid": [0, 1], "v": [1, 2]}))
+        assert record[0].message.args[0] == (
+            "Row 0 has values [99] in input data, but has values [1] in "
+            "the reference for columns ['v']"
+        )
+
+
+class TestCheckpointing:
+    """Tests autocheckpointing of a pipe."""
+
+    @pytest.mark.parametrize("format", ["csv", "parquet"])
+    def test_restart(self, tmp_path, format):
+        """Tests that a pipe restarts from the checkpoint of a step."""
+        if format != "csv":
+            pytest.importorskip("pyarrow")
+        counter = CountRows()
+        pipe = Pipe(
+            build_steps() + [counter],
+            logging_path=str(tmp_path),
+            autocheckpoint=True,
+            checkpoint_format=format,
+        )
+        expected = pipe(CSV_TEST_FILE)
+        assert len(list(tmp_path.glob(f"*_1.{format}"))) == 1
+
+        counter.sizes = []
+        output = pipe.restart(1)
+        assert counter.sizes == [len(expected)]
+        if format == "csv":
+            assert (output.columns == expected.columns).all()
+            assert len(output) == len(expected)
+        else:
+            assert output.equals(expected)
+
+        with pytest.raises(FileNotFoundError):
+            pipe.restart(len(pipe.steps))
+
+    def test_background(self, tmp_path, monkeypatch):
+        """Tests that background checkpoints are written before the pipe
+        returns, and that outputs are only snapshotted when a later step
+        may modify them."""
+        snapshots = []
+
+        def counting_snapshot(df):
+            snapshots.append(df)
+            return df.copy()
+
+        monkeypatch.setattr(checkpoint, "snapshot", counting_snapshot)
+        pipe = Pipe(
+            build_steps(),
+            logging_path=str(tmp_path),
+            autocheckpoint=True,
+            background_checkpoint=True,
+        )
+        expected = pipe(CSV_TEST_FILE)
+        assert pipe.checkpoint_writer.pending == 0
+        assert len(list(tmp_path.glob("*.csv"))) == len(pipe.steps)
+        output = read_checkpoint(
+            str(next(tmp_path.glob("*_3.csv"))), float_precision="round_trip"
+        )
+        assert output.equals(expected)
+        # only the input of the CustomFeaturizer is snapshotted
+        assert len(snapshots) == 1
+
+    def test_background_errors(self, tmp_path):
+        """Tests that failed background writes are raised, but do not
+        replace the error of a failed step."""
+
+        def build_pipe():
+            return Pipe(
+                build_steps() + [Crash()],
+                logging_path=str(tmp_path),
+                autocheckpoint=True,
+                checkpoint_format="broken",
+                background_checkpoint=True,
+            )
+
+        register_checkpoint_format("broken", ".broken", fail, _read_pickle)
+        try:
+            with pytest.raises(OSError):
+                build_pipe()(CSV_TEST_FILE)
+            Crash.crashing = True
+            with pytest.raises(RuntimeError, match="Crashed"):
+                build_pipe()(CSV_TEST_FILE)
+        finally:
+            Crash.crashing = False
+            del CHECKPOINT_FORMATS["broken"]
+
+    @pytest.mark.parametrize("background", [False, True])
+    def test_resume(self, tmp_path, background):
+        """Tests that a crashed pipe resumes from its last checkpoint."""
+
+        def applied(pipe):
+            operators = pipe.report.to_dataframe()["operator"]
+            return [name for name in operators if name != "Checkpoint"]
+
+        def build_pipe(delta):
+            steps = build_steps() + [Crash()]
+            steps[2] = Normalizer(["band_gap"], [delta])
+            return Pipe(
+                steps,
+                logging_path=str(tmp_path),
+                autocheckpoint=True,
+                checkpoint_format="pickle",
+                background_checkpoint=background,
+                profile=True,
+            )
+
+        register_checkpoint_format(
+            "pickle", ".pkl", _write_pickle, _read_pickle
+        )
+        try:
+            expected = Pipe(build_steps())(CSV_TEST_FILE)
+            Crash.crashing = True
+            with pytest.raises(RuntimeError):
+                build_pipe(1.0)(CSV_TEST_FILE)
+            Crash.crashing = False
+
+            pipe = build_pipe(1.0)
+            assert pipe(CSV_TEST_FILE, resume=True).equals(expected)
+            assert applied(pipe) == ["Crash"]
+
+            # checkpoints of changed steps are not resumed from
+            pipe = build_pipe(2.0)
+            pipe(CSV_TEST_FILE, resume=True)
+            assert applied(pipe) == [
+                "Normalizer",
+                "CustomFeaturizer",
+                "Crash",
+            ]
+        finally:
+            Crash.crashing = False
+            del CHECKPOINT_FORMATS["pickle"]
+
+    def test_resume_file_stat(self, tmp_path, monkeypatch):
+        """Tests that autocheckpoints of a file are matched on its size and
+        modification time without hashing its content."""
+
+        def fail(path):
+            raise AssertionError(f"{path} was hashed")
+
+        monkeypatch.setattr(cache, "file_fingerprint", fail)
+        path = str(tmp_path / "input.csv")
+        shutil.copy(CSV_TEST_FILE, path)
+        logs = tmp_path / "logs"
+        logs.mkdir()
+
+        def build_pipe():
+            return Pipe(
+                build_steps(),
+                logging_path=str(logs),
+                autocheckpoint=True,
+                profile=True,
+            )
+
+        build_pipe()(path)
+        pipe = build_pipe()
+        pipe(path, resume=True)
+        assert len(pipe.report) == 0
+
+        # modified files are not resumed from
+        with open(path, "a") as fh:
+            fh.write("\n")
+        pipe = build_pipe()
+        pipe(path, resume=True)
+        assert "CSVExtractor" in list(pipe.report.to_dataframe()["operator"])
+
+    def test_resume_without_checkpoints(self, tmp_path):
+        pipe = Pipe(build_steps(), logging_path=str(tmp_path), profile=True)
+        pipe(CSV_TEST_FILE, resume=True)
+        assert len(pipe.report) == len(pipe.steps)
+        with pytest.raises(RuntimeError):
+            Pipe(build_steps())(CSV_TEST_FILE, resume=True)
+
+    def test_invalid_format(self, tmp_path):
+        with pytest.raises(ValueError):
+            Pipe(build_steps(), checkpoint_format="xml")
+
+
+class TestLazy:
+    """Tests lazy execution of a pipe."""
+
+    def test_transform(self):
+        """Tests that the optimized plan gives the same output."""
+        steps = build_steps() + [
+            HeaderMap({"band_gap": "gap"}, complete_map=False),
+            SelectColumns(["gap", "Band gap x2"]),
+        ]
+        expected = Pipe(steps)(CSV_TEST_FILE)
+        pipe = Pipe(steps, lazy=True, profile=True)
+        assert pipe(CSV_TEST_FILE).equals(expected)
+        assert [step.__class__.__name__ for step in pipe.plan] == [
+            "CSVExtractor",
+            "HeaderMap",
+            "Normalizer",
+            "CustomFeaturizer",
+            "HeaderMap",
+            "SelectColumns",
+        ]
+        assert len(pipe.report) == len(pipe.plan)
+        assert Pipe(steps, lazy=True, chunksize=100)(CSV_TEST_FILE).equals(
+            expected
+        )
+
+    def test_input_columns(self):
+        """Tests that a pipe declares the columns its steps need."""
+        pipe = Pipe(
+            [
+                HeaderMap({"Band gap": "band_gap"}, complete_map=False),
+                SelectColumns(["band_gap", "Color"]),
+            ]
+        )
+        assert pipe.input_columns(None) == ["Band gap", "band_gap", "Color"]
+        assert Pipe(build_steps()[1:]).input_columns(["Color"]) is None
+
+
+class TestPartitions:
+    """Tests partitioned execution of a pipe."""
+
+    def test_transform(self):
+        """Tests that sharded steps give the same output as a serial run."""
+        expected = Pipe(build_steps() + [CountRows()])(CSV_TEST_FILE)
+        counter = CountRows()
+        pipe = Pipe(
+            build_steps() + [counter], partitions=3, max_workers=2, lazy=True
+        )
+        output = pipe(CSV_TEST_FILE)
+        assert output.equals(expected)
+        # shards are concatenated before the non-streamable step
+        assert counter.sizes == [len(expected)]
+
+    def test_error(self):
+        """Tests that errors raised in workers reach the pipe."""
+        steps = [
+            CSVExtractor(),
+            CustomFeaturizer(double_band_gap, streamable=True),
+        ]
+        with pytest.raises(KeyError):
+            Pipe(steps, partitions=2)(CSV_TEST_FILE)
@@ -1,5 +1,10 @@
+import os
+
+import numpy as np
 import pytest
 
+from pandas import DataFrame
+
 from piperoni.operators.transform_operator import TransformOperator
 from piperoni.operators.cast_operator import CastOperator
 from piperoni.operators.passthrough_operator import PassthroughOperator
@@ -117,3 +122,244 @@ class TestPipeline:
         "pipe3_output2": 19,
         "pipe3_output1": 1,
     }
+
+    def build_pipeline(self):
+        pipe1 = Pipe([IncrementOperator()], name="Pipe1")
+        pipe2 = Pipe([IncrementOperator()], name="Pipe2")
+        pipe3 = Pipe([SumOperator(), IncrementOperator()], name="Pipe3")
+        inputs = {
+            pipe1: "pipe1_raw",
+            pipe2: "pipe2_raw",
+            pipe3: ["pipe1_output", "pipe2_output"],
+        }
+        outputs = {
+            pipe1: "pipe1_output",
+            pipe2: "pipe2_output",
+            pipe3: "pipe3_output",
+        }
+        return Pipeline(inputs, outputs, {"pipe1_raw": 1, "pipe2_raw": 10})
+
+    @pytest.mark.parametrize("executor", ["serial", "thread", "process"])
+    def test_executors(self, executor):
+        """Tests that every executor gives the same outputs."""
+        pipeline = self.build_pipeline()
+        output = pipeline.run(executor=executor, max_workers=2)
+        assert output == {"pipe3_output": 14}
+        assert pipeline.results_dict["pipe1_output"] == 2
+        assert pipeline.results_dict["pipe2_output"] == 11
+
+    def test_invalid_executor(self):
+        with pytest.raises(ValueError):
+            self.build_pipeline().run(executor="invalid")
+
+
+class AddOne(TransformOperator):
+    """Adds one to a DataFrame without modifying it."""
+
+    def transform(self, input_):
+        return input_ + 1
+
+
+class Writeable(CastOperator):
+    """Reports whether the columns of a DataFrame can be written to."""
+
+    @property
+    def input_type(self):
+        return DataFrame
+
+    @property
+    def output_type(self):
+        return DataFrame
+
+    def transform(self, input_):
+        return DataFrame(
+            {"writeable": [input_["a"].to_numpy().flags.writeable]}
+        )
+
+
+class TestSharedTransport:
+    def build_pipeline(self):
+        pipe1 = Pipe([AddOne()], name="Pipe1")
+        pipe2 = Pipe([Writeable()], name="Pipe2")
+        pipe3 = Pipe([AddOne()], name="Pipe3")
+        inputs = {pipe1: "raw", pipe2: "pipe1_output", pipe3: "pipe1_output"}
+        outputs = {
+            pipe1: "pipe1_output",
+            pipe2: "pipe2_output",
+            pipe3: "pipe3_output",
+        }
+        raw = DataFrame({"a": np.arange(5), "b": np.linspace(0.0, 1.0, 5)})
+        return Pipeline(inputs, outputs, {"raw": raw})
+
+    def test_run(self):
+        """Tests that pipes get read-only views of mapped DataFrames, and
+        that consumed intermediate results are freed."""
+        pytest.importorskip("pyarrow")
+        expected = self.build_pipeline().run("process", 2)
+        assert expected["pipe2_output"]["writeable"].all()
+
+        pipeline = self.build_pipeline()
+        output = pipeline.run("process", 2, transport="shared")
+        assert not output["pipe2_output"]["writeable"].any()
+        assert output["pipe3_output"].equals(expected["pipe3_output"])
+        assert output["pipe3_output"]["a"].to_numpy().flags.writeable
+        assert "pipe1_output" not in pipeline.results_dict
+        assert "raw" in pipeline.results_dict
+        # a new run returns the final outputs without running pipes again
+        assert pipeline.run()["pipe3_output"] is output["pipe3_output"]
+
+    def test_invalid_transport(self):
+        with pytest.raises(ValueError):
+            self.build_pipeline().run("process", transport="invalid")
+
+
+class Spy(TransformOperator):
+    """Increments its input, recording the codenames cached by a pipeline
+    and the number of times it ran."""
+
+    def __init__(self, results_dict):
+        self.results_dict = results_dict
+        self.cached = []
+        self.runs = 0
+
+    def transform(self, input_):
+        self.cached.append(set(self.results_dict))
+        self.runs += 1
+        return input_ + 1
+
+
+class TestEviction:
+    def build_pipeline(self, **kwargs):
+        """Builds a chain of pipes raw -> a1 -> a2 -> a3 -> a4."""
+        raws = {"raw": 0}
+        spies = [Spy(raws) for _ in range(4)]
+        pipes = [Pipe([spy], name=f"Pipe{i}") for i, spy in enumerate(spies)]
+        inputs = {pipe: f"a{i}" for i, pipe in enumerate(pipes)}
+        inputs[pipes[0]] = "raw"
+        outputs = {pipe: f"a{i + 1}" for i, pipe in enumerate(pipes)}
+        return Pipeline(inputs, outputs, raws, **kwargs), spies
+
+    @pytest.mark.parametrize("executor", ["serial", "thread"])
+    def test_evict(self, executor):
+        """Tests that only the results of the running pipes are cached."""
+        pipeline, spies = self.build_pipeline(evict=True, pinned=["a1"])
+        assert pipeline.run(executor) == {"a4": 4}
+        assert spies[-1].cached[0] == {"raw", "a1", "a3"}
+        assert set(pipeline.results_dict) == {"raw", "a1", "a4"}
+
+        # evicted results are computed again when they are needed
+        del pipeline.results_dict["a4"]
+        assert pipeline.run(executor) == {"a4": 4}
+        assert [spy.runs for spy in spies] == [1, 2, 2, 2]
+
+    def test_spill(self, tmp_path):
+        """Tests that evicted results are read back from the spill."""
+        pipeline, spies = self.build_pipeline(spill=str(tmp_path))
+        assert pipeline.run() == {"a4": 4}
+        assert set(pipeline.results_dict) == {"raw", "a4"}
+        assert len(os.listdir(str(tmp_path))) == 3
+
+        del pipeline.results_dict["a4"]
+        assert pipeline.run("thread") == {"a4": 4}
+        assert [spy.runs for spy in spies] == [1, 1, 1, 2]
+
+        # invalidated spills are deleted
+        pipeline.invalidate("raw")
+        assert os.listdir(str(tmp_path)) == []
+
+    def test_shared_spill(self, tmp_path):
+        """Tests that pipelines sharing a spill directory keep their spills
+        apart."""
+        first, first_spies = self.build_pipeline(spill=str(tmp_path))
+        second, second_spies = self.build_pipeline(spill=str(tmp_path))
+        second.results_dict["raw"] = 100
+        assert first.run() == {"a4": 4}
+        assert second.run() == {"a4": 104}
+        assert len(os.listdir(str(tmp_path))) == 6
+
+        # a spill read back is deleted, and written again once consumed
+        del first.results_dict["a4"]
+        assert first._result("a3") == 3
+        assert len(os.listdir(str(tmp_path))) == 5
+        assert first.run() == {"a4": 4}
+        assert "a3" not in first.results_dict
+        assert len(os.listdir(str(tmp_path))) == 6
+
+        second.invalidate("a2")
+        assert second.run() == {"a4": 104}
+        assert len(os.listdir(str(tmp_path))) == 6
+        assert [spy.runs for spy in first_spies] == [1, 1, 1, 2]
+        assert [spy.runs for spy in second_spies] == [1, 2, 2, 2]
+
+    def test_branches(self):
+        """Tests eviction with pipes of several inputs and outputs."""
+        expected = TestPipeline.pipeline.results_dict
+        pipeline = Pipeline(
+            TestPipeline.inputs,
+            TestPipeline.outputs,
+            {"pipe1_raw": 3, "pipe2_raw": 7, "pipe3_raw": 13},
+            evict=True,
+        )
+        output = pipeline.run()
+        assert output == {k: expected[k] for k in output}
+        assert set(pipeline.results_dict) == {
+            "pipe1_raw",
+            "pipe2_raw",
+            "pipe3_raw",
+            "pipe2_output2",
+            "pipe3_output1",
+            "pipe3_output2",
+        }
+        assert pipeline.run() == output
+
+
+class TestInvalidation:
+    def build_pipeline(self, **kwargs):
+        """Builds pipes raw1 -> a and raw2 -> b, joined by [a, b] -> c."""
+        raws = {"raw1": 1, "raw2": 10}
+        spies = [Spy(raws), Spy(raws), Spy(raws)]
+        pipe1 = Pipe([spies[0]], name="Pipe1")
+        pipe2 = Pipe([spies[1]], name="Pipe2")
+        pipe3 = Pipe([SumOperator(), spies[2]], name="Pipe3")
+        inputs = {pipe1: "raw1", pipe2: "raw2", pipe3: ["a", "b"]}
+        outputs = {pipe1: "a", pipe2: "b", pipe3: "c"}
+        return Pipeline(inputs, outputs, raws, **kwargs), spies
+
+    def runs(self, spies):
+        return [spy.runs for spy in spies]
+
+    @pytest.mark.parametrize("evict", [False, True])
+    def test_update_input(self, evict, tmp_path):
+        spill = str(tmp_path) if evict else None
+        pipeline, spies = self.build_pipeline(spill=spill)
+        assert pipeline.run() == {"c": 14}
+
+        assert pipeline.update_input("raw2", 20) == ["b", "c"]
+        assert pipeline.run() == {"c": 24}
+        assert self.runs(spies) == [1, 2, 2]
+
+        # an unchanged input invalidates nothing
+        assert pipeline.update_input("raw2", 20) == []
+        assert pipeline.run() == {"c": 24}
+        assert self.runs(spies) == [1, 2, 2]
+
+        with pytest.raises(ValueError):
+            pipeline.update_input("a", 0)
+
+    def test_invalidate(self):
+        pipeline, spies = self.build_pipeline()
+        pipeline.run("thread")
+        pipe1 = next(iter(pipeline.inputs_dict))
+
+        assert pipeline.invalidate(pipe1) == ["a", "c"]
+        assert pipeline.run("thread") == {"c": 14}
+        assert self.runs(spies) == [2, 1, 2]
+
+        # a raw input modified in place
+        assert pipeline.invalidate("raw1") == ["a", "c"]
+        assert pipeline.invalidate("c") == ["c"]
+        assert pipeline.run() == {"c": 14}
+        assert self.runs(spies) == [3, 1, 3]
+
+        with pytest.raises(KeyError):
+            pipeline.invalidate("missing")
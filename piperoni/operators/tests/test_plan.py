@@ -0,0 +1,198 @@
+import os
+import subprocess
+import sys
+
+from pandas import DataFrame, read_csv
+
+from piperoni.operators.extract.extract_file.csv_ import CSVExtractor
+from piperoni.operators.load.checkpoint import Checkpoint
+from piperoni.operators.plan import (
+    modifies_input,
+    optimize_steps,
+    required_columns,
+)
+from piperoni.operators.transform.featurize.featurizer import (
+    CustomFeaturizer,
+)
+from piperoni.operators.transform.transform_name.header_map import HeaderMap
+from piperoni.operators.transform.transform_name.select_columns import (
+    SelectColumns,
+)
+from piperoni.operators.transform.transform_value.value_transformers import (
+    Normalizer,
+)
+
+"""
+Implements tests for the optimization of pipe steps into plans.
+"""
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+CSV_TEST_FILE = os.path.join(
+    ROOT_DIR, "..", "..", "..", "test_files", "Strehlow and Cook.csv"
+)
+
+
+# fingerprints the projected extractors of lazy plans
+FINGERPRINT_PLANS = """
+from piperoni.operators.extract.extract_file.csv_ import CSVExtractor
+from piperoni.operators.extract.extract_file.excel import ExcelExtractor
+from piperoni.operators.plan import optimize_steps
+from piperoni.operators.transform.transform_name.select_columns import (
+    SelectColumns,
+)
+from piperoni.utils import fingerprint
+
+selection = SelectColumns(["Identity", "Band gap", "Color", "missing"])
+for extractor in (CSVExtractor(), ExcelExtractor()):
+    print(fingerprint(optimize_steps([extractor, selection])[0]))
+"""
+
+
+def apply(steps, input_):
+    for step in steps:
+        input_ = step(input_)
+    return input_
+
+
+def double_band_gap(df: DataFrame) -> DataFrame:
+    return DataFrame({"Band gap x2": df["gap"].values * 2.0})
+
+
+def test_fuse_header_maps():
+    """Tests that consecutive renames are fused into one HeaderMap."""
+    data = DataFrame({"a": [1], "b": [2], "c": [3]})
+    cases = [
+        [HeaderMap({"a": "x"}, False), HeaderMap({"x": "y", "b": "z"}, False)],
+        [
+            HeaderMap({"a": "x", "b": "b", "c": "c"}),
+            HeaderMap({"x": "y"}, False),
+        ],
+        [
+            HeaderMap({"a": "x", "b": "y", "c": "z"}),
+            HeaderMap({"x": "c", "y": "b", "z": "a"}),
+        ],
+    ]
+    for steps in cases:
+        plan = optimize_steps(steps)
+        assert len(plan) == 1
+        assert apply(plan, data).equals(apply(steps, data))
+
+    # a complete map after a partial one depends on the input headers
+    steps = [HeaderMap({"a": "x"}, False), HeaderMap({"x": "y", "b": "b"})]
+    assert len(optimize_steps(steps)) == 2
+
+
+def test_fuse_normalizers():
+    """Tests that consecutive Normalizers are fused with identical
+    values."""
+    data = DataFrame({"a": [0.1, 0.2], "b": [1.0, 2.0]})
+    steps = [Normalizer(["a"], [0.7]), Normalizer(["a", "b"], [0.1, 1.0])]
+    plan = optimize_steps(steps)
+    assert len(plan) == 1
+    assert apply(plan, data).equals(apply(steps, data))
+
+
+def test_push_projection():
+    """Tests that selected columns are pushed into the extractor through
+    renames and normalizations."""
+    steps = [
+        CSVExtractor(),
+        HeaderMap({"Band gap": "gap"}, complete_map=False),
+        Normalizer(["gap", "uncertainty in band gap"], [1.0, 1.0]),
+        SelectColumns(["gap", "Identity"]),
+    ]
+    plan = optimize_steps(steps)
+    assert list(plan[0](CSV_TEST_FILE).columns) == ["Identity", "Band gap"]
+    assert plan[2].columns == ["gap"]
+    assert "usecols" not in steps[0].kwargs
+    assert apply(plan, CSV_TEST_FILE).equals(apply(steps, CSV_TEST_FILE))
+
+    # featurizers may read any column
+    steps = [
+        CSVExtractor(),
+        HeaderMap({"Band gap": "gap"}, complete_map=False),
+        CustomFeaturizer(double_band_gap),
+        SelectColumns(["Band gap x2"]),
+    ]
+    assert "usecols" not in optimize_steps(steps)[0].kwargs
+
+
+def test_projection_fingerprint():
+    """Tests that projected extractors have the same fingerprint in
+    processes with different hash seeds."""
+    outputs = set()
+    for seed in ("1", "2", "3"):
+        outputs.add(
+            subprocess.run(
+                [sys.executable, "-c", FINGERPRINT_PLANS],
+                env={**os.environ, "PYTHONHASHSEED": seed},
+                capture_output=True,
+                check=True,
+                text=True,
+            ).stdout
+        )
+    assert len(outputs) == 1
+
+
+def test_elide_copies():
+    """Tests that only data produced inside the plan is modified in
+    place."""
+    steps = [
+        HeaderMap({"Band gap": "gap"}, complete_map=False),
+        CustomFeaturizer(double_band_gap, owns_output=True),
+        HeaderMap({"gap": "band_gap"}, complete_map=False),
+    ]
+    data = read_csv(CSV_TEST_FILE)
+    expected = data.copy()
+    plan = optimize_steps(steps)
+    assert [step.copy for step in (plan[0], plan[2])] == [True, False]
+    assert steps[2].copy
+    assert apply(plan, data).equals(apply(steps, data))
+    assert data.equals(expected)
+    assert optimize_steps(steps, elide_copies=False)[2].copy
+
+    # featurizers may return their input unless they declare otherwise
+    steps[1] = CustomFeaturizer(double_band_gap)
+    assert optimize_steps(steps)[2].copy
+
+
+def test_modifies_input():
+    """Tests which steps may modify their input in place."""
+    header_map = HeaderMap({"Band gap": "gap"}, complete_map=False)
+    assert not modifies_input([])
+    assert not modifies_input([header_map, CustomFeaturizer(double_band_gap)])
+    assert not modifies_input([SelectColumns(["gap"])])
+    assert modifies_input([CustomFeaturizer(double_band_gap)])
+    # passthrough operators return their input to the next step
+    checkpoint = Checkpoint("checkpoint.csv")
+    assert modifies_input([checkpoint, CustomFeaturizer(double_band_gap)])
+    assert not modifies_input([checkpoint, header_map])
+
+    # copies elided by lazy plans
+    featurizer = CustomFeaturizer(double_band_gap, owns_output=True)
+    assert modifies_input(optimize_steps([featurizer, header_map])[1:])
+
+
+def test_required_columns():
+    """Tests that extractors only read the columns steps declare they
+    need."""
+    steps = [
+        CSVExtractor(),
+        HeaderMap({"Band gap": "gap"}, complete_map=False),
+        CustomFeaturizer(double_band_gap, requires=["gap"]),
+        SelectColumns(["Identity", "Band gap x2"]),
+    ]
+    # a partial map also passes through input columns named like its output
+    assert required_columns(steps[1:]) == [
+        "Identity",
+        "Band gap x2",
+        "Band gap",
+        "gap",
+    ]
+    plan = optimize_steps(steps)
+    assert list(plan[0](CSV_TEST_FILE).columns) == ["Identity", "Band gap"]
+    assert apply(plan, CSV_TEST_FILE).equals(apply(steps, CSV_TEST_FILE))
+
+    # every column is output without a selection
+    assert required_columns(steps[1:3]) is None
+    assert optimize_steps(steps[:3])[0] is steps[0]
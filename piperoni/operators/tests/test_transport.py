@@ -0,0 +1,59 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from piperoni.operators.transport import (
+    FrameStore,
+    resolve_value,
+    share_value,
+)
+
+"""
+Implements tests for the transport of DataFrames through mapped files.
+"""
+
+pytest.importorskip("pyarrow")
+
+
+@pytest.fixture
+def frame():
+    return pd.DataFrame(
+        {"a": np.arange(5), "b": ["x", "y", None, "z", "w"]},
+        index=np.arange(5, 10),
+    )
+
+
+def test_store(frame):
+    store = FrameStore()
+    try:
+        shared = store.put("data", frame, consumers=2)
+        view = shared.read()
+        pd.testing.assert_frame_equal(view, frame)
+        assert not view["a"].to_numpy().flags.writeable
+        assert shared.read(copy=True)["a"].to_numpy().flags.writeable
+
+        assert not store.release("data")
+        assert os.path.exists(shared.path)
+        assert store.release("data")
+        assert not os.path.exists(shared.path)
+        assert not store.release("data")
+        # views stay readable after the file is deleted
+        pd.testing.assert_frame_equal(view, frame)
+
+        # DataFrames without a lossless Arrow representation are not stored
+        assert store.put("lists", pd.DataFrame({"a": [[1], [2]]})) is None
+        assert len(store) == 0
+    finally:
+        store.close()
+    assert not os.path.exists(store.directory)
+
+
+def test_share_value(frame, tmp_path):
+    value = {"frame": frame, "number": 1}
+    shared = share_value(value, str(tmp_path))
+    assert shared["number"] == 1
+    assert len(os.listdir(str(tmp_path))) == 1
+    resolved = resolve_value(shared)
+    pd.testing.assert_frame_equal(resolved["frame"], frame)
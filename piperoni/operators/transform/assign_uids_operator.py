@@ -1,34 +1,210 @@
+import os
+import sqlite3
+import threading
+
+import numpy as np
+
 from piperoni.operators.transform_operator import TransformOperator
+from piperoni.utils import replace_columns
 
 from pandas import DataFrame
 from uuid import uuid1
 
 """
 This module implements an operator that can assign UIDs and update them as new rows are added.
+
+UID numbers are handed out by allocators in contiguous ranges. The
+MemoryAllocator keeps its counter in the process, and the SQLiteAllocator
+keeps it in a database file, so that repeated runs and parallel processes
+never allocate the same numbers twice.
+
+Examples
+--------
+Assigning UIDs that stay unique across runs::
+  allocator = SQLiteAllocator("path/to/uids.sqlite")
+  operator = AssignUIDsOperator("uid", allocator=allocator)
+  df = operator(df)
 """
 
 
+class MemoryAllocator:
+    """Allocates UID numbers from a counter held in memory.
+
+    The allocator is thread-safe. Copies of it, like those made when it is
+    sent to other processes, count on their own, so parallel processes need
+    a SQLiteAllocator.
+
+    Parameters
+    ----------
+    start : int, optional
+        First UID number, by default 0
+    """
+
+    def __init__(self, start=0):
+        self.next_uid = start
+        self._lock = threading.Lock()
+
+    def allocate(self, count: int) -> int:
+        """Reserves count consecutive UID numbers.
+
+        Parameters
+        ----------
+        count : int
+            Number of UID numbers to reserve.
+
+        Returns
+        -------
+        int
+            The first reserved number.
+        """
+        with self._lock:
+            start = self.next_uid
+            self.next_uid += count
+        return start
+
+    def peek(self) -> int:
+        """Returns the next UID number, without reserving it."""
+        return self.next_uid
+
+    def __getstate__(self):
+        return {"next_uid": self.next_uid}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+
+class SQLiteAllocator:
+    """Allocates UID numbers from a counter stored in a SQLite database.
+
+    Every allocation is a transaction holding the write lock of the
+    database, so threads and processes sharing the file get disjoint ranges
+    of numbers, and runs continue from where the previous ones stopped.
+
+    Parameters
+    ----------
+    path : str
+        Path to the database file, created if it does not exist.
+    name : str, optional
+        Name of the counter, so that one database can hold several, by
+        default "uid"
+    start : int, optional
+        First UID number of a new counter, by default 0
+    timeout : float, optional
+        Seconds to wait for other allocations to end, by default 60.0
+    """
+
+    def __init__(self, path: str, name="uid", start=0, timeout=60.0):
+        self.path = path
+        self.name = name
+        self.start = start
+        self.timeout = timeout
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        connection = self._connect()
+        try:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS uid_counters "
+                "(name TEXT PRIMARY KEY, next_uid INTEGER NOT NULL)"
+            )
+        finally:
+            connection.close()
+
+    def allocate(self, count: int) -> int:
+        """Reserves count consecutive UID numbers.
+
+        Parameters
+        ----------
+        count : int
+            Number of UID numbers to reserve.
+
+        Returns
+        -------
+        int
+            The first reserved number.
+        """
+        connection = self._connect()
+        try:
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                start = self._next_uid(connection)
+                connection.execute(
+                    "INSERT OR REPLACE INTO uid_counters (name, next_uid) "
+                    "VALUES (?, ?)",
+                    (self.name, start + count),
+                )
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+            connection.execute("COMMIT")
+        finally:
+            connection.close()
+        return start
+
+    def peek(self) -> int:
+        """Returns the next UID number, without reserving it."""
+        connection = self._connect()
+        try:
+            return self._next_uid(connection)
+        finally:
+            connection.close()
+
+    def _connect(self):
+        # transactions are started explicitly
+        return sqlite3.connect(
+            self.path, timeout=self.timeout, isolation_level=None
+        )
+
+    def _next_uid(self, connection):
+        row = connection.execute(
+            "SELECT next_uid FROM uid_counters WHERE name = ?", (self.name,)
+        ).fetchone()
+        return self.start if row is None else row[0]
+
+
 class AssignUIDsOperator(TransformOperator):
     """
     Assigns and updates UIDs as necessary.
     By default, prepends with a unique uuid signature.
 
+    UIDs are the prefix followed by a number. Rows missing a UID get
+    consecutive numbers reserved from the allocator in a single range, and
+    their UIDs are built at once rather than row by row.
+
     Parameters
     ----------
     uid_column : str
         Column name to add UIDs to
     uid_start : int, optional
-        Start of UID numerical increment, by default 0
+        Start of UID numerical increment, by default 0. Ignored when an
+        allocator is given.
     unique_prepend : str, optional
         A string to prepend numerical increments with, by default str(uuid1())+' - '
+    allocator : MemoryAllocator or SQLiteAllocator or str or None, optional
+        Allocator of the UID numbers, or the path to the database of a
+        SQLiteAllocator. By default, a MemoryAllocator starting at
+        uid_start.
     """
 
     def __init__(
-        self, uid_column, uid_start=0, unique_prepend=str(uuid1()) + " - "
+        self,
+        uid_column,
+        uid_start=0,
+        unique_prepend=str(uuid1()) + " - ",
+        allocator=None,
     ):
         self.uid_column = uid_column
-        self.uid_counter = uid_start
         self.unique_prepend = unique_prepend
+        if allocator is None:
+            allocator = MemoryAllocator(uid_start)
+        elif isinstance(allocator, str):
+            allocator = SQLiteAllocator(allocator, start=uid_start)
+        self.allocator = allocator
+
+    @property
+    def uid_counter(self) -> int:
+        """The next UID number."""
+        return self.allocator.peek()
 
     def transform(self, df: DataFrame):
         """
@@ -37,7 +213,7 @@ class AssignUIDsOperator(TransformOperator):
         Parameters
         ----------
         df : pd.DataFrame
-            Dataframe to augment with UIDs.
+            Dataframe to augment with UIDs. It is not modified.
 
         Returns
         -------
@@ -46,19 +222,25 @@ class AssignUIDsOperator(TransformOperator):
         """
 
         if self.uid_column not in df.columns:
-            df[self.uid_column] = [
-                f"{self.unique_prepend}{i}" for i in range(len(df.index))
-            ]
-            self.uid_counter = len(df.index)
-
-        else:
-            ids = df[self.uid_column].values
-            if any(np.isnan(ids)):
-                max_uid = self.uid_counter
-                for i, uid in enumerate(ids):
-                    if np.isnan(uid):
-                        self.uid_counter += 1
-                        ids[i] = f"{self.unique_prepend}{self.uid_counter}"
-            df[self.uid_column] = ids
-
-        return df
+            df = df.copy(deep=False)
+            df[self.uid_column] = self._uids(len(df.index))
+            return df
+
+        ids = df[self.uid_column]
+        missing = ids.isna().to_numpy()
+        count = int(missing.sum())
+        if count == 0:
+            return df
+        ids = ids.to_numpy(dtype=object, copy=True)
+        ids[missing] = self._uids(count)
+        return replace_columns(df, {self.uid_column: ids})
+
+    def _uids(self, count):
+        """Builds the UIDs of count newly allocated numbers."""
+        start = self.allocator.allocate(count)
+        # formatting python ints is faster than numpy or pandas string casts
+        uids = np.empty(count, dtype=object)
+        uids[:] = [
+            f"{self.unique_prepend}{i}" for i in range(start, start + count)
+        ]
+        return uids
@@ -1,6 +1,6 @@
 """Implements featurizers, which add columns to existing data."""
 
-from typing import Callable
+from typing import Callable, List
 
 from pandas import DataFrame, concat
 from piperoni.operators.base import BaseOperator
@@ -15,6 +15,20 @@ class CustomFeaturizer(BaseOperator):
         The callable used to generate new DataFrame columns. The callable
         should accept a DataFrame as the first argument followed by any *args
         and **kwargs. It should return additional columns as a DataFrame.
+    requires: List[str] or None, optional
+        Headers of the columns func reads. Declaring them lets lazy pipes
+        only read the columns that are used. If None, func may read any
+        column.
+    streamable: bool, optional
+        Whether func only computes new columns from values in the same row,
+        which lets pipes apply the featurizer chunk by chunk or to shards
+        of rows. Must be False if func aggregates, ranks, deduplicates or
+        normalizes over rows. Defaults to False.
+    owns_output: bool, optional
+        Whether the columns returned by func are new data that nothing else
+        references, which lets lazy pipes modify them in place in the next
+        steps. Must be False if func returns its input or columns of it.
+        Defaults to False.
     kwargs: keyword arguments
         Keyword arguments passed to func.
 
@@ -23,10 +37,26 @@ class CustomFeaturizer(BaseOperator):
     This operator will concatenate data returned by func with the input data.
     """
 
-    def __init__(self, func: Callable, **kwargs: dict):
+    def __init__(
+        self,
+        func: Callable,
+        requires: List[str] = None,
+        streamable: bool = False,
+        owns_output: bool = False,
+        **kwargs: dict
+    ):
         self.func = func
+        self.requires = requires
+        self.streamable = streamable
+        self.owns_output = owns_output
         self.kwargs = kwargs
 
+    def input_columns(self, columns):
+        """The needed columns and the columns read by func."""
+        if columns is None or self.requires is None:
+            return None
+        return list(dict.fromkeys([*columns, *self.requires]))
+
     def transform(self, df: DataFrame) -> DataFrame:
         """Apply the custom featurizer to input data.
 
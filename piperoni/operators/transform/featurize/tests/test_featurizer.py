@@ -75,3 +75,13 @@ class TestCustomFeaturizer:
                 assert True
             else:
                 assert i == j
+
+    def test_streamable(self, transformer):
+        """Tests that featurizers are only streamable when declared."""
+        assert not transformer.streamable
+        assert not transformer.owns_output
+        declared = CustomFeaturizer(
+            multiply_column_by_two, streamable=True, col_name="Band gap"
+        )
+        assert declared.streamable
+        assert declared.kwargs == {"col_name": "Band gap"}
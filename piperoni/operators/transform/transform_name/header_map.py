@@ -1,11 +1,11 @@
 """This module implements objects for transforming the name-space of data."""
-import yaml
 
-from copy import deepcopy
+import yaml
 
 from pandas import DataFrame
 
 from piperoni.operators.base import BaseOperator
+from piperoni.utils import snapshot
 
 
 class HeaderMap(BaseOperator):
@@ -26,11 +26,22 @@ class HeaderMap(BaseOperator):
         to True, in which case, all column headers passed to transform must
         have a key in the config. If False, then current headers that are not
         in the map will cary over to the new headers.
+    copy: bool
+        Whether to return new data with the new headers, leaving the input
+        unchanged. With pandas copy-on-write enabled, the new data shares the
+        memory of the input until either is modified, so renaming takes the
+        same time whatever the size of the data; otherwise it is a copy. If
+        False, the headers of the input are replaced. Defaults to True.
     """
 
-    def __init__(self, config: dict, complete_map: bool = True):
+    streamable = True
+
+    def __init__(
+        self, config: dict, complete_map: bool = True, copy: bool = True
+    ):
         self.config = config
         self.complete_map = complete_map
+        self.copy = copy
 
     @classmethod
     def from_yaml(cls, path: str, **kwargs):
@@ -59,6 +70,19 @@ class HeaderMap(BaseOperator):
         assert isinstance(config, dict)
         return cls(config, **kwargs)
 
+    def input_columns(self, columns):
+        """Headers of the input renamed to the needed columns."""
+        if columns is None:
+            return None
+        sources = []
+        for column in columns:
+            sources += [
+                old for old, new in self.config.items() if new == column
+            ]
+            if not self.complete_map and column not in self.config:
+                sources.append(column)  # passes through unchanged
+        return list(dict.fromkeys(sources))
+
     def transform(self, df: DataFrame) -> DataFrame:
         """
         Converts column headers using the config key-value pairs.
@@ -71,7 +95,8 @@ class HeaderMap(BaseOperator):
         Returns
         -------
         DataFrame
-            Copy of the original df with replaced headers.
+            Snapshot of the original df with replaced headers, or df itself
+            if copy is False.
 
         Raises
         ------
@@ -79,7 +104,10 @@ class HeaderMap(BaseOperator):
             If complete_map is set to true, then it is required that all of
             the old column headers are represented in the config.
         """
-        df = deepcopy(df)  # does not overwrite original df
+        if self.copy:
+            # new headers do not overwrite the original df, and the values
+            # are only copied without copy-on-write
+            df = snapshot(df)
         old_headers = df.columns
 
         if self.complete_map:  # will raise error if old header not present
@@ -0,0 +1,46 @@
+"""Implements the selection of columns of data."""
+
+from typing import List
+
+from pandas import DataFrame
+
+from piperoni.operators.base import BaseOperator
+
+
+class SelectColumns(BaseOperator):
+    """Keeps some columns of a pandas DataFrame, in a given order.
+
+    Parameters
+    ----------
+    columns: List[str]
+        Headers of the columns to keep.
+    """
+
+    streamable = True
+
+    def __init__(self, columns: List[str]):
+        self.columns = columns
+
+    def input_columns(self, columns):
+        """The selected columns, whatever columns are needed."""
+        return list(self.columns)
+
+    def transform(self, df: DataFrame) -> DataFrame:
+        """Selects the columns.
+
+        Parameters
+        ----------
+        df: DataFrame
+            The input data.
+
+        Returns
+        -------
+        DataFrame
+            A copy of the selected columns.
+
+        Raises
+        ------
+        KeyError
+            If a column is not in the data.
+        """
+        return df[list(self.columns)]
@@ -2,13 +2,15 @@ import os
 import pytest
 import yaml
 
+import numpy as np
+import pandas
+
 from pandas import DataFrame
 
 import piperoni as hep
 
 from piperoni.operators.transform.transform_name.header_map import HeaderMap
 
-
 """
 This module implements tests for the HeaderMap.
 """
@@ -87,3 +89,29 @@ class TestHeaderMap:
         output = relaxed_instance(default_headers)
         for expected, result in zip(NEW_HEADERS, output.columns):
             assert expected == result
+
+    @pytest.mark.parametrize("copy_on_write", [False, True])
+    def test_shared_memory(self, relaxed_instance, copy_on_write):
+        """Tests that renamed data only shares the values of the input with
+        copy-on-write, and that the input is left unchanged."""
+        if copy_on_write and not hasattr(pandas.options.mode, "copy_on_write"):
+            pytest.skip("pandas has no copy-on-write mode")
+        with pandas.option_context("mode.copy_on_write", copy_on_write):
+            data = DataFrame(
+                {
+                    OLD_HEADERS[0]: np.arange(5.0),
+                    "unknown_header": list("abcde"),
+                }
+            )
+            expected = data.copy()
+            output = relaxed_instance(data)
+            assert data.equals(expected)
+            assert list(output.columns) == [NEW_HEADERS[0], "unknown_header"]
+            assert copy_on_write == np.shares_memory(
+                output[NEW_HEADERS[0]].values, data[OLD_HEADERS[0]].values
+            )
+
+            # modifying the output leaves the input unchanged
+            output.loc[0, NEW_HEADERS[0]] = 10.0
+            output[NEW_HEADERS[0]] = 0.0
+            assert data.equals(expected)
@@ -2,15 +2,17 @@ import os
 import pytest
 import pandas
 
+import numpy as np
+
 from pandas import DataFrame, read_csv
 
 import piperoni as hep
 
+from piperoni import utils
 from piperoni.operators.transform.transform_value.value_transformers import (
     Normalizer,
 )
 
-
 """
 This module implements tests for the value transformers.
 """
@@ -77,3 +79,42 @@ class TestNormalizer:
                 if pandas.isna(i):
                     continue
                 assert i + shift == j
+
+    @pytest.mark.parametrize("copy_on_write", [False, True])
+    def test_shared_memory(self, transformer, input_data, copy_on_write):
+        """Tests that only the normalized columns are new with copy-on-write,
+        that every column is new without it, and that the input is left
+        unchanged."""
+        if copy_on_write and not hasattr(pandas.options.mode, "copy_on_write"):
+            pytest.skip("pandas has no copy-on-write mode")
+        with pandas.option_context("mode.copy_on_write", copy_on_write):
+            data = input_data.copy()
+            data["count"] = np.arange(len(data))
+            expected = data.copy()
+            result = transformer(data)
+            assert data.equals(expected)
+            for column in data.columns:
+                shared = np.shares_memory(
+                    result[column].values, data[column].values
+                )
+                assert shared == (
+                    copy_on_write and column not in transformer.columns
+                )
+
+            # modifying the output leaves the input unchanged
+            result.iloc[0, :] = None
+            assert data.equals(expected)
+
+        # columns normalized twice are shifted in sequence
+        twice = Normalizer(["count", "count"], [0.5, 0.25])(data)
+        assert twice["count"].equals(data["count"] + 0.5 + 0.25)
+        assert twice["Band gap"].equals(data["Band gap"])
+
+    def test_without_block_internals(
+        self, transformer, input_data, monkeypatch
+    ):
+        """Tests that data is normalized through the public pandas API when
+        pandas internals are not available."""
+        expected = transformer(input_data)
+        monkeypatch.setattr(utils, "_block_internals", lambda: None)
+        assert transformer(input_data).equals(expected)
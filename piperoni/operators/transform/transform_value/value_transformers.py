@@ -1,10 +1,10 @@
 """Implements value transformers, which modify existing data."""
 
 from typing import Callable, List
-from copy import deepcopy
 
 from pandas import DataFrame
 from piperoni.operators.base import BaseOperator
+from piperoni.utils import replace_columns
 
 
 class Normalizer(BaseOperator):
@@ -17,11 +17,28 @@ class Normalizer(BaseOperator):
     delta_mus: List[float]
         Values by which to shift the means of each column. The delta will be
         added to each value in that column.
+    copy: bool
+        Whether to return new normalized data, leaving the input unchanged.
+        With pandas copy-on-write enabled, only the normalized columns are
+        new and the other columns share the memory of the input until either
+        is modified; otherwise they are copied. If False, the columns of the
+        input are replaced. Defaults to True.
     """
 
-    def __init__(self, columns: List[str], delta_mus: List[float]):
+    streamable = True
+
+    def __init__(
+        self, columns: List[str], delta_mus: List[float], copy: bool = True
+    ):
         self.columns = columns
         self.delta_mus = delta_mus
+        self.copy = copy
+
+    def input_columns(self, columns):
+        """The needed columns and the normalized columns."""
+        if columns is None:
+            return None
+        return list(dict.fromkeys([*columns, *self.columns]))
 
     def transform(self, df: DataFrame) -> DataFrame:
         """Normalize columns of the data-frame.
@@ -36,9 +53,14 @@ class Normalizer(BaseOperator):
         DataFrame
             The normalized data.
         """
-        df = deepcopy(df)  # don't overwrite input df
-
-        for i, column in enumerate(self.columns):
-            df[column] = df[column].values + self.delta_mus[i]
+        if not self.copy:
+            for i, column in enumerate(self.columns):
+                df[column] = df[column].values + self.delta_mus[i]
+            return df
 
-        return df
+        # don't overwrite input df, and only allocate the normalized columns
+        normalized = {}
+        for column, delta_mu in zip(self.columns, self.delta_mus):
+            values = normalized.get(column, df[column].values)
+            normalized[column] = values + delta_mu
+        return replace_columns(df, normalized)
@@ -0,0 +1,229 @@
+"""Implements the transport of DataFrames between processes through
+memory-mapped Arrow files.
+
+A FrameStore writes DataFrames once into uncompressed Arrow IPC files, in
+shared memory (/dev/shm) where the system has it. Other processes receive a
+small MappedFrame naming the file instead of the pickled DataFrame, and map
+the file: the numeric columns of the DataFrame they read are read-only
+views of the mapped file rather than copies. The store counts the
+consumers of every file and deletes it when the last one is done.
+
+Examples
+--------
+Sending a DataFrame to two consumers::
+  store = FrameStore()
+  frame = store.put("data", df, consumers=2)
+  pool.submit(work, frame)  # frame.read() in the worker
+  pool.submit(work, frame)
+  store.release("data")  # once per finished consumer
+  store.release("data")  # deletes the file
+"""
+
+import os
+import shutil
+import tempfile
+import uuid
+
+import pandas as pd
+
+from piperoni.operators.partition import arrow_table
+
+# Directory of memory-backed files on Linux
+SHARED_MEMORY_DIR = "/dev/shm"
+
+
+class MappedFrame:
+    """A DataFrame stored in an Arrow IPC file.
+
+    Parameters
+    ----------
+    path : str
+        Path of the file.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def read(self, copy: bool = False) -> pd.DataFrame:
+        """Reads the DataFrame.
+
+        Parameters
+        ----------
+        copy : bool, optional
+            Whether the DataFrame owns its data. By default, numeric columns
+            without missing values are read-only views of the mapped file,
+            which stays mapped as long as they are referenced, even after
+            the file is deleted.
+
+        Returns
+        -------
+        pd.DataFrame
+            The stored DataFrame.
+        """
+        import pyarrow as pa
+
+        with pa.memory_map(self.path) as source:
+            table = pa.ipc.open_file(source).read_all()
+        return table.to_pandas(split_blocks=not copy)
+
+    def __repr__(self):
+        return f"MappedFrame({self.path!r})"
+
+
+def write_mapped(df: pd.DataFrame, directory: str):
+    """Writes a DataFrame into a new Arrow IPC file.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        The DataFrame.
+    directory : str
+        Directory of the file.
+
+    Returns
+    -------
+    MappedFrame or None
+        The stored DataFrame, or None if pyarrow is not installed or the
+        DataFrame does not convert to Arrow without loss.
+    """
+    table = arrow_table(df)
+    if table is None:
+        return None
+
+    import pyarrow as pa
+
+    path = os.path.join(directory, f"{uuid.uuid4().hex}.arrow")
+    with pa.OSFile(path, "wb") as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    return MappedFrame(path)
+
+
+def share_value(value, directory: str):
+    """Replaces a DataFrame, or the DataFrames of a dict, by MappedFrames.
+
+    Values that cannot be mapped are returned as they are.
+    """
+    if isinstance(value, pd.DataFrame):
+        return write_mapped(value, directory) or value
+    if isinstance(value, dict):
+        return type(value)(
+            (key, share_value(item, directory)) for key, item in value.items()
+        )
+    return value
+
+
+def resolve_value(value, copy: bool = False):
+    """Replaces a MappedFrame, or the MappedFrames of a dict, by their
+    DataFrames."""
+    if isinstance(value, MappedFrame):
+        return value.read(copy)
+    if isinstance(value, dict):
+        return type(value)(
+            (key, resolve_value(item, copy)) for key, item in value.items()
+        )
+    return value
+
+
+class FrameStore:
+    """Stores DataFrames in memory-mapped Arrow files, counting their
+    consumers.
+
+    Parameters
+    ----------
+    directory : str or None, optional
+        Directory in which a temporary directory holding the files is
+        created. Defaults to /dev/shm when it exists, so files live in
+        memory, and to the default temporary directory otherwise.
+    """
+
+    def __init__(self, directory=None):
+        if directory is None and os.path.isdir(SHARED_MEMORY_DIR):
+            directory = SHARED_MEMORY_DIR
+        self.directory = tempfile.mkdtemp(prefix="piperoni-", dir=directory)
+        self.frames = {}
+        self.consumers = {}
+
+    def put(self, key, df: pd.DataFrame, consumers: int = 1):
+        """Stores a DataFrame under key.
+
+        Parameters
+        ----------
+        key : Hashable
+            Key of the DataFrame.
+        df : pd.DataFrame
+            The DataFrame.
+        consumers : int, optional
+            Number of releases after which the file is deleted, by default 1
+
+        Returns
+        -------
+        MappedFrame or None
+            The stored DataFrame, or None if it cannot be mapped.
+        """
+        return self.adopt(key, write_mapped(df, self.directory), consumers)
+
+    def adopt(self, key, frame, consumers: int = 1):
+        """Takes ownership of a MappedFrame written in the directory of the
+        store by another process, like a worker.
+
+        Parameters
+        ----------
+        key : Hashable
+            Key of the DataFrame.
+        frame : MappedFrame or None
+            The stored DataFrame. None is ignored.
+        consumers : int, optional
+            Number of releases after which the file is deleted, by default 1
+
+        Returns
+        -------
+        MappedFrame or None
+            frame.
+        """
+        if frame is None:
+            return None
+        self.frames[key] = frame
+        self.consumers[key] = consumers
+        return frame
+
+    def get(self, key):
+        """Returns the MappedFrame stored under key, or None."""
+        return self.frames.get(key)
+
+    def release(self, key) -> bool:
+        """Records that a consumer of the DataFrame under key is done, and
+        deletes its file after the last one.
+
+        Returns
+        -------
+        bool
+            Whether the file was deleted.
+        """
+        if key not in self.frames:
+            return False
+        self.consumers[key] -= 1
+        if self.consumers[key] > 0:
+            return False
+        frame = self.frames.pop(key)
+        del self.consumers[key]
+        _remove(frame.path)
+        return True
+
+    def close(self) -> None:
+        """Deletes every file of the store."""
+        self.frames = {}
+        self.consumers = {}
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def __len__(self):
+        return len(self.frames)
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        # a file mapped by another process cannot be deleted on Windows,
+        # it is deleted with the store
+        pass
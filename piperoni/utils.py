@@ -1,5 +1,9 @@
 import pandas as pd
-import copy
+import numpy as np
+import functools
+import hashlib
+import pickle
+import types
 import warnings
 import datetime as dt
 
@@ -56,12 +60,75 @@ def compare_columns(df1: pd.DataFrame, df2: pd.DataFrame):
     return overlaps, cols1 - overlaps, cols2 - overlaps
 
 
+class DataFrameDiff:
+    """Differences between an input DataFrame and a reference DataFrame.
+
+    Returned by compare_dataframes. Rows are matched on their unique IDs.
+
+    Parameters
+    ----------
+    changed_cells: pd.DataFrame
+        One row per cell whose value differs between the input and the
+        reference, with the columns "uid", "column", "input" and "reference".
+    added_rows: pd.Index
+        Unique IDs of the rows found in the input but not in the reference.
+    removed_rows: pd.Index
+        Unique IDs of the rows found in the reference but not in the input.
+    input_only_columns: set
+        Columns found in the input but not in the reference.
+    reference_only_columns: set
+        Columns found in the reference but not in the input.
+    """
+
+    def __init__(
+        self,
+        changed_cells: pd.DataFrame,
+        added_rows: pd.Index,
+        removed_rows: pd.Index,
+        input_only_columns: set,
+        reference_only_columns: set,
+    ):
+        self.changed_cells = changed_cells
+        self.added_rows = added_rows
+        self.removed_rows = removed_rows
+        self.input_only_columns = input_only_columns
+        self.reference_only_columns = reference_only_columns
+
+    @property
+    def changed_rows(self) -> pd.Index:
+        """Unique IDs of the rows with at least one changed cell."""
+        return pd.Index(self.changed_cells["uid"].unique())
+
+    @property
+    def is_consistent(self) -> bool:
+        """Whether every reference row is in the input, unchanged."""
+        return self.changed_cells.empty and self.removed_rows.empty
+
+    def counts(self) -> dict:
+        """Number of changed cells and rows, added rows and removed rows."""
+        return {
+            "changed_cells": len(self.changed_cells),
+            "changed_rows": len(self.changed_rows),
+            "added_rows": len(self.added_rows),
+            "removed_rows": len(self.removed_rows),
+        }
+
+    def sample(self, n=5) -> pd.DataFrame:
+        """Returns the changed cells of the first n changed rows."""
+        rows = self.changed_rows[:n]
+        return self.changed_cells[self.changed_cells["uid"].isin(rows)]
+
+    def __repr__(self):
+        return f"DataFrameDiff({self.counts()})"
+
+
 def compare_dataframes(
     df_input: pd.DataFrame,
     df_reference: pd.DataFrame,
     unique_id_col: str,
     ignore_cols=None,
-):
+    max_warnings=10,
+) -> DataFrameDiff:
     """
     Compares an incoming dataset to a reference dataset.
     First checks if columns are consistent.
@@ -71,6 +138,10 @@ def compare_dataframes(
     columns that are present in both.
     Finally, reports newly added rows.
 
+    Rows are aligned on the unique ID and compared column by column with
+    vectorized operations. Only the first max_warnings changed or missing
+    rows are warned about one by one; the full result is returned.
+
     Parameters
     ----------
     input: pd.DataFrame
@@ -80,14 +151,17 @@ def compare_dataframes(
     unique_id_col: str
         Name of the column that can be used as a unique identifier. This
         allows comparison of rows for any changes between the input and
-        the reference.
-    ignore_cols: str or None, optional
+        the reference. Only the first row with a given ID is compared.
+    ignore_cols: str or list or None, optional
         Name of column(s) to ignore in analysis
-    """
+    max_warnings: int, optional
+        Maximum number of rows warned about individually, by default 10.
 
-    # First, copy stuff so no permanent changes
-    df_input = copy.deepcopy(df_input)
-    df_reference = copy.deepcopy(df_reference)
+    Returns
+    -------
+    DataFrameDiff
+        The changed cells, added rows and removed rows.
+    """
 
     # Obtain overlapping columns, columns unique to input, and colums unique
     # to the reference.
@@ -109,61 +183,256 @@ def compare_dataframes(
         warnings.warn(
             f"Provided unique ID column {unique_id_col} does not exist in both datasets!"
         )
+        return DataFrameDiff(
+            _changed_cells([], [], [], []),
+            pd.Index([]),
+            pd.Index([]),
+            unique_input,
+            unique_reference,
+        )
 
-    # Filter out columns to ignore and the unique id columns, then make loopable
-    overlapping_cols = overlapping_cols - {unique_id_col} - {ignore_cols}
-    overlapping_cols = list(overlapping_cols)
-
-    # Obtain list of unique ids, then turn the unique id column into index
-    # for convenience and faster access
-    ref_unique_entries = df_reference[unique_id_col].tolist()
-    input_unique_entries = df_input[unique_id_col].tolist()
-    reindexed_input = df_input.set_index(unique_id_col)
-    reindexed_ref = df_reference.set_index(unique_id_col)
-
-    # Setup flag that detects and inconsistencies. Changes to true if
-    # differences are found
-    mismatch_found = False
-    for entry in ref_unique_entries:
-        try:
-            if (
-                not reindexed_input[overlapping_cols]
-                .loc[entry]
-                .equals(reindexed_ref[overlapping_cols].loc[entry])
-            ):
-                mismatch_found = True
-                mismatches = (
-                    ~reindexed_input[overlapping_cols]
-                    .loc[entry]
-                    .fillna("dummy")
-                    .eq(
-                        reindexed_ref[overlapping_cols]
-                        .loc[entry]
-                        .fillna("dummy")
-                    )
-                    .values
-                )
-                warnings.warn(
-                    f"Row {entry} has values {reindexed_input[overlapping_cols].loc[entry][mismatches].values} in input data, but has values {reindexed_ref[overlapping_cols].loc[entry][mismatches].values} in the reference for columns {reindexed_ref[overlapping_cols].columns[mismatches].values}"
-                )
-        except KeyError:
-            mismatch_found = True
-            warnings.warn(
-                f"Row {entry} in reference dataset not found in the input!"
-            )
+    # Filter out columns to ignore and the unique id columns, keeping the
+    # order of the reference
+    if ignore_cols is None or isinstance(ignore_cols, str):
+        ignore_cols = [ignore_cols]
+    columns = [
+        col
+        for col in df_reference.columns
+        if col in overlapping_cols
+        and col != unique_id_col
+        and col not in ignore_cols
+    ]
+
+    # Align both datasets on the unique ids
+    input_ids = pd.Index(df_input[unique_id_col])
+    ref_ids = pd.Index(df_reference[unique_id_col])
+    input_first = ~input_ids.duplicated()
+    ref_first = ~ref_ids.duplicated()
+    in_input = ref_ids.isin(input_ids) & ref_first
+    removed_rows = ref_ids[~ref_ids.isin(input_ids) & ref_first]
+    added_rows = input_ids[~input_ids.isin(ref_ids) & input_first]
+    common_ids = ref_ids[in_input]
+    input_positions = (
+        pd.Series(np.flatnonzero(input_first), index=input_ids[input_first])
+        .reindex(common_ids)
+        .to_numpy()
+    )
+    ref_positions = np.flatnonzero(in_input)
+
+    # Find changed cells column by column
+    positions, uids = [], []
+    changed_columns, input_values, ref_values = [], [], []
+    for col in columns:
+        input_col = df_input[col].iloc[input_positions]
+        ref_col = df_reference[col].iloc[ref_positions]
+        rows = np.flatnonzero(~_equal_cells(input_col, ref_col))
+        positions.append(rows)
+        uids.append(common_ids[rows])
+        changed_columns.append(np.full(len(rows), col, dtype=object))
+        input_values.append(input_col.iloc[rows].to_numpy())
+        ref_values.append(ref_col.iloc[rows].to_numpy())
+    changed_cells = _changed_cells(
+        uids, changed_columns, input_values, ref_values
+    )
+    # Order changed cells like the rows of the reference
+    if positions:
+        order = np.argsort(np.concatenate(positions), kind="stable")
+        changed_cells = changed_cells.iloc[order].reset_index(drop=True)
+    diff = DataFrameDiff(
+        changed_cells, added_rows, removed_rows, unique_input, unique_reference
+    )
+
+    changed_rows = diff.changed_rows
+    for entry in changed_rows[:max_warnings]:
+        cells = changed_cells[changed_cells["uid"] == entry]
+        warnings.warn(
+            f"Row {entry} has values {pd.Series(cells['input'].tolist()).values} in input data, but has values {pd.Series(cells['reference'].tolist()).values} in the reference for columns {cells['column'].values}"
+        )
+    if len(changed_rows) > max_warnings:
+        warnings.warn(
+            f"{len(changed_rows) - max_warnings} more rows have values in input data that differ from the reference."
+        )
+    for entry in removed_rows[:max_warnings]:
+        warnings.warn(
+            f"Row {entry} in reference dataset not found in the input!"
+        )
+    if len(removed_rows) > max_warnings:
+        warnings.warn(
+            f"{len(removed_rows) - max_warnings} more rows in reference dataset not found in the input!"
+        )
 
-    if not mismatch_found:
+    if diff.is_consistent:
         warnings.warn(
             "All rows in input are consistent with the reference in overlapping columns."
         )
 
-    if set(input_unique_entries) - set(ref_unique_entries):
+    if len(added_rows) > max_warnings:
+        warnings.warn(
+            f"{len(added_rows)} rows are present in the input but not in the reference, including:\n{set(added_rows[:max_warnings])}"
+        )
+    elif len(added_rows):
         warnings.warn(
-            f"The following rows are present in the input but not in the reference:\n{set(input_unique_entries) - set(ref_unique_entries)}"
+            f"The following rows are present in the input but not in the reference:\n{set(added_rows)}"
         )
     else:
         warnings.warn("No new rows found in the input.")
 
+    return diff
+
+
+def _equal_cells(input_col: pd.Series, ref_col: pd.Series) -> np.ndarray:
+    """Whether the cells of two columns of aligned rows are equal, missing
+    values being equal to each other."""
+    input_col = input_col.reset_index(drop=True)
+    ref_col = ref_col.reset_index(drop=True)
+    if input_col.dtype != ref_col.dtype:
+        # cells of different dtypes are compared one by one as Python
+        # objects, so that 1 and 1.0 are equal but 1 and "1" are not
+        input_col = input_col.astype(object)
+        ref_col = ref_col.astype(object)
+    if input_col.equals(ref_col):
+        return np.ones(len(input_col), dtype=bool)
+    equal = input_col.eq(ref_col).fillna(False).to_numpy(dtype=bool)
+    return equal | (input_col.isna() & ref_col.isna()).to_numpy()
+
+
+def _changed_cells(uids, columns, input_values, ref_values) -> pd.DataFrame:
+    """Assembles per-column arrays of changed cells into one DataFrame."""
+
+    def join(arrays):
+        arrays = [np.asarray(array, dtype=object) for array in arrays]
+        return np.concatenate(arrays) if arrays else np.array([], dtype=object)
+
+    return pd.DataFrame(
+        {
+            "uid": uids[0].append(uids[1:]) if uids else pd.Index([]),
+            "column": join(columns),
+            "input": join(input_values),
+            "reference": join(ref_values),
+        }
+    )
+
+
+def snapshot(df: pd.DataFrame) -> pd.DataFrame:
+    """Returns a copy of a DataFrame that later changes to it cannot affect.
+
+    When pandas copy-on-write is enabled, with
+    ``pd.set_option("mode.copy_on_write", True)``, the copy is lazy: it shares
+    memory with df until one of them is modified. Otherwise it is a deep copy.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        The data to snapshot.
+
+    Returns
+    -------
+    pd.DataFrame
+        The snapshot.
+    """
+    return df.copy(deep=not copy_on_write_enabled())
+
+
+def copy_on_write_enabled() -> bool:
+    """Whether pandas copy-on-write mode is available and enabled."""
+    try:
+        return bool(pd.get_option("mode.copy_on_write"))
+    except KeyError:  # OptionError in pandas < 1.5
+        return False
+
+
+def replace_columns(df: pd.DataFrame, columns: dict) -> pd.DataFrame:
+    """Returns a new DataFrame with some columns replaced, leaving df
+    unchanged.
+
+    When pandas copy-on-write is enabled, the other columns share the memory
+    of df until either DataFrame is modified. Otherwise they are copied, so
+    that writing values of the output in place cannot write them in df.
+    pandas stores the columns of a dtype together in 2D blocks, so only the
+    other columns of the blocks holding replaced columns are copied, rather
+    than copying the whole blocks and overwriting the replaced columns.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        The data.
+    columns : dict
+        New values of columns by header, as arrays of the length of df.
+
+    Returns
+    -------
+    pd.DataFrame
+        The data with the replaced columns.
+    """
+    if copy_on_write_enabled():
+        out = df.copy(deep=False)
+        for column, values in columns.items():
+            out[column] = values
+        return out
+
+    internals = _block_internals()
+    blocks = None
+    if (
+        internals is not None
+        and isinstance(df._mgr, internals[0])
+        and df.columns.is_unique
+    ):
+        locations = {df.columns.get_loc(c): c for c in columns}
+        blocks = _split_blocks(df, locations, columns, internals[1])
+    if blocks is None:
+        out = df.copy()
+        for column, values in columns.items():
+            out[column] = values
+        return out
+    manager = internals[0](blocks, df._mgr.axes)
+    return df._constructor(manager).__finalize__(df)
+
+
+def _block_internals():
+    """The BlockManager class and make_block function of pandas, or None if
+    the private pandas internals they come from changed."""
+    try:
+        from pandas.core.internals import BlockManager, make_block
+    except ImportError:
+        return None
+    return BlockManager, make_block
+
+
+def _split_blocks(df, locations, columns, make_block):
+    """Copies of the blocks of df with the columns at locations replaced, or
+    None if a block holding a replaced column cannot be split."""
+    blocks = []
+    for block in df._mgr.blocks:
+        placement = block.mgr_locs.as_array
+        replaced = [k for k, loc in enumerate(placement) if loc in locations]
+        if not replaced:
+            blocks.append(block.copy())
+            continue
+        if len(placement) > 1 and not isinstance(block.values, np.ndarray):
+            return None
+        start = 0
+        for k in replaced + [len(placement)]:
+            if start < k:  # unchanged columns between replaced ones
+                blocks.append(
+                    make_block(
+                        block.values[start:k].copy(),
+                        placement=placement[start:k],
+                    )
+                )
+            start = k + 1
+        for k in replaced:
+            values = columns[locations[placement[k]]]
+            values = getattr(values, "array", values)  # unboxes Series
+            if len(values) != len(df):
+                raise ValueError(
+                    f"Column {locations[placement[k]]} has {len(values)} "
+                    f"values, expected {len(df)}."
+                )
+            if isinstance(values, np.ndarray):
+                values = values.reshape(1, -1)
+            blocks.append(make_block(values, placement=[placement[k]], ndim=2))
+    return blocks
+
 
 def datetime_to_prettystr(style="datetime"):
     datetime = str(dt.datetime.now())
@@ -175,3 +444,186 @@ def datetime_to_prettystr(style="datetime"):
     if style == "time":
         return datetime[11:]
     return datetime
+
+
+def fingerprint(obj) -> str:
+    """Computes a stable content hash of an object.
+
+    DataFrames and Series are hashed column by column with pandas' vectorized
+    hashing. Containers are hashed element by element, functions by their
+    code, and other objects by their class and attributes. Two objects with
+    the same content get the same fingerprint across interpreter sessions.
+
+    Parameters
+    ----------
+    obj : object
+        The object to fingerprint.
+
+    Returns
+    -------
+    str
+        Hexadecimal digest of the object.
+    """
+    hasher = hashlib.sha256()
+    _update_fingerprint(hasher, obj, set())
+    return hasher.hexdigest()
+
+
+def file_fingerprint(path: str, block_size=2 ** 20) -> str:
+    """Computes a content hash of a file.
+
+    Parameters
+    ----------
+    path : str
+        Path to the file.
+    block_size : int, optional
+        Number of bytes read at a time, by default 1 MiB.
+
+    Returns
+    -------
+    str
+        Hexadecimal digest of the file content.
+    """
+    hasher = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(block_size), b""):
+            hasher.update(block)
+    return hasher.hexdigest()
+
+
+def _update_fingerprint(hasher, obj, seen):
+    """Feeds the content of obj to a hashlib hasher.
+
+    Every value is framed with its type and length, so that the content of
+    consecutive values, or of nested containers, cannot run together. seen
+    holds the ids of the functions and objects being hashed, which breaks
+    reference cycles such as recursive functions.
+    """
+    _update_framed(hasher, type(obj).__qualname__.encode())
+    if obj is None or isinstance(obj, (bool, int, float, complex, str)):
+        _update_framed(hasher, repr(obj).encode())
+    elif isinstance(obj, bytes):
+        _update_framed(hasher, obj)
+    elif isinstance(obj, pd.DataFrame):
+        _update_fingerprint(hasher, obj.index, seen)
+        _update_framed(hasher, str(obj.shape[1]).encode())
+        for name, column in obj.items():
+            _update_fingerprint(hasher, name, seen)
+            _update_fingerprint(hasher, column, seen)
+    elif isinstance(obj, (pd.Series, pd.Index)):
+        _update_framed(hasher, str(obj.dtype).encode())
+        _update_fingerprint(hasher, obj.name, seen)
+        try:
+            hashes = pd.util.hash_pandas_object(obj, index=False)
+            _update_framed(hasher, hashes.values.tobytes())
+        except TypeError:  # unhashable cells, such as lists
+            _update_framed(hasher, pickle.dumps(obj.tolist()))
+    elif isinstance(obj, np.ndarray):
+        _update_framed(hasher, f"{obj.dtype}{obj.shape}".encode())
+        if obj.dtype.hasobject:
+            _update_framed(hasher, pickle.dumps(obj.tolist()))
+        else:
+            _update_framed(hasher, np.ascontiguousarray(obj).tobytes())
+    elif isinstance(obj, dict):
+        # ordering of keys does not change the content of a dict
+        digests = sorted(
+            _digest(key, seen) + _digest(value, seen)
+            for key, value in obj.items()
+        )
+        _update_framed(hasher, "".join(digests).encode())
+    elif isinstance(obj, (list, tuple)):
+        _update_framed(hasher, str(len(obj)).encode())
+        for item in obj:
+            _update_fingerprint(hasher, item, seen)
+    elif isinstance(obj, (set, frozenset)):
+        digests = sorted(_digest(item, seen) for item in obj)
+        _update_framed(hasher, "".join(digests).encode())
+    elif isinstance(obj, (type, types.ModuleType)):
+        # classes and modules are referenced by name, like pickle does
+        name = getattr(obj, "__qualname__", obj.__name__)
+        module = getattr(obj, "__module__", None)
+        _update_framed(hasher, f"{module}.{name}".encode())
+    elif isinstance(obj, types.CodeType):
+        _update_framed(hasher, obj.co_code)
+        _update_fingerprint(hasher, obj.co_consts, seen)
+        _update_fingerprint(hasher, obj.co_names, seen)
+    elif id(obj) in seen:
+        _update_framed(hasher, b"<cycle>")
+    elif isinstance(obj, (types.FunctionType, types.MethodType)):
+        seen.add(id(obj))
+        try:
+            _update_function(hasher, obj, seen)
+        finally:
+            seen.discard(id(obj))
+    elif isinstance(obj, functools.partial):
+        seen.add(id(obj))
+        try:
+            _update_fingerprint(
+                hasher, (obj.func, obj.args, obj.keywords), seen
+            )
+        finally:
+            seen.discard(id(obj))
+    elif hasattr(obj, "__dict__"):
+        # __getstate__ lets classes leave out state that is not content
+        state = obj.__getstate__() if hasattr(obj, "__getstate__") else None
+        seen.add(id(obj))
+        try:
+            _update_fingerprint(
+                hasher, vars(obj) if state is None else state, seen
+            )
+        finally:
+            seen.discard(id(obj))
+    else:
+        try:
+            _update_framed(hasher, pickle.dumps(obj))
+        except Exception:
+            _update_framed(hasher, repr(obj).encode())
+
+
+def _update_function(hasher, function, seen):
+    """Feeds a function to a hashlib hasher: its code, its defaults, the
+    values it closes over and the global variables its code reads, so that
+    functions with the same code computing different results get different
+    fingerprints."""
+    _update_framed(
+        hasher, f"{function.__module__}.{function.__qualname__}".encode()
+    )
+    _update_fingerprint(hasher, getattr(function, "__self__", None), seen)
+    _update_fingerprint(hasher, function.__code__, seen)
+    _update_fingerprint(hasher, function.__defaults__, seen)
+    _update_fingerprint(hasher, function.__kwdefaults__, seen)
+    cells = []
+    for cell in function.__closure__ or ():
+        try:
+            cells.append(cell.cell_contents)
+        except ValueError:  # cell of a variable not assigned yet
+            cells.append(None)
+    _update_fingerprint(hasher, cells, seen)
+    namespace = function.__globals__
+    names = sorted(_code_names(function.__code__) & namespace.keys())
+    _update_fingerprint(
+        hasher, [(name, namespace[name]) for name in names], seen
+    )
+
+
+def _code_names(code) -> set:
+    """Names read by code and the functions nested in it, which include
+    the global variables it reads."""
+    names = set(code.co_names)
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            names |= _code_names(const)
+    return names
+
+
+def _digest(obj, seen) -> str:
+    """Fingerprint of obj, hashed within a fingerprint computation."""
+    hasher = hashlib.sha256()
+    _update_fingerprint(hasher, obj, seen)
+    return hasher.hexdigest()
+
+
+def _update_framed(hasher, data: bytes):
+    """Feeds data to a hashlib hasher, preceded by its length."""
+    hasher.update(f"{len(data)}:".encode())
+    hasher.update(data)